@@ -25,16 +25,335 @@
 ##
 ###
 import os
+import re
+import sys
+import uuid
+import struct
+import hashlib
 import logging
+from array import array
+from functools import lru_cache
+from MuPythonLibrary.Uefi.EdkII.Parsers.ExpressionEvaluator import EvaluateExpression, ExpressionError
+from MuPythonLibrary.Uefi.EdkII.Parsers.ParseCache import GetFileHash, GetFileSignature
+from MuPythonLibrary.Uefi.EdkII.Parsers.FileReader import FileReader
+from collections import namedtuple
+
+#
+# Kinds of tokens produced by TokenizeLines
+#
+TOKEN_SECTION = "SECTION"
+TOKEN_DIRECTIVE = "DIRECTIVE"
+TOKEN_DATA = "DATA"
+
+#
+# A single significant line of an EDK2 build file.
+#   Kind   - one of the TOKEN_* values above
+#   Text   - the line with comments and surrounding whitespace removed
+#   LineNo - 1 based line number within the source file
+#   Key    - lower case section type for sections (ex: "libraryclasses" for [LibraryClasses.X64])
+#            lower case keyword for directives (ex: "!include"), None for data lines
+#
+LexToken = namedtuple("LexToken", ["Kind", "Text", "LineNo", "Key"])
+
+#
+# A processed line along with where it came from.
+#   File   - path of the file (or include file) the line was read from
+#   LineNo - 1 based line number within that file
+#   Text   - the line with variables replaced
+#
+SourceLine = namedtuple("SourceLine", ["File", "LineNo", "Text"])
+
+#
+# A section of a file along with all of the tokens that belong to it.
+#   Key     - lower case section type (empty string for tokens before the first section)
+#   Names   - tuple of every comma separated name in the header (ex: ("LibraryClasses.X64", "LibraryClasses.IA32"))
+#   LineNo  - line number of the section header (0 for the implicit leading section)
+#   Entries - list of the data and directive tokens in the section
+#
+SectionBlock = namedtuple("SectionBlock", ["Key", "Names", "LineNo", "Entries"])
+
+
+#
+# Get the lower case section type from a section header
+# ex: "[LibraryClasses.X64, LibraryClasses.IA32]" returns "libraryclasses"
+#
+def GetSectionKey(text):
+    return text.lstrip("[").split("]", 1)[0].split(",", 1)[0].split(".", 1)[0].strip().lower()
+
+
+#
+# Single pass lexer shared by the # comment style parsers.
+# Each line is stripped of comments and whitespace exactly once and
+# classified by its first character.  Blank lines are dropped.
+#
+# @param lines: iterable of raw lines (ex: the result of readlines())
+#
+# @ret generator of LexToken
+#
+def TokenizeLines(lines):
+    lineno = 0
+    for line in lines:
+        lineno += 1
+        text = line.split("#", 1)[0].strip()
+        if not text:
+            continue
+
+        first = text[0]
+        if first == "[":
+            yield LexToken(TOKEN_SECTION, text, lineno, GetSectionKey(text))
+        elif first == "!":
+            yield LexToken(TOKEN_DIRECTIVE, text, lineno, text.split(None, 1)[0].lower())
+        else:
+            yield LexToken(TOKEN_DATA, text, lineno, None)
+
+
+#
+# Group a token stream into sections.  Tokens found before the first
+# section header are placed in a section with an empty key.
+#
+# @param tokens: iterable of LexToken
+#
+# @ret list of SectionBlock
+#
+def GroupSections(tokens):
+    sections = []
+    current = SectionBlock("", (), 0, [])
+    for token in tokens:
+        if token.Kind == TOKEN_SECTION:
+            if current.Entries or current.LineNo:
+                sections.append(current)
+            names = tuple(n.strip() for n in token.Text.lstrip("[").split("]", 1)[0].split(","))
+            current = SectionBlock(token.Key, names, token.LineNo, [])
+        else:
+            current.Entries.append(token)
+    if current.Entries or current.LineNo:
+        sections.append(current)
+    return sections
+
+
+#
+# Matches the innermost $(NAME) variable reference
+#
+VariablePattern = re.compile(r"\$\(([^$()]*)\)")
+
+# Limit on passes over a line when resolving nested variable references
+MaxVariableNesting = 16
+
+
+#
+# Reads the tokens of a file and of the files it includes one at a time, without
+# recursion.  Included files are pushed on a stack and read until they run out,
+# then reading carries on in the file that included them.
+#
+class TokenCursor(object):
+
+    def __init__(self):
+        # frames of (file name, token iterator)
+        self._Stack = []
+        self.File = None
+
+    #
+    # Start reading tokens from a file.  The rest of the current file is read
+    # after the new file's tokens.
+    #
+    def Push(self, file_name, tokens):
+        self._Stack.append((file_name, iter(tokens)))
+
+    def IsReading(self, file_name):
+        return any(frame[0] == file_name for frame in self._Stack)
+
+    #
+    # @ret the next LexToken, or None when every file has been read
+    #
+    def Next(self):
+        while len(self._Stack) > 0:
+            (file_name, tokens) = self._Stack[-1]
+            token = next(tokens, None)
+            if token is not None:
+                self.File = file_name
+                return token
+            self._Stack.pop()
+        return None
+
+
+def _GuidField(digits):
+    return r"\s*(?:0[xX])?([0-9a-fA-F]{1,%d})\s*" % digits
+
+
+# C structure format guid. ex: { 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}
+_GuidStruct = (r"\{%s,%s,%s,\s*\{%s\}\s*\}" %
+               (_GuidField(8), _GuidField(4), _GuidField(4), ",".join([_GuidField(2)] * 8)))
+GuidStructPattern = re.compile(_GuidStruct)
+
+# name = C structure format guid
+GuidLinePattern = re.compile(r"^[^={}]*=\s*%s\s*$" % _GuidStruct)
+
+
+#
+# Convert a C structure format guid to a UUID.  Results are cached since the
+# same guids show up in many files.
+#
+# @raise ValueError if text doesn't hold a C structure format guid
+#
+@lru_cache(maxsize=8192)
+def ParseGuidValue(text):
+    m = GuidStructPattern.search(text)
+    if m is None:
+        raise ValueError("Invalid GUID: %s" % text)
+    return uuid.UUID(bytes=struct.pack(">IHH8B", *[int(g, 16) for g in m.groups()]))
+
+
+#
+# Intern every string in a parse result so equal strings from many parsed files
+# (package paths, library class names, token spaces, license header lines...)
+# share one object.  Lists and dicts are updated in place, tuples are rebuilt.
+#
+# @ret the value with its strings interned
+#
+def InternStrings(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        value[:] = [InternStrings(v) for v in value]
+        return value
+    if isinstance(value, tuple):
+        items = [InternStrings(v) for v in value]
+        # named tuples take their fields as arguments
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    if isinstance(value, dict):
+        items = [(InternStrings(k), InternStrings(v)) for (k, v) in value.items()]
+        value.clear()
+        value.update(items)
+        return value
+    return value
+
+
+# reader used by parsers without a FileReader
+_DefaultReader = FileReader()
+
+
+#
+# Content hashes by (path, mtime, size) so fingerprints don't rehash unchanged files
+#
+_FileHashCache = {}
+
+
+def _GetFileHash(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    key = (filepath, st.st_mtime_ns, st.st_size)
+    digest = _FileHashCache.get(key)
+    if digest is None:
+        digest = GetFileHash(filepath)
+        _FileHashCache[key] = digest
+    return digest
+
+
+#
+# Combine the fingerprints of several parsers, ex: target.txt, the DSC and the
+# FDF of a platform, into one key.  The order of the parsers doesn't matter.
+#
+# @ret sha256 hex digest
+#
+def GetCombinedFingerprint(parsers):
+    h = hashlib.sha256()
+    for fingerprint in sorted(p.GetFingerprint() for p in parsers):
+        h.update(fingerprint.encode("utf-8"))
+    return h.hexdigest()
+
+
+#
+# Index of every file and directory under a set of root directories built with
+# a single os.scandir walk.  Lets FindPath answer exists checks without a stat
+# call per lookup.  Paths outside of the roots are checked on the file system.
+#
+class PathIndex(object):
+
+    def __init__(self, roots, ignore_dirs=(".git",)):
+        self.Roots = [os.path.normcase(os.path.abspath(r)) for r in roots]
+        self.IgnoreDirs = set(ignore_dirs)
+        self.Paths = set()
+        for root in self.Roots:
+            self.Paths.add(root)
+            self._Walk(root)
+
+    def _Walk(self, root):
+        stack = [root]
+        while len(stack) > 0:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                path = os.path.normcase(entry.path)
+                self.Paths.add(path)
+                if entry.is_dir(follow_symlinks=False) and entry.name not in self.IgnoreDirs:
+                    stack.append(path)
+
+    def Exists(self, path):
+        path = os.path.normcase(os.path.abspath(path))
+        if path in self.Paths:
+            return True
+        for root in self.Roots:
+            if path.startswith(root + os.sep):
+                return False
+        return os.path.exists(path)
+
+
+#
+# dict that counts changes made to it so cached lookups can be invalidated
+#
+class VariableDict(dict):
+
+    def __init__(self, *args, **kwargs):
+        super(VariableDict, self).__init__(*args, **kwargs)
+        self.Version = 0
+
+    def __reduce__(self):
+        return (VariableDict, (dict(self),))
+
+    def __setitem__(self, key, value):
+        self.Version += 1
+        super(VariableDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.Version += 1
+        super(VariableDict, self).__delitem__(key)
+
+    def clear(self):
+        self.Version += 1
+        super(VariableDict, self).clear()
+
+    def pop(self, *args):
+        self.Version += 1
+        return super(VariableDict, self).pop(*args)
+
+    def popitem(self):
+        self.Version += 1
+        return super(VariableDict, self).popitem()
+
+    def setdefault(self, key, default=None):
+        self.Version += 1
+        return super(VariableDict, self).setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.Version += 1
+        super(VariableDict, self).update(*args, **kwargs)
 
 
 class BaseParser(object):
 
+    # Names of the attributes that hold the results of ParseFile.
+    # Used to save and restore results (see ParseCache).
+    ResultAttributes = ()
+
     def __init__(self, log):
         self.Logger = logging.getLogger(log)
         self.Lines = []
-        self.LocalVars = {}
-        self.InputVars = {}
+        self._LocalVars = VariableDict()
+        self._InputVars = VariableDict()
         self.CurrentSection = ""
         self.CurrentFullSection = ""
         self.Parsed = False
@@ -43,6 +362,66 @@ class BaseParser(object):
         self.PPs = []
         self.TargetFile = None
         self.TargetFilePath = None
+        self.CurrentLine = 0
+        self.FilesRead = []
+        # path -> signature taken before the file was read, when a parse cache is set
+        self.FileSignatures = {}
+        self.ParseCache = None
+        self.PathIndex = None
+        # paths found by FindPath (see SetFindPathCache)
+        self.FindPathCache = {}
+        self.FileReader = None
+        self.SectionsOfInterest = None
+        self._InSectionOfInterest = True
+        # state of __ResolveDefine: defines being resolved, values resolved so far,
+        # defines a lookup found unresolved and whether a loop of defines was found
+        self._Resolving = set()
+        self._Resolved = None
+        self._Unresolved = []
+        self._CycleFound = False
+        self._BranchTaken = []
+        self._ValueCache = {}
+        self._ValueCacheVersion = None
+        # source locations of result list items (see AddProvenance)
+        self.SourceFiles = []
+        self.Provenance = {}
+        self._SourceFileIds = {}
+
+    #
+    # Variable dicts are kept by reference so later changes made by the caller are seen.
+    # VariableDicts count their own changes.  Changes to other dicts (ex: the dict passed
+    # to SetInputVars) are seen from the next parse or ClearVariableCache call.
+    #
+    @property
+    def LocalVars(self):
+        return self._LocalVars
+
+    @LocalVars.setter
+    def LocalVars(self, value):
+        self._LocalVars = value
+        self._ValueCacheVersion = None
+
+    @property
+    def InputVars(self):
+        return self._InputVars
+
+    @InputVars.setter
+    def InputVars(self, value):
+        self._InputVars = value
+        self._ValueCacheVersion = None
+
+    #
+    # The conditional stack keeps a count of inactive entries so InActiveCode is constant time.
+    # Use PushConditional/PopConditional to change it.
+    #
+    @property
+    def ConditionalStack(self):
+        return self._ConditionalStack
+
+    @ConditionalStack.setter
+    def ConditionalStack(self, value):
+        self._ConditionalStack = value
+        self._InactiveCount = sum(1 for v in value if not v)
 
     #
     # For include files set the base root path
@@ -60,25 +439,223 @@ class BaseParser(object):
         self.InputVars = inputdict
         return self
 
+    #
+    # Only collect data from some sections.  Data lines in other sections are
+    # dropped as soon as they are read (no variable replacement, path lookups or
+    # logging).  Defines sections, conditionals, includes and section headers are
+    # always processed since they can change how the rest of the file is read.
+    #
+    # @param sections: iterable of section names (ex: "Components.X64") or section
+    #                  types (ex: "Components").  Case insensitive.  A name also
+    #                  matches sections that extend it (ex: "Components.X64.DXE_DRIVER").
+    #                  None processes every section (the default).
+    #
+    def SetSectionsOfInterest(self, sections=None):
+        if sections is None:
+            self.SectionsOfInterest = None
+        else:
+            self.SectionsOfInterest = frozenset(s.strip().lower() for s in sections)
+        return self
+
+    #
+    # Check if any of the names in a section header was asked for by SetSectionsOfInterest
+    #
+    def IsSectionOfInterest(self, header):
+        if self.SectionsOfInterest is None:
+            return True
+        for name in header.strip().lstrip("[").rstrip("]").split(","):
+            parts = name.strip().lower().split(".")
+            if parts[0] == "defines":
+                return True
+            for i in range(1, len(parts) + 1):
+                if ".".join(parts[:i]) in self.SectionsOfInterest:
+                    return True
+        return False
+
+    #
+    # Record where the item just appended to a result list was read from.
+    #
+    # Locations are stored per list as an array of (file id, line number) pairs
+    # rather than an object per item: item i of the list came from line
+    # Provenance[name][2 * i + 1] of SourceFiles[Provenance[name][2 * i]].
+    # File paths are normalized and stored once in SourceFiles.
+    #
+    # Results with locations:
+    #   DscParser       - SixMods, ThreeMods, OtherMods, Libs, Pcds
+    #   InfParser       - every flat list (PackagesUsed, ..., Binaries), Entries.<section type>, Dict.<key>
+    #   DecParser       - every flat list (LibrariesUsed, ..., IncludesUsed), GuidValues.<name>,
+    #                     PcdDeclarations.<name>, Dict.<key>
+    #   FdfParser       - FVs.<fv>.Infs, <Capsules|FmpPayloads>.<name>.<Infs|FVs|FDs|Files>,
+    #                     Rules.<rule>.Sections, Dict.<key>; FD regions hold their own File and LineNo
+    #   TargetTxtParser - Dict.<key>
+    # Other results (ex: DscParser.LocalVars, the Dict and Set of an FD) have none.
+    #
+    # @param name: name of the result list (ex: "SixMods")
+    #
+    def AddProvenance(self, name, filepath, lineno):
+        filepath = os.path.normpath(filepath)
+        if len(self._SourceFileIds) != len(self.SourceFiles):
+            # SourceFiles was replaced, ex: by a cache load
+            self._SourceFileIds = {f: i for (i, f) in enumerate(self.SourceFiles)}
+        file_id = self._SourceFileIds.get(filepath)
+        if file_id is None:
+            file_id = len(self.SourceFiles)
+            self.SourceFiles.append(filepath)
+            self._SourceFileIds[filepath] = file_id
+        self.Provenance.setdefault(name, array("I")).extend((file_id, lineno))
+
+    #
+    # Record where the value of a key of a result dict was read from.  It is stored
+    # as the only location of "<name>.<key>" (ex: "Dict.BASE_NAME") so a later value
+    # for the key replaces the location like it replaces the value.
+    #
+    def SetProvenance(self, name, key, filepath, lineno):
+        name = "%s.%s" % (name, key)
+        self.Provenance.pop(name, None)
+        self.AddProvenance(name, filepath, lineno)
+
+    #
+    # @ret (normalized file path, line number) of the value of a key of a result dict or None
+    #
+    def GetKeyProvenance(self, name, key):
+        return self.GetProvenance("%s.%s" % (name, key), 0)
+
+    #
+    # Get where an item of a result list was read from
+    #
+    # @ret (normalized file path, line number) or None if no location was recorded
+    #
+    def GetProvenance(self, name, index):
+        locations = self.Provenance.get(name)
+        if locations is None or index < 0 or 2 * index >= len(locations):
+            return None
+        return (self.SourceFiles[locations[2 * index]], locations[2 * index + 1])
+
+    #
+    # @ret list of (normalized file path, line number) for every item of a result list
+    #
+    def GetSourceLocations(self, name):
+        locations = self.Provenance.get(name, ())
+        return [(self.SourceFiles[locations[i]], locations[i + 1]) for i in range(0, len(locations), 2)]
+
+    #
+    # Use a ParseCache to serve results for unchanged files
+    #
+    def SetParseCache(self, cache):
+        self.ParseCache = cache
+        return self
+
+    #
+    # Get a stable string describing the inputs that can change parse results
+    #
+    def GetInputFingerprint(self):
+        return repr((os.path.normpath(self.RootPath) if self.RootPath else "",
+                     [os.path.normpath(p) for p in self.PPs],
+                     sorted(self.InputVars.items()),
+                     sorted(self.SectionsOfInterest) if self.SectionsOfInterest is not None else None))
+
+    #
+    # Get a stable key for the results of a parse: the parser type, its inputs
+    # (see GetInputFingerprint) and the content of every file read.  Tools that
+    # derive data from the results can use it to skip work when nothing changed.
+    # Paths and input vars are ordered so the key doesn't depend on read order.
+    #
+    # @ret sha256 hex digest
+    #
+    def GetFingerprint(self):
+        h = hashlib.sha256()
+        h.update(type(self).__name__.encode("utf-8"))
+        h.update(self.GetInputFingerprint().encode("utf-8"))
+        for path in sorted(set(os.path.normpath(p) for p in self.FilesRead)):
+            h.update(repr((path, _GetFileHash(path))).encode("utf-8"))
+        return h.hexdigest()
+
+    #
+    # Try to populate the results of this parser from the parse cache
+    #
+    # @ret True if the results were restored and parsing can be skipped
+    #
+    def LoadCachedResults(self, filepath):
+        if self.ParseCache is None:
+            return False
+        if not self.ParseCache.Load(self, filepath):
+            return False
+        self.Logger.debug("Using cached results for %s" % filepath)
+        # unpickled strings are only shared within the one cache entry
+        self.InternResults()
+        self.Parsed = True
+        return True
+
+    #
+    # Intern the strings of every result (see InternStrings).  Use on results that
+    # were copied from elsewhere, ex: unpickled from another process.
+    #
+    def InternResults(self):
+        for name in self.ResultAttributes:
+            setattr(self, name, InternStrings(getattr(self, name)))
+        return self
+
+    def StoreCachedResults(self, filepath):
+        if self.ParseCache is not None:
+            self.ParseCache.Store(self, filepath)
+
+    #
+    # Read files through a FileReader, ex: a PrefetchFileReader shared by many parsers
+    #
+    def SetFileReader(self, reader):
+        self.FileReader = reader
+        return self
+
+    #
+    # Use a PathIndex instead of the file system when checking if paths exist
+    #
+    def SetPathIndex(self, index):
+        self.PathIndex = index
+        return self
+
+    #
+    # Share the paths found by FindPath with other parsers, ex: every parser of one
+    # BulkParser.ParseMany call.  Each parser has its own dict by default.  Only found
+    # paths are kept so new files are picked up, but a file created in a location
+    # searched first isn't.  Clear the dict if files were moved, deleted or added.
+    #
+    def SetFindPathCache(self, cache):
+        self.FindPathCache = cache
+        return self
+
+    def _PathExists(self, path):
+        if self.PathIndex is not None:
+            return self.PathIndex.Exists(path)
+        return os.path.exists(path)
+
     def FindPath(self, *p):
         # NOTE: Some of this logic should be replaced
         #       with the path resolution from Edk2Module code.
 
+        # the search locations are part of the key since the cache can be shared
+        key = (self.RootPath, self.TargetFilePath, tuple(self.PPs), p)
+        Path = self.FindPathCache.get(key)
+        if Path is not None:
+            return Path
+
         # If the absolute path exists, return it.
         Path = os.path.join(self.RootPath, *p)
-        if os.path.exists(Path):
+        if self._PathExists(Path):
+            self.FindPathCache[key] = Path
             return Path
 
         # If that fails, check a path relative to the target file.
         if self.TargetFilePath is not None:
             Path = os.path.join(self.TargetFilePath, *p)
-            if os.path.exists(Path):
+            if self._PathExists(Path):
+                self.FindPathCache[key] = Path
                 return Path
 
         # If that fails, check in every possible Pkg path.
         for Pkg in self.PPs:
             Path = os.path.join(self.RootPath, Pkg, *p)
-            if os.path.exists(Path):
+            if self._PathExists(Path):
+                self.FindPathCache[key] = Path
                 return Path
 
         # log invalid file path
@@ -131,65 +708,155 @@ class BaseParser(object):
     # Push new value on stack
     #
     def PushConditional(self, v):
-        self.ConditionalStack.append(v)
+        self._ConditionalStack.append(v)
+        if not v:
+            self._InactiveCount += 1
 
     #
     # Pop conditional and return the value
     #
 
     def PopConditional(self):
-        if(len(self.ConditionalStack) > 0):
-            return self.ConditionalStack.pop()
+        if(len(self._ConditionalStack) > 0):
+            v = self._ConditionalStack.pop()
+            if not v:
+                self._InactiveCount -= 1
+            return v
         else:
             self.Logger.critical("Tried to pop an empty conditional stack.  Line Number %d" % self.CurrentLine)
             return self.ConditionalStack.pop()  # this should cause a crash but will give trace.
 
+    #
+    # Drop the resolved variable values.  Parsers call this when a parse starts, call it
+    # after changing a LocalVars or InputVars dict that isn't a VariableDict between parses.
+    #
+    def ClearVariableCache(self):
+        self._ValueCacheVersion = None
+
+    #
+    # Set a define.  Unlike writing LocalVars directly this is seen by the resolved value
+    # cache even when LocalVars isn't a VariableDict.
+    #
+    def SetLocalVar(self, name, value):
+        self._LocalVars[name] = value
+        if not isinstance(self._LocalVars, VariableDict):
+            self._ValueCacheVersion = None
+
+    #
+    # Look up the value of a variable from the local dict or input dict.
+    # Resolved values are cached until either dict changes.
+    #
+    # @ret the value or None if the variable is not defined
+    #
+    def GetVariableValue(self, name):
+        version = (getattr(self._LocalVars, "Version", 0), getattr(self._InputVars, "Version", 0))
+        if version != self._ValueCacheVersion:
+            self._ValueCache = {}
+            self._ValueCacheVersion = version
+        elif name in self._ValueCache:
+            return self._ValueCache[name]
+
+        v = self._LocalVars.get(name)
+        if(v is None):
+            # use the passed in Env
+            v = self._InputVars.get(name)
+        elif "$(" in v:
+            # defines are stored unresolved so resolve the value now
+            if self._Resolved is None:
+                return self.__ResolveDefine(name)
+            if name in self._Resolved:
+                return self._Resolved[name]
+            if name in self._Resolving:
+                # the define references itself
+                self._CycleFound = True
+            else:
+                # not resolved yet, __ResolveDefine will come back once it is
+                self._Unresolved.append(name)
+            return None
+
+        v = self.__NormalizeValue(v)
+        if self._Resolved is None:
+            self._ValueCache[name] = v
+        return v
+
+    def __NormalizeValue(self, v):
+        #
+        # fixme: This should just be a workaround!!!!!
+        #
+        if v is not None and v.upper() in ("TRUE", "FALSE"):
+            v = v.upper()
+        return v
+
+    #
+    # Resolve a define whose value references other variables.
+    #
+    # The defines it depends on are resolved first using an explicit stack instead
+    # of recursion, so long chains of defines referencing later defines can't
+    # overflow the call stack.  A define is retried each time a define it
+    # references is resolved.  Defines that reference each other in a loop are
+    # expanded once with the looping reference left as is and not cached.
+    #
+    # @ret the resolved value
+    #
+    def __ResolveDefine(self, name):
+        pending = [name]
+        self._Resolving = {name}
+        self._Resolved = {}
+        self._CycleFound = False
+        try:
+            while len(pending) > 0:
+                current = pending[-1]
+                self._Unresolved = []
+                value = self.__SubstituteVariables(self._LocalVars[current])
+                if len(self._Unresolved) > 0:
+                    # one at a time so pending only holds the chain of defines being resolved
+                    pending.append(self._Unresolved[0])
+                    self._Resolving.add(self._Unresolved[0])
+                    continue
+                pending.pop()
+                self._Resolving.discard(current)
+                self._Resolved[current] = self.__NormalizeValue(value)
+            resolved = self._Resolved
+        finally:
+            self._Resolving = set()
+            self._Resolved = None
+            self._Unresolved = []
+        if not self._CycleFound:
+            self._ValueCache.update(resolved)
+        return resolved[name]
+
+    def _ReplaceVariableMatch(self, match):
+        v = self.GetVariableValue(match.group(1))
+        if(v is None):
+            # just skip it because we need to support ifdef
+            return match.group(0)
+        return v
+
+    #
+    # Replace variables in a line, from the inside out so nested references
+    # like $(A_$(B)) work
+    #
+    def __SubstituteVariables(self, line):
+        result = line
+        for i in range(MaxVariableNesting):
+            replaced = VariablePattern.sub(self._ReplaceVariableMatch, result)
+            if replaced == result:
+                break
+            result = replaced
+        return result
+
     #
     # Method to replace variables
-    # in a line with their value from input dict or local dict
+    # in a line with their value from input dict or local dict.
+    # Nested references like $(A_$(B)) are resolved from the inside out.
     #
     def ReplaceVariables(self, line):
-        rep = line.count("$")
-        result = line
-        index = 0
-        while(rep > 0):
-            start = line.find("$(", index)
-            end = line.find(")", start)
-
-            token = line[start + 2:end]
-            retoken = line[start:end + 1]
-            self.Logger.debug("Token is %s" % token)
-            v = self.LocalVars.get(token)
-            self.Logger.debug("Trying to replace %s" % retoken)
-            if(v is not None):
-                #
-                # fixme: This should just be a workaround!!!!!
-                #
-                if (v.upper() == "TRUE" or v.upper() == "FALSE"):
-                    v = v.upper()
-                self.Logger.debug("with %s  [From Local Vars]" % v)
-                result = result.replace(retoken, v, 1)
-            else:
-                # use the passed in Env
-                v = self.InputVars.get(token)
-
-                if(v is None):
-                    self.Logger.error("Unknown variable %s in  %s" % (token, line))
-                    # raise Exception("Invalid Variable Replacement", token)
-                    # just skip it because we need to support ifdef
-                else:
-                    # found in the Env
-                    #
-                    # fixme: This should just be a workaround!!!!!
-                    #
-                    if (v.upper() == "TRUE" or v.upper() == "FALSE"):
-                        v = v.upper()
-                    self.Logger.debug("with %s [From Input Vars]" % v)
-                    result = result.replace(retoken, v, 1)
-
-            index = end + 1
-            rep = rep - 1
+        if "$(" not in line:
+            return line
 
+        result = self.__SubstituteVariables(line)
+        for m in VariablePattern.finditer(result):
+            self.Logger.error("Unknown variable %s in  %s" % (m.group(1), line))
         return result
 
     #
@@ -198,46 +865,99 @@ class BaseParser(object):
     #
 
     def ProcessConditional(self, text):
-        tokens = text.split()
-        if(tokens[0].lower() == "!if"):
-            # need to add support for OR/AND
-            if(len(tokens) < 4):
-                self.Logger.error("!if conditionals need to be formatted correctly (spaces between each token)")
-                raise Exception("Invalid conditional", text)
-            con = self.ComputeResult(tokens[1].strip(), tokens[2].strip(), tokens[3].strip())
-            self.PushConditional(con)
+        tokens = text.split(None, 1)
+        directive = tokens[0].lower()
+        if(directive in ("!if", "!ifdef", "!ifndef") and not self.InActiveCode()):
+            self.__SkipConditional()
+            return True
+
+        elif(directive == "!if"):
+            self.__StartConditional(self.EvaluateConditional(text, tokens))
             return True
 
-        elif(tokens[0].lower() == "!ifdef"):
-            self.PushConditional((tokens[1].count("$") == 0))
+        elif(directive == "!ifdef"):
+            self.__StartConditional((tokens[1].count("$") == 0))
             return True
 
-        elif(tokens[0].lower() == "!ifndef"):
-            self.PushConditional((tokens[1].count("$") > 0))
+        elif(directive == "!ifndef"):
+            self.__StartConditional((tokens[1].count("$") > 0))
             return True
 
-        elif(tokens[0].lower() == "!else"):
-            v = self.PopConditional()
-            self.PushConditional(not v)
+        elif(directive == "!elseif"):
+            # only evaluate when no earlier branch was taken
+            taken = self._BranchTaken[-1] if len(self._BranchTaken) > 0 else True
+            self.__NextBranch(False if taken else self.EvaluateConditional(text, tokens))
             return True
 
-        elif(tokens[0].lower() == "!endif"):
+        elif(directive == "!else"):
+            taken = self._BranchTaken[-1] if len(self._BranchTaken) > 0 else False
+            self.__NextBranch(not taken)
+            return True
+
+        elif(directive == "!endif"):
             self.PopConditional()
+            if(len(self._BranchTaken) > 0):
+                self._BranchTaken.pop()
             return True
 
         return False
 
+    #
+    # _BranchTaken tracks, for each open conditional, if any of its branches so far was active
+    #
+    def __StartConditional(self, v):
+        self.PushConditional(v)
+        self._BranchTaken.append(v)
+
+    def __NextBranch(self, v):
+        self.PopConditional()
+        self.PushConditional(v)
+        if(len(self._BranchTaken) > 0):
+            self._BranchTaken[-1] = self._BranchTaken[-1] or v
+
+    #
+    # Evaluate the expression of an !if or !elseif line
+    #
+    def EvaluateConditional(self, text, tokens):
+        if(len(tokens) < 2):
+            self.Logger.error("%s requires an expression" % tokens[0])
+            raise Exception("Invalid conditional", text)
+        try:
+            return EvaluateExpression(tokens[1])
+        except ExpressionError as e:
+            self.Logger.error("Invalid conditional: %s" % e)
+            raise Exception("Invalid conditional", text)
+
     #
     # returns true or false depending on what state of conditional you are currently in
     #
     def InActiveCode(self):
-        ret = True
-        for a in self.ConditionalStack:
-            if not a:
-                ret = False
-                break
+        return self._InactiveCount == 0
 
-        return ret
+    #
+    # Handle a directive inside an inactive block without evaluating it.
+    # Nested conditionals are only tracked so no variable replacement is needed.
+    #
+    # @param key: lower case directive keyword (LexToken.Key)
+    #
+    # @ret True if the directive was handled, False if it needs normal processing (!else, !elseif, ...)
+    #
+    def SkipInactiveDirective(self, key):
+        if key in ("!if", "!ifdef", "!ifndef"):
+            self.__SkipConditional()
+            return True
+        if key == "!endif":
+            self.ProcessConditional(key)
+            return True
+        return False
+
+    #
+    # Start a conditional nested in an inactive block.  Marking it taken keeps
+    # its !else and !elseif branches inactive as well.
+    #
+    def __SkipConditional(self):
+        self.PushConditional(False)
+        self._BranchTaken.append(True)
 
     #
     # will return true if the the line has
@@ -245,77 +965,20 @@ class BaseParser(object):
     #
 
     def IsGuidString(self, l):
-        if(l.count("{") == 2 and l.count("}") == 2 and l.count(",") == 10 and l.count("=") == 1):
-            return True
-        return False
+        return GuidLinePattern.match(l) is not None
 
     def ParseGuid(self, l):
         # parse a guid in format
         # { 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}
         # into F7FDE4A6-294C-493c-B50F-9734553BB757  (NOTE these are not same guid this is just example of format)
-        entries = l.lstrip(' {').rstrip(' }').split(',')
-        gu = entries[0].lstrip(' 0').lstrip('x').strip()
-        # pad front until 8 chars
-        while(len(gu) < 8):
-            gu = "0" + gu
-
-        gut = entries[1].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 4):
-            gut = "0" + gut
-        gu = gu + "-" + gut
-
-        gut = entries[2].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 4):
-            gut = "0" + gut
-        gu = gu + "-" + gut
-
-        # strip off extra {
-        gut = entries[3].lstrip(' { 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + "-" + gut
-
-        gut = entries[4].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        gut = entries[5].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + "-" + gut
-
-        gut = entries[6].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        gut = entries[7].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        gut = entries[8].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        gut = entries[9].lstrip(' 0').lstrip('x').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        gut = entries[10].split()[0].lstrip(' 0').lstrip('x').rstrip(' } ').strip()
-        while(len(gut) < 2):
-            gut = "0" + gut
-        gu = gu + gut
-
-        return gu.upper()
+        return str(ParseGuidValue(l)).upper()
 
     def ResetParserState(self):
         self.ConditionalStack = []
+        self._BranchTaken = []
         self.CurrentSection = ''
         self.CurrentFullSection = ''
+        self._InSectionOfInterest = True
         self.Parsed = False
 
 #
@@ -328,6 +991,43 @@ class HashFileParser(BaseParser):
     def __init__(self, log):
         BaseParser.__init__(self, log)
 
+    #
+    # Record a file the results are read from.  Call before reading the file: with a
+    # parse cache set, the file's signature is taken now so an edit made while parsing
+    # makes the stored entry stale rather than stored with the new signature.
+    #
+    def AddFileRead(self, filepath):
+        if filepath not in self.FilesRead:
+            self.FilesRead.append(filepath)
+            if self.ParseCache is not None:
+                self.FileSignatures[filepath] = GetFileSignature(filepath)
+
+    #
+    # Read a file and run it through the shared lexer
+    #
+    # @ret tuple of (raw lines, list of LexToken)
+    #
+    def TokenizeFile(self, filepath):
+        self.AddFileRead(filepath)
+        lines = (self.FileReader or _DefaultReader).ReadLines(filepath)
+        return (lines, list(TokenizeLines(lines)))
+
+    #
+    # Read a file one line at a time and run it through the shared lexer.
+    # Only the current line is held in memory and the file stays open until
+    # the generator is exhausted or closed.  With a FileReader set the file is
+    # read through it instead, so prefetched files are used.
+    #
+    # @ret generator of LexToken
+    #
+    def StreamTokens(self, filepath):
+        self.AddFileRead(filepath)
+        if self.FileReader is not None:
+            yield from TokenizeLines(self.FileReader.ReadLines(filepath))
+            return
+        with open(filepath, "r") as f:
+            yield from TokenizeLines(f)
+
     def StripComment(self, l):
         return l.split('#')[0].strip()
 
@@ -0,0 +1,410 @@
+## @file BaseParser_test.py
+# Contains unit test routines for the shared BaseParser code.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers import BaseParser as bp
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.TargetTxtParser import TargetTxtParser
+
+SAMPLE_LINES = """## @file
+# Header comment
+
+[Defines]
+  INF_VERSION = 0x00010005   # trailing comment
+  BASE_NAME   = Sample
+
+[LibraryClasses.X64, LibraryClasses.IA32]
+  BaseLib
+!include Sample.inc
+
+[Sources]
+  Sample.c
+""".splitlines(True)
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_comments_and_blank_lines_are_dropped(self):
+        tokens = list(bp.TokenizeLines(SAMPLE_LINES))
+        self.assertEqual(len(tokens), 8)
+        self.assertEqual(tokens[1].Text, "INF_VERSION = 0x00010005")
+
+    def test_tokens_are_classified(self):
+        tokens = list(bp.TokenizeLines(SAMPLE_LINES))
+        self.assertEqual(tokens[0], bp.LexToken(bp.TOKEN_SECTION, "[Defines]", 4, "defines"))
+        self.assertEqual(tokens[3].Key, "libraryclasses")
+        self.assertEqual(tokens[4], bp.LexToken(bp.TOKEN_DATA, "BaseLib", 9, None))
+        self.assertEqual(tokens[5], bp.LexToken(bp.TOKEN_DIRECTIVE, "!include Sample.inc", 10, "!include"))
+
+    def test_group_sections(self):
+        sections = bp.GroupSections(bp.TokenizeLines(SAMPLE_LINES))
+        self.assertEqual([s.Key for s in sections], ["defines", "libraryclasses", "sources"])
+        self.assertEqual(sections[1].Names, ("LibraryClasses.X64", "LibraryClasses.IA32"))
+        self.assertEqual(sections[1].LineNo, 8)
+        self.assertEqual([t.Text for t in sections[1].Entries], ["BaseLib", "!include Sample.inc"])
+
+    def test_data_before_first_section(self):
+        sections = bp.GroupSections(bp.TokenizeLines(["A = 1\n", "[Defines]\n"]))
+        self.assertEqual(len(sections), 2)
+        self.assertEqual(sections[0].Key, "")
+        self.assertEqual(sections[0].Entries[0].Text, "A = 1")
+        self.assertEqual(sections[1].Entries, [])
+
+
+class TestTokenCursor(unittest.TestCase):
+
+    def test_push(self):
+        cursor = bp.TokenCursor()
+        cursor.Push("a", ["a1", "a2"])
+        self.assertEqual(cursor.Next(), "a1")
+        # the rest of a file comes back after the pushed file
+        cursor.Push("b", ["b1"])
+        self.assertTrue(cursor.IsReading("a"))
+        self.assertEqual(cursor.Next(), "b1")
+        self.assertEqual(cursor.File, "b")
+        self.assertEqual(cursor.Next(), "a2")
+        self.assertEqual(cursor.File, "a")
+        self.assertFalse(cursor.IsReading("b"))
+        self.assertIsNone(cursor.Next())
+
+
+class TestReplaceVariables(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = bp.BaseParser("TestReplaceVariables")
+        self.parser.SetInputVars({"TARGET": "DEBUG", "ARCH": "X64"})
+        self.parser.LocalVars = {"PKG": "SamplePkg", "FLAG": "true", "DIR_X64": "Arch/X64"}
+
+    def test_simple_replacement(self):
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)/Build/$(TARGET)"), "SamplePkg/Build/DEBUG")
+
+    def test_line_without_variables(self):
+        self.assertEqual(self.parser.ReplaceVariables("MdePkg/MdePkg.dec"), "MdePkg/MdePkg.dec")
+
+    def test_booleans_are_upper_cased(self):
+        self.assertEqual(self.parser.ReplaceVariables("!if $(FLAG) == TRUE"), "!if TRUE == TRUE")
+
+    def test_nested_replacement(self):
+        self.assertEqual(self.parser.ReplaceVariables("$(DIR_$(ARCH))/File.c"), "Arch/X64/File.c")
+
+    def test_unknown_variables_are_left(self):
+        self.assertEqual(self.parser.ReplaceVariables("!ifdef $(UNKNOWN)"), "!ifdef $(UNKNOWN)")
+        self.assertEqual(self.parser.ReplaceVariables("$(DIR_$(NOPE))"), "$(DIR_$(NOPE))")
+
+    def test_local_vars_override_input_vars(self):
+        self.parser.LocalVars["TARGET"] = "RELEASE"
+        self.assertEqual(self.parser.ReplaceVariables("$(TARGET)"), "RELEASE")
+
+    def test_cache_sees_changes(self):
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)"), "SamplePkg")
+        self.parser.SetLocalVar("PKG", "OtherPkg")
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)"), "OtherPkg")
+        self.parser.SetInputVars({"ARCH": "IA32"})
+        self.assertEqual(self.parser.ReplaceVariables("$(ARCH)"), "IA32")
+        self.parser.LocalVars = {}
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)"), "$(PKG)")
+
+    def test_input_vars_kept_by_reference(self):
+        env = {}
+        self.parser.SetInputVars(env)
+        self.assertEqual(self.parser.ReplaceVariables("$(TARGET)"), "$(TARGET)")
+        env["TARGET"] = "DEBUG"
+        self.assertIs(self.parser.InputVars, env)
+        self.parser.SetInputVars(env)
+        self.assertEqual(self.parser.ReplaceVariables("$(TARGET)"), "DEBUG")
+        env["TARGET"] = "RELEASE"
+        self.parser.ClearVariableCache()
+        self.assertEqual(self.parser.ReplaceVariables("$(TARGET)"), "RELEASE")
+
+    def test_local_vars_kept_by_reference(self):
+        local_vars = {"PKG": "SamplePkg"}
+        self.parser.LocalVars = local_vars
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)"), "SamplePkg")
+        local_vars["PKG"] = "OtherPkg"
+        self.parser.ClearVariableCache()
+        self.assertEqual(self.parser.ReplaceVariables("$(PKG)"), "OtherPkg")
+
+    def test_plain_dict_not_copied_on_lookup(self):
+        class CountingDict(dict):
+            Reads = 0
+
+            def __eq__(self, other):
+                CountingDict.Reads += 1
+                return dict.__eq__(self, other)
+
+            def __ne__(self, other):
+                CountingDict.Reads += 1
+                return dict.__ne__(self, other)
+
+            def __iter__(self):
+                CountingDict.Reads += 1
+                return dict.__iter__(self)
+
+            def keys(self):
+                CountingDict.Reads += 1
+                return dict.keys(self)
+
+            def items(self):
+                CountingDict.Reads += 1
+                return dict.items(self)
+
+        env = CountingDict(("VAR%d" % i, str(i)) for i in range(500))
+        self.parser.SetInputVars(env)
+        for i in range(1000):
+            self.assertEqual(self.parser.ReplaceVariables("$(VAR%d)" % (i % 500)), str(i % 500))
+        self.assertEqual(CountingDict.Reads, 0)
+
+    def test_self_referencing_define(self):
+        self.parser.LocalVars["LOOP"] = "a$(LOOP)"
+        self.assertTrue(self.parser.ReplaceVariables("$(LOOP)").startswith("a"))
+
+
+class TestConditionals(unittest.TestCase):
+
+    def _active_lines(self, lines):
+        parser = bp.BaseParser("TestConditionals")
+        active = []
+        for line in lines:
+            if not parser.ProcessConditional(line) and parser.InActiveCode():
+                active.append(line)
+        self.assertEqual(parser.ConditionalStack, [])
+        return active
+
+    def test_if_else(self):
+        lines = ["!if 1 == 2", "a", "!else", "b", "!endif"]
+        self.assertEqual(self._active_lines(lines), ["b"])
+
+    def test_elseif_chain(self):
+        lines = ["!if 1 == 2", "a", "!elseif 2 == 2", "b", "!elseif 3 == 3", "c", "!else", "d", "!endif"]
+        self.assertEqual(self._active_lines(lines), ["b"])
+
+    def test_nested(self):
+        lines = ["!if TRUE", "!if FALSE", "a", "!else", "b", "!endif", "!endif",
+                 "!if FALSE", "c", "!else", "d", "!endif"]
+        self.assertEqual(self._active_lines(lines), ["b", "d"])
+
+    def test_nested_in_inactive_block_is_not_evaluated(self):
+        lines = ["!if FALSE", "!if $(UNDEFINED) < 1", "a", "!elseif TRUE", "b", "!else", "c", "!endif", "d",
+                 "!else", "e", "!endif"]
+        self.assertEqual(self._active_lines(lines), ["e"])
+
+    def test_skip_inactive_directive(self):
+        parser = bp.BaseParser("TestConditionals")
+        parser.ProcessConditional("!if FALSE")
+        self.assertTrue(parser.SkipInactiveDirective("!ifdef"))
+        self.assertFalse(parser.SkipInactiveDirective("!else"))
+        self.assertTrue(parser.SkipInactiveDirective("!endif"))
+        self.assertEqual(parser.ConditionalStack, [False])
+        self.assertTrue(parser.ProcessConditional("!else"))
+        self.assertTrue(parser.InActiveCode())
+
+    def test_compound_expression(self):
+        lines = ["!if (0x10 >= 16) AND NOT (DEBUG == RELEASE)", "a", "!endif"]
+        self.assertEqual(self._active_lines(lines), ["a"])
+
+    def test_invalid_expression_raises(self):
+        with self.assertRaises(Exception):
+            self._active_lines(["!if", "!endif"])
+
+
+class TestSectionsOfInterest(unittest.TestCase):
+
+    def test_everything_is_of_interest_by_default(self):
+        self.assertTrue(bp.BaseParser("").IsSectionOfInterest("[Components.X64]"))
+
+    def test_matching(self):
+        parser = bp.BaseParser("").SetSectionsOfInterest(["Components.X64", "pcds"])
+        self.assertTrue(parser.IsSectionOfInterest("[Components.X64]"))
+        self.assertTrue(parser.IsSectionOfInterest("[components.x64.DXE_DRIVER]"))
+        self.assertTrue(parser.IsSectionOfInterest("[Components.IA32, Components.X64]"))
+        self.assertTrue(parser.IsSectionOfInterest("[Pcds.X64]"))
+        self.assertTrue(parser.IsSectionOfInterest("[Defines]"))
+        self.assertFalse(parser.IsSectionOfInterest("[Components]"))
+        self.assertFalse(parser.IsSectionOfInterest("[LibraryClasses.X64]"))
+
+
+class TestFindPath(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.ws, "Pkgs", "MdePkg", "Include"))
+        os.makedirs(os.path.join(self.ws, "Pkgs", ".git"))
+        with open(os.path.join(self.ws, "Pkgs", "MdePkg", "MdePkg.dec"), "w") as f:
+            f.write("[Defines]\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _parser(self):
+        return bp.BaseParser("").SetBaseAbsPath(self.ws).SetPackagePaths(["Pkgs"])
+
+    def test_package_path_lookup(self):
+        found = self._parser().FindPath("MdePkg", "MdePkg.dec")
+        self.assertEqual(found, os.path.join(self.ws, "Pkgs", "MdePkg", "MdePkg.dec"))
+
+    def test_found_paths_are_shared(self):
+        paths = {}
+        self._parser().SetFindPathCache(paths).FindPath("MdePkg", "MdePkg.dec")
+        parser = self._parser().SetFindPathCache(paths)
+        parser._PathExists = None  # a cached lookup must not touch the file system
+        found = parser.FindPath("MdePkg", "MdePkg.dec")
+        self.assertEqual(found, os.path.join(self.ws, "Pkgs", "MdePkg", "MdePkg.dec"))
+
+    def test_found_paths_are_per_parser_by_default(self):
+        self._parser().FindPath("MdePkg", "MdePkg.dec")
+        # a file added in a location searched first is found by a new parser
+        os.makedirs(os.path.join(self.ws, "MdePkg"))
+        with open(os.path.join(self.ws, "MdePkg", "MdePkg.dec"), "w") as f:
+            f.write("")
+        found = self._parser().FindPath("MdePkg", "MdePkg.dec")
+        self.assertEqual(found, os.path.join(self.ws, "MdePkg", "MdePkg.dec"))
+
+    def test_missing_paths_are_not_cached(self):
+        self._parser().FindPath("MdePkg", "New.inf")
+        with open(os.path.join(self.ws, "Pkgs", "MdePkg", "New.inf"), "w") as f:
+            f.write("")
+        found = self._parser().FindPath("MdePkg", "New.inf")
+        self.assertEqual(found, os.path.join(self.ws, "Pkgs", "MdePkg", "New.inf"))
+
+    def test_path_index(self):
+        index = bp.PathIndex([os.path.join(self.ws, "Pkgs")])
+        self.assertTrue(index.Exists(os.path.join(self.ws, "Pkgs", "MdePkg", "Include")))
+        self.assertTrue(index.Exists(os.path.join(self.ws, "Pkgs", "MdePkg", "MdePkg.dec")))
+        self.assertFalse(index.Exists(os.path.join(self.ws, "Pkgs", "MdePkg", "Other.dec")))
+        # paths outside of the indexed roots still work
+        self.assertTrue(index.Exists(self.ws))
+        found = self._parser().SetPathIndex(index).FindPath("MdePkg", "MdePkg.dec")
+        self.assertEqual(found, os.path.join(self.ws, "Pkgs", "MdePkg", "MdePkg.dec"))
+
+    def test_path_index_ignores_directories(self):
+        with open(os.path.join(self.ws, "Pkgs", ".git", "config"), "w") as f:
+            f.write("")
+        index = bp.PathIndex([os.path.join(self.ws, "Pkgs")])
+        self.assertTrue(index.Exists(os.path.join(self.ws, "Pkgs", ".git")))
+        self.assertFalse(index.Exists(os.path.join(self.ws, "Pkgs", ".git", "config")))
+
+
+class TestGuids(unittest.TestCase):
+
+    def test_parse_guid(self):
+        parser = bp.HashFileParser("test")
+        guid = "{ 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}"
+        self.assertEqual(parser.ParseGuid(guid), "D3B36F2C-D551-11D4-9A46-0090273FC14D")
+        # leading zeros can be left out
+        guid = "{0x1, 0x2, 0x3, {0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xa, 0xb}}"
+        self.assertEqual(parser.ParseGuid(guid), "00000001-0002-0003-0405-060708090A0B")
+
+    def test_parse_guid_value(self):
+        guid = bp.ParseGuidValue("{0xD3B36F2C,0xD551,0x11D4,{0x9A,0x46,0x00,0x90,0x27,0x3F,0xC1,0x4D}}")
+        self.assertEqual(guid.bytes, bytes.fromhex("D3B36F2CD55111D49A460090273FC14D"))
+
+    def test_invalid_guid(self):
+        parser = bp.HashFileParser("test")
+        with self.assertRaises(ValueError):
+            parser.ParseGuid("{ 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1 }}")
+        with self.assertRaises(ValueError):
+            parser.ParseGuid("{ 0x1D3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}")
+
+    def test_is_guid_string(self):
+        parser = bp.HashFileParser("test")
+        self.assertTrue(parser.IsGuidString(
+            "gFooGuid = { 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}"))
+        self.assertFalse(parser.IsGuidString("gFooGuid = D3B36F2C-D551-11D4-9A46-0090273FC14D"))
+        self.assertFalse(parser.IsGuidString("{ 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90 }}"))
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.inf_path = self._write("Module.inf", "[Defines]\n  BASE_NAME = Module\n")
+        self.target_path = self._write("target.txt", "TARGET = DEBUG\nTARGET_ARCH = X64\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.ws, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def _inf(self, input_vars={}):
+        inf = InfParser().SetBaseAbsPath(self.ws).SetInputVars(input_vars)
+        inf.ParseFile(self.inf_path)
+        return inf
+
+    def _target(self):
+        target = TargetTxtParser()
+        target.ParseFile(self.target_path)
+        return target
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(self._inf().GetFingerprint(), self._inf().GetFingerprint())
+
+    def test_fingerprint_follows_inputs(self):
+        fingerprint = self._inf().GetFingerprint()
+        self.assertNotEqual(self._inf({"TARGET": "DEBUG"}).GetFingerprint(), fingerprint)
+        self._write("Module.inf", "[Defines]\n  BASE_NAME = Other\n")
+        self.assertNotEqual(self._inf().GetFingerprint(), fingerprint)
+
+    def test_target_txt_fingerprint_uses_values(self):
+        fingerprint = self._target().GetFingerprint()
+        self._write("target.txt", "# build settings\nTARGET      = DEBUG\nTARGET_ARCH = X64\n")
+        self.assertEqual(self._target().GetFingerprint(), fingerprint)
+        self._write("target.txt", "TARGET = RELEASE\nTARGET_ARCH = X64\n")
+        self.assertNotEqual(self._target().GetFingerprint(), fingerprint)
+
+    def test_combined_fingerprint(self):
+        (inf, target) = (self._inf(), self._target())
+        self.assertEqual(bp.GetCombinedFingerprint([inf, target]), bp.GetCombinedFingerprint([target, inf]))
+        self.assertNotEqual(bp.GetCombinedFingerprint([inf, target]), bp.GetCombinedFingerprint([inf]))
+
+
+class TestInternStrings(unittest.TestCase):
+
+    def test_intern_strings(self):
+        (a, b) = ("".join(["Mde", "Pkg"]), "".join(["Mde", "Pkg"]))
+        self.assertIsNot(a, b)
+        values = {"x": [a, (b, 1)]}
+        self.assertIs(bp.InternStrings(values), values)
+        self.assertIs(values["x"][0], values["x"][1][0])
+        self.assertEqual(values, {"x": ["MdePkg", ("MdePkg", 1)]})
+
+    def test_named_tuples_keep_their_type(self):
+        line = bp.InternStrings(bp.SourceLine("".join(["a", ".dsc"]), 1, "text"))
+        self.assertIsInstance(line, bp.SourceLine)
+        self.assertEqual(line.File, "a.dsc")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# @file BulkParser.py
+# Code to parse many EDK2 INF and DEC files in parallel
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.DecParser import DecParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.ParseCache import ParseCache
+from MuPythonLibrary.Uefi.EdkII.Parsers.FileReader import PrefetchFileReader
+
+# parser type for each supported file extension
+ParserTypes = {".inf": InfParser, ".dec": DecParser}
+
+# per process settings and found paths for pool workers (set by _InitWorker)
+_WorkerSettings = None
+_WorkerPaths = None
+
+
+def _InitWorker(settings):
+    global _WorkerSettings, _WorkerPaths
+    _WorkerSettings = settings
+    _WorkerPaths = {}
+
+
+def _ParseOne(filepath):
+    return _Parse(filepath, _WorkerSettings, _WorkerPaths)
+
+
+#
+# @param paths: dict of paths found by FindPath, shared by the parsers of one ParseMany call
+#
+def _NewParser(filepath, settings, paths):
+    (root_path, package_paths, input_vars, cache_dir) = settings
+    ext = os.path.splitext(filepath)[1].lower()
+    parser = ParserTypes[ext]()
+    parser.SetFindPathCache(paths)
+    return parser.SetBaseAbsPath(root_path).SetPackagePaths(package_paths).SetInputVars(input_vars)
+
+
+#
+# Parse a single file
+#
+def _Parse(filepath, settings, paths, reader=None):
+    parser = _NewParser(filepath, settings, paths)
+    cache_dir = settings[3]
+    if cache_dir is not None:
+        parser.SetParseCache(ParseCache(cache_dir))
+    parser.SetFileReader(reader)
+    parser.ParseFile(filepath)
+    # the cache, found paths and reader are per process state and shouldn't travel with the results
+    parser.ParseCache = None
+    parser.FindPathCache = {}
+    parser.FileReader = None
+    return parser
+
+
+#
+# Parse files in this process while a thread pool reads the files ahead
+#
+def _ParsePrefetched(paths, settings, read_workers):
+    found = {}
+    with PrefetchFileReader(read_workers) as reader:
+        resolved = [p if os.path.isabs(p) else _NewParser(p, settings, found).FindPath(p) for p in paths]
+        reader.Prefetch(resolved)
+        return [_Parse(p, settings, found, reader) for p in paths]
+
+
+#
+# Parse many INF and DEC files, spreading the work across a process pool.
+#
+# @param paths: iterable of INF/DEC paths (absolute, or resolvable by FindPath)
+# @param workers: number of worker processes.  None uses one per cpu.  1 parses in this process.
+# @param root_path: workspace root passed to SetBaseAbsPath
+# @param package_paths: package path list passed to SetPackagePaths
+# @param input_vars: dict passed to SetInputVars
+# @param cache_dir: optional ParseCache directory shared by all workers
+# @param read_workers: when parsing in this process, read the files ahead on this many threads
+#                      (see PrefetchFileReader).  Helps on network file systems and cold caches.
+#
+# @ret dict of path to parsed InfParser/DecParser object, in the order given.
+#      The parser objects are picklable so results can be handed to other processes.
+#
+def ParseMany(paths, workers=None, root_path="", package_paths=[], input_vars={}, cache_dir=None,
+              read_workers=None):
+    logger = logging.getLogger("BulkParser")
+    # remove duplicates but keep order
+    paths = list(dict.fromkeys(paths))
+    for p in paths:
+        if os.path.splitext(p)[1].lower() not in ParserTypes:
+            raise ValueError("Unsupported file type for bulk parsing: %s" % p)
+
+    settings = (root_path, list(package_paths), dict(input_vars), cache_dir)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+
+    if workers <= 1 and read_workers:
+        results = _ParsePrefetched(paths, settings, read_workers)
+    elif workers <= 1:
+        found = {}
+        results = [_Parse(p, settings, found) for p in paths]
+    else:
+        logger.debug("Parsing %d files with %d workers" % (len(paths), workers))
+        # batch the work so each round trip to a worker covers many small files
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_InitWorker, initargs=(settings,)) as pool:
+            results = list(pool.map(_ParseOne, paths, chunksize=chunksize))
+        # strings unpickled from different batches are separate copies
+        for parser in results:
+            parser.InternResults()
+
+    return dict(zip(paths, results))
@@ -0,0 +1,104 @@
+## @file BulkParser_test.py
+# Contains unit test routines for the BulkParser module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.BulkParser import ParseMany
+
+SAMPLE_INF = """[Defines]
+  BASE_NAME   = Sample%d
+  MODULE_TYPE = DXE_DRIVER
+
+[LibraryClasses]
+  BaseLib
+"""
+
+SAMPLE_DEC = """[Defines]
+  PACKAGE_NAME = SamplePkg
+
+[Includes]
+  Include
+"""
+
+
+class TestParseMany(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.infs = []
+        for i in range(6):
+            path = os.path.join(self.ws, "Sample%d.inf" % i)
+            with open(path, "w") as f:
+                f.write(SAMPLE_INF % i)
+            self.infs.append(path)
+        self.dec = os.path.join(self.ws, "SamplePkg.dec")
+        with open(self.dec, "w") as f:
+            f.write(SAMPLE_DEC)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _check(self, results):
+        self.assertEqual(list(results.keys()), self.infs + [self.dec])
+        for i in range(6):
+            self.assertEqual(results[self.infs[i]].Dict["BASE_NAME"], "Sample%d" % i)
+            self.assertEqual(results[self.infs[i]].LibrariesUsed, ["BaseLib"])
+        self.assertEqual(results[self.dec].IncludesUsed, ["Include"])
+
+    def test_serial(self):
+        self._check(ParseMany(self.infs + [self.dec], workers=1))
+
+    def test_process_pool(self):
+        self._check(ParseMany(self.infs + [self.dec], workers=2, cache_dir=os.path.join(self.ws, "cache")))
+
+    def test_prefetch(self):
+        self._check(ParseMany(self.infs + [self.dec], workers=1, read_workers=4))
+        results = ParseMany(["Sample1.inf"], workers=1, root_path=self.ws, read_workers=2)
+        self.assertEqual(results["Sample1.inf"].Dict["BASE_NAME"], "Sample1")
+        self.assertIsNone(results["Sample1.inf"].FileReader)
+
+    def test_relative_paths_use_root(self):
+        results = ParseMany(["Sample1.inf"], workers=1, root_path=self.ws)
+        self.assertEqual(results["Sample1.inf"].Path, self.infs[1])
+
+    def test_results_are_picklable(self):
+        results = ParseMany(self.infs, workers=1)
+        copy = pickle.loads(pickle.dumps(results))
+        self.assertEqual(copy[self.infs[0]].Dict, results[self.infs[0]].Dict)
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(ValueError):
+            ParseMany([os.path.join(self.ws, "Platform.dsc")])
+
+
+if __name__ == '__main__':
+    unittest.main()
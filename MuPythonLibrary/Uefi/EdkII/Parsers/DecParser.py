@@ -25,10 +25,24 @@
 ##
 ###
 from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import HashFileParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import ParseGuidValue
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import GroupSections, InternStrings
+from collections import namedtuple
 import os
+import sys
+
+# Value of a [Guids], [Protocols] or [Ppis] entry: registry format guid and section type
+GuidValue = namedtuple("GuidValue", ["Guid", "SectionType"])
+
+# Declaration of a pcd: default value, datum type, token and tuple of pcd section types
+PcdDeclaration = namedtuple("PcdDeclaration", ["Default", "DatumType", "Token", "Types"])
 
 
 class DecParser(HashFileParser):
+
+    ResultAttributes = ("Lines", "Dict", "LibrariesUsed", "PPIsUsed", "ProtocolsUsed", "GuidsUsed", "PcdsUsed",
+                        "IncludesUsed", "GuidValues", "PcdDeclarations", "SourceFiles", "Provenance")
+
     def __init__(self):
         HashFileParser.__init__(self, 'DecParser')
         self.Lines = []
@@ -40,6 +54,10 @@ class DecParser(HashFileParser):
         self.GuidsUsed = []
         self.PcdsUsed = []
         self.IncludesUsed = []
+        # name -> GuidValue for [Guids], [Protocols] and [Ppis]
+        self.GuidValues = {}
+        # pcd name -> PcdDeclaration
+        self.PcdDeclarations = {}
         self.Path = ""
 
     def ParseFile(self, filepath):
@@ -49,100 +67,145 @@ class DecParser(HashFileParser):
         else:
             fp = filepath
         self.Path = fp
+        if self.LoadCachedResults(fp):
+            return
+
+        (self.Lines, tokens) = self.TokenizeFile(fp)
+        # parsed values repeat across many files so they are interned (see InternStrings)
+        InternStrings(self.Lines)
+
+        for section in GroupSections(tokens):
+            key = section.Key
+            if key.startswith("defines"):
+                for token in section.Entries:
+                    if token.Text.count("=") == 1:
+                        parts = token.Text.split('=', 1)
+                        self.Dict[sys.intern(parts[0].strip())] = sys.intern(parts[1].strip())
+                        self.SetProvenance("Dict", parts[0].strip(), fp, token.LineNo)
+                continue
+
+            if key.startswith("includes"):
+                for token in section.Entries:
+                    self.IncludesUsed.append(sys.intern(token.Text))
+                    self.AddProvenance("IncludesUsed", fp, token.LineNo)
+                continue
 
-        f = open(fp, "r")
-        self.Lines = f.readlines()
-        f.close()
-        InDefinesSection = False
-        InLibraryClassSection = False
-        InProtocolsSection = False
-        InGuidsSection = False
-        InPPISection = False
-        InPcdSection = False
-        InIncludesSection = False
-
-        for line in self.Lines:
-            sline = self.StripComment(line)
-
-            if(sline is None or len(sline) < 1):
+            if key.startswith("libraryclasses"):
+                (target_name, separator) = ("LibrariesUsed", "|")
+            elif key.startswith("protocols"):
+                (target_name, separator) = ("ProtocolsUsed", "=")
+            elif key.startswith("guids"):
+                (target_name, separator) = ("GuidsUsed", "=")
+            elif key.startswith("ppis"):
+                (target_name, separator) = ("PPIsUsed", "=")
+            elif key.startswith("pcd"):
+                (target_name, separator) = ("PcdsUsed", "|")
+            else:
                 continue
 
-            if InDefinesSection:
-                if sline.strip()[0] == '[':
-                    InDefinesSection = False
-                else:
-                    if sline.count("=") == 1:
-                        tokens = sline.split('=', 1)
-                        self.Dict[tokens[0].strip()] = tokens[1].strip()
-                        continue
-
-            elif InLibraryClassSection:
-                if sline.strip()[0] == '[':
-                    InLibraryClassSection = False
-                else:
-                    t = sline.partition("|")
-                    self.LibrariesUsed.append(t[0].strip())
-                    continue
-
-            elif InProtocolsSection:
-                if sline.strip()[0] == '[':
-                    InProtocolsSection = False
-                else:
-                    t = sline.partition("=")
-                    self.ProtocolsUsed.append(t[0].strip())
-                    continue
-
-            elif InGuidsSection:
-                if sline.strip()[0] == '[':
-                    InGuidsSection = False
-                else:
-                    t = sline.partition("=")
-                    self.GuidsUsed.append(t[0].strip())
-                    continue
-
-            elif InPcdSection:
-                if sline.strip()[0] == '[':
-                    InPcdSection = False
-                else:
-                    t = sline.partition("|")
-                    self.PcdsUsed.append(t[0].strip())
-                    continue
-
-            elif InIncludesSection:
-                if sline.strip()[0] == '[':
-                    InIncludesSection = False
-                else:
-                    self.IncludesUsed.append(sline.strip())
-                    continue
-
-            elif InPPISection:
-                if (sline.strip()[0] == '['):
-                    InPPISection = False
-                else:
-                    t = sline.partition("=")
-                    self.PPIsUsed.append(t[0].strip())
-                    continue
-
-            # check for different sections
-            if sline.strip().lower().startswith('[defines'):
-                InDefinesSection = True
-
-            elif sline.strip().lower().startswith('[libraryclasses'):
-                InLibraryClassSection = True
-
-            elif sline.strip().lower().startswith('[protocols'):
-                InProtocolsSection = True
-
-            elif sline.strip().lower().startswith('[guids'):
-                InGuidsSection = True
-
-            elif sline.strip().lower().startswith('[ppis'):
-                InPPISection = True
-
-            elif sline.strip().lower().startswith('[pcd'):
-                InPcdSection = True
-
-            elif sline.strip().lower().startswith('[includes'):
-                InIncludesSection = True
+            target = getattr(self, target_name)
+            for token in section.Entries:
+                target.append(sys.intern(token.Text.partition(separator)[0].strip()))
+                self.AddProvenance(target_name, fp, token.LineNo)
+                if separator == "=":
+                    name = self._ParseGuidValue(token.Text, key)
+                    self.SetProvenance("GuidValues", name, fp, token.LineNo)
+                elif key.startswith("pcd"):
+                    name = self._ParsePcdDeclaration(token.Text, section.Names)
+                    if name is not None:
+                        self.SetProvenance("PcdDeclarations", name, fp, token.LineNo)
 
         self.Parsed = True
+        self.StoreCachedResults(fp)
+
+    #
+    # ex: gEfiFooGuid = { 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}
+    #
+    # @ret name of the guid
+    #
+    def _ParseGuidValue(self, text, key):
+        (name, sep, value) = text.partition("=")
+        value = value.strip()
+        if self.IsGuidString(text):
+            try:
+                value = self.ParseGuid(value)
+            except ValueError:
+                self.Logger.warning("Invalid GUID value for %s: %s" % (name.strip(), value))
+        else:
+            value = value.upper()
+        name = sys.intern(name.strip())
+        self.GuidValues[name] = GuidValue(sys.intern(value), sys.intern(key))
+        return name
+
+    #
+    # ex: gTokenSpaceGuid.PcdMask|0x0|UINT8|0x00000005
+    # The default value can hold | characters so the type and token are taken from the end.
+    #
+    # @ret name of the pcd or None if the declaration is invalid
+    #
+    def _ParsePcdDeclaration(self, text, names):
+        (name, sep, rest) = text.partition("|")
+        fields = rest.rsplit("|", 2)
+        if len(fields) < 3:
+            self.Logger.warning("Invalid PCD declaration: %s" % text)
+            return None
+        (default, datum_type, token) = [sys.intern(f.strip()) for f in fields]
+        types = tuple(sys.intern(n.split(".")[0].strip()) for n in names)
+        previous = self.PcdDeclarations.get(name.strip())
+        if previous is not None:
+            types = previous[3] + tuple(t for t in types if t not in previous[3])
+        name = sys.intern(name.strip())
+        self.PcdDeclarations[name] = PcdDeclaration(default, datum_type, token, types)
+        return name
+
+
+#
+# Index of the GUIDs and PCDs declared by many DEC files, for lookups by name
+# and by GUID value.
+#
+# Usage:
+#   index = DecIndex()
+#   for dec in ParseMany(dec_paths, root_path=ws).values():
+#       index.Add(dec)
+#   index.FindGuid("D3B36F2C-D551-11D4-9A46-0090273FC14D")
+#
+class DecIndex(object):
+
+    def __init__(self):
+        # name -> (guid, section type, dec path)
+        self.Guids = {}
+        # guid -> list of (name, section type, dec path)
+        self.ByGuid = {}
+        # pcd name -> (default value, datum type, token, pcd section types, dec path)
+        self.Pcds = {}
+
+    def Add(self, dec):
+        for (name, (guid, kind)) in dec.GuidValues.items():
+            self.Guids[name] = (guid, kind, dec.Path)
+            self.ByGuid.setdefault(guid, []).append((name, kind, dec.Path))
+        for (name, declaration) in dec.PcdDeclarations.items():
+            self.Pcds[name] = declaration + (dec.Path,)
+        return self
+
+    #
+    # @ret (guid, section type, dec path) for a GUID, protocol or PPI name, or None
+    #
+    def GetGuid(self, name):
+        return self.Guids.get(name)
+
+    #
+    # @param guid: registry format (D3B36F2C-D551-...) or C structure format ({ 0xD3B36F2C, ... }) guid
+    #
+    # @ret list of (name, section type, dec path) declaring the guid
+    #
+    def FindGuid(self, guid):
+        guid = guid.strip()
+        if guid.startswith("{"):
+            guid = str(ParseGuidValue(guid))
+        return self.ByGuid.get(guid.upper(), [])
+
+    #
+    # @ret (default value, datum type, token, pcd section types, dec path) for a pcd name, or None
+    #
+    def GetPcd(self, name):
+        return self.Pcds.get(name)
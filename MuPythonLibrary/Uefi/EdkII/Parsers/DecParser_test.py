@@ -0,0 +1,107 @@
+## @file DecParser_test.py
+# Contains unit test routines for the DecParser module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.DecParser import DecParser, DecIndex
+
+SAMPLE_DEC = """[Defines]
+  PACKAGE_NAME = %s
+
+[Guids]
+  gTokenSpaceGuid = { 0x914AEBE7, 0x4635, 0x459b, { 0xAA, 0x1C, 0x11, 0xE2, 0x19, 0xB0, 0x3A, 0x10 }}
+
+[Protocols.X64]
+  gFooProtocolGuid = { 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, 0x3F, 0xC1, 0x4D }}
+
+[PcdsFixedAtBuild, PcdsPatchableInModule]
+  gTokenSpaceGuid.PcdMask|0x0|UINT8|0x00000005
+
+[PcdsFixedAtBuild]
+  gTokenSpaceGuid.PcdName|L"a|b"|VOID*|0x00000006
+"""
+
+
+class TestDecParser(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _parse(self, name, contents):
+        path = os.path.join(self.ws, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        dec = DecParser().SetBaseAbsPath(self.ws)
+        dec.ParseFile(path)
+        return dec
+
+    def test_guid_values(self):
+        dec = self._parse("A.dec", SAMPLE_DEC % "APkg")
+        self.assertEqual(dec.ProtocolsUsed, ["gFooProtocolGuid"])
+        self.assertEqual(dec.GuidValues["gTokenSpaceGuid"], ("914AEBE7-4635-459B-AA1C-11E219B03A10", "guids"))
+        self.assertEqual(dec.GuidValues["gFooProtocolGuid"], ("D3B36F2C-D551-11D4-9A46-0090273FC14D", "protocols"))
+
+    def test_pcd_declarations(self):
+        dec = self._parse("A.dec", SAMPLE_DEC % "APkg")
+        self.assertEqual(dec.PcdDeclarations["gTokenSpaceGuid.PcdMask"],
+                         ("0x0", "UINT8", "0x00000005", ("PcdsFixedAtBuild", "PcdsPatchableInModule")))
+        self.assertEqual(dec.PcdDeclarations["gTokenSpaceGuid.PcdName"][0:2], ('L"a|b"', "VOID*"))
+
+    def test_provenance(self):
+        dec = self._parse("A.dec", SAMPLE_DEC % "APkg")
+        path = os.path.join(self.ws, "A.dec")
+        self.assertEqual(dec.GetKeyProvenance("Dict", "PACKAGE_NAME"), (path, 2))
+        self.assertEqual(dec.GetKeyProvenance("GuidValues", "gTokenSpaceGuid"), (path, 5))
+        self.assertEqual(dec.GetKeyProvenance("GuidValues", "gFooProtocolGuid"), (path, 8))
+        self.assertEqual(dec.GetKeyProvenance("PcdDeclarations", "gTokenSpaceGuid.PcdName"), (path, 14))
+        self.assertEqual(dec.GetSourceLocations("PcdsUsed"), [(path, 11), (path, 14)])
+        self.assertIsNone(dec.GetKeyProvenance("GuidValues", "gMissingGuid"))
+
+    def test_index(self):
+        a = self._parse("A.dec", SAMPLE_DEC % "APkg")
+        b = self._parse("B.dec", (SAMPLE_DEC % "BPkg").replace("gFooProtocolGuid", "gBarProtocolGuid"))
+        index = DecIndex().Add(a).Add(b)
+        self.assertEqual(index.GetGuid("gBarProtocolGuid"),
+                         ("D3B36F2C-D551-11D4-9A46-0090273FC14D", "protocols", b.Path))
+        self.assertEqual([e[0] for e in index.FindGuid("d3b36f2c-d551-11d4-9a46-0090273fc14d")],
+                         ["gFooProtocolGuid", "gBarProtocolGuid"])
+        self.assertEqual(len(index.FindGuid("{ 0xD3B36F2C, 0xD551, 0x11D4, { 0x9A, 0x46, 0x00, 0x90, 0x27, "
+                                            "0x3F, 0xC1, 0x4D }}")), 2)
+        self.assertEqual(index.FindGuid("00000000-0000-0000-0000-000000000000"), [])
+        self.assertEqual(index.GetPcd("gTokenSpaceGuid.PcdMask")[2], "0x00000005")
+        self.assertIsNone(index.GetPcd("gTokenSpaceGuid.PcdMissing"))
+
+
+if __name__ == '__main__':
+    unittest.main()
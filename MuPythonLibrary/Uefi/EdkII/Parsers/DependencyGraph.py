@@ -0,0 +1,168 @@
+# @file DependencyGraph.py
+# Code to find the modules of a platform affected by changed files
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+import os
+import logging
+from MuPythonLibrary.Uefi.EdkII.Parsers.DecParser import DecParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.LibraryResolver import LibraryResolver
+
+
+#
+# Normalize a path so the same file always maps to the same node
+#
+def NormalizePath(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+#
+# Graph of what every module of a platform is built from, with reverse edges
+# so the modules affected by a set of changed files can be found quickly.
+#
+# Nodes are either modules, as (inf, arch) tuples using the paths written in the
+# DSC, or normalized file and directory paths (see NormalizePath).  Edges go from
+# a node to the nodes it depends on:
+#   module        -> its inf and every library instance inf it links
+#   inf           -> its sources, its directory and the decs of its [Packages]
+#   dec           -> its include directories
+# A changed file affects the nodes of the file itself and of every directory
+# containing it, so headers under an include directory or a module directory
+# are covered without listing them.  Changing a file the DSC was parsed from
+# (the DSC or any of its includes) affects every module.
+#
+# Usage:
+#   graph = DependencyGraph()
+#   graph.AddPlatform(dsc)
+#   modules = graph.GetImpactedModules(changed_files)
+#
+class DependencyGraph(object):
+
+    def __init__(self):
+        self.Logger = logging.getLogger("DependencyGraph")
+        self.Edges = {}
+        self.ReverseEdges = {}
+        self.PlatformFiles = set()
+        self.Modules = set()
+        self._Infs = set()
+        self._Decs = {}
+
+    def AddEdge(self, node, dependency):
+        self.Edges.setdefault(node, set()).add(dependency)
+        self.ReverseEdges.setdefault(dependency, set()).add(node)
+
+    #
+    # Add every component of a parsed DSC
+    #
+    # @param dsc: parsed DscParser
+    # @param resolver: optional LibraryResolver for the dsc, to share already parsed infs
+    #
+    def AddPlatform(self, dsc, resolver=None):
+        if resolver is None:
+            resolver = LibraryResolver(dsc)
+        self.PlatformFiles.update(NormalizePath(p) for p in dsc.FilesRead)
+        for (module, libraries) in resolver.ResolveAll().items():
+            self.Modules.add(module)
+            self.AddEdge(module, self._AddInf(resolver, module[0]))
+            for inf_path in list(libraries.Libraries.values()) + libraries.NullLibraries:
+                self.AddEdge(module, self._AddInf(resolver, inf_path))
+        return self
+
+    #
+    # Add the edges of an inf the first time it is seen
+    #
+    # @ret node of the inf
+    #
+    def _AddInf(self, resolver, inf_path):
+        inf = resolver.GetInf(inf_path)
+        if inf is None:
+            return NormalizePath(resolver.Dsc.FindPath(inf_path))
+
+        node = NormalizePath(inf.Path)
+        if node in self._Infs:
+            return node
+        self._Infs.add(node)
+
+        inf_dir = os.path.dirname(node)
+        self.AddEdge(node, inf_dir)
+        for source in inf.Sources:
+            if len(source) > 0:
+                self.AddEdge(node, NormalizePath(os.path.join(inf_dir, source)))
+        for dec_path in inf.PackagesUsed:
+            self.AddEdge(node, self._AddDec(resolver, dec_path))
+        return node
+
+    def _AddDec(self, resolver, dec_path):
+        if dec_path in self._Decs:
+            return self._Decs[dec_path]
+
+        dec = DecParser().SetBaseAbsPath(resolver.Dsc.RootPath).SetPackagePaths(resolver.Dsc.PPs)
+        try:
+            dec.ParseFile(dec_path)
+        except (IOError, OSError):
+            self.Logger.error("Unable to parse %s" % dec_path)
+            node = NormalizePath(resolver.Dsc.FindPath(dec_path))
+            self._Decs[dec_path] = node
+            return node
+
+        node = NormalizePath(dec.Path)
+        self._Decs[dec_path] = node
+        for include in dec.IncludesUsed:
+            self.AddEdge(node, NormalizePath(os.path.join(os.path.dirname(node), include)))
+        return node
+
+    #
+    # Find the modules affected by changes to some files
+    #
+    # @param changed_files: iterable of file paths (absolute or relative to the current directory)
+    #
+    # @ret set of (inf, arch) module tuples
+    #
+    def GetImpactedModules(self, changed_files):
+        start = set()
+        for path in changed_files:
+            path = NormalizePath(path)
+            if path in self.PlatformFiles:
+                return set(self.Modules)
+            # the file itself and every directory containing it
+            while True:
+                if path in self.ReverseEdges:
+                    start.add(path)
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+
+        impacted = set()
+        seen = set(start)
+        pending = list(start)
+        while len(pending) > 0:
+            node = pending.pop()
+            if node in self.Modules:
+                impacted.add(node)
+            for dependent in self.ReverseEdges.get(node, ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    pending.append(dependent)
+        return impacted
@@ -0,0 +1,124 @@
+## @file DependencyGraph_test.py
+# Contains unit test routines for the DependencyGraph module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.DependencyGraph import DependencyGraph
+
+SAMPLE_FILES = {
+    "Sample.dsc": """[LibraryClasses]
+  ALib|Lib/A.inf
+
+[Components.X64, Components.IA32]
+  Drv/Drv.inf
+
+[Components.X64]
+  Drv2/Drv2.inf
+""",
+    "Pkg/Pkg.dec": """[Defines]
+  PACKAGE_NAME = Pkg
+
+[Includes]
+  Include
+""",
+    "Lib/A.inf": """[Defines]
+  LIBRARY_CLASS = ALib
+
+[Sources]
+  A.c
+  ../Shared/Shared.c
+
+[Packages]
+  Pkg/Pkg.dec
+""",
+    "Drv/Drv.inf": """[Defines]
+  MODULE_TYPE = DXE_DRIVER
+
+[Sources]
+  Drv.c
+
+[LibraryClasses]
+  ALib
+""",
+    "Drv2/Drv2.inf": """[Defines]
+  MODULE_TYPE = DXE_DRIVER
+
+[Sources]
+  Drv2.c
+""",
+}
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        for (name, contents) in SAMPLE_FILES.items():
+            path = os.path.join(self.ws, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(contents)
+        dsc = DscParser().SetBaseAbsPath(self.ws)
+        dsc.ParseFile(os.path.join(self.ws, "Sample.dsc"))
+        self.graph = DependencyGraph().AddPlatform(dsc)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _impacted(self, *names):
+        return self.graph.GetImpactedModules(os.path.join(self.ws, name) for name in names)
+
+    def test_module_source(self):
+        self.assertEqual(self._impacted("Drv2/Drv2.c"), {("Drv2/Drv2.inf", "X64")})
+        self.assertEqual(self._impacted("Drv/Drv.inf"), {("Drv/Drv.inf", "X64"), ("Drv/Drv.inf", "IA32")})
+
+    def test_library_sources(self):
+        drv = {("Drv/Drv.inf", "X64"), ("Drv/Drv.inf", "IA32")}
+        self.assertEqual(self._impacted("Lib/A.c"), drv)
+        self.assertEqual(self._impacted("Shared/Shared.c"), drv)
+        # unlisted header in the library directory
+        self.assertEqual(self._impacted("Lib/Internal.h"), drv)
+
+    def test_package_include(self):
+        self.assertEqual(self._impacted("Pkg/Include/Sub/Header.h"),
+                         {("Drv/Drv.inf", "X64"), ("Drv/Drv.inf", "IA32")})
+
+    def test_platform_files_impact_everything(self):
+        self.assertEqual(len(self._impacted("Sample.dsc")), 3)
+
+    def test_unrelated_files(self):
+        self.assertEqual(self._impacted("Other/Other.c", "Pkg/Pkg.uni"), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
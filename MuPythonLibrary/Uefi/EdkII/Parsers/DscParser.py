@@ -25,214 +25,367 @@
 ##
 ###
 from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import HashFileParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import TOKEN_DATA, TOKEN_DIRECTIVE, TOKEN_SECTION, SourceLine
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import VariableDict
 import os
+from array import array
+
+# Kinds of entries recorded in DscParser._ModelEntries
+#   (MODEL_COMPONENT, archs, inf, file, lineno)
+#   (MODEL_LIBRARY_CLASS, scopes, class name, inf)          scopes is a tuple of (arch, module type)
+#   (MODEL_COMPONENT_OVERRIDE, sub section, name, value)    applies to the last MODEL_COMPONENT
+MODEL_COMPONENT = 0
+MODEL_LIBRARY_CLASS = 1
+MODEL_COMPONENT_OVERRIDE = 2
+
+# arch and module type used for sections without them (ex: [LibraryClasses])
+COMMON = "COMMON"
+
+
+#
+# A module listed in a [Components] section, for a single arch
+#
+class DscComponent(object):
+
+    def __init__(self, inf, arch, file_name=None, lineno=None):
+        self.Inf = inf
+        self.Arch = arch
+        self.File = file_name
+        self.LineNo = lineno
+        # overrides from the <...> sub sections in the component's { } block
+        self.LibraryClasses = {}
+        self.NullLibraries = []
+        self.Pcds = {}
+        self.BuildOptions = {}
+        self.Defines = {}
+
+    def __repr__(self):
+        return "DscComponent(%s, %s)" % (self.Inf, self.Arch)
+
+
+#
+# Indexed view of the components and library classes of a DSC
+#   Components      - dict of (inf, arch) to DscComponent
+#   LibraryClasses  - dict of (arch, module type) to dict of library class name to instance inf
+#   NullLibraries   - dict of (arch, module type) to list of NULL library instance infs
+#
+class DscModel(object):
+
+    def __init__(self, entries):
+        self.Components = {}
+        self.LibraryClasses = {}
+        self.NullLibraries = {}
+        current = []
+        for entry in entries:
+            if entry[0] == MODEL_COMPONENT:
+                (kind, archs, inf, file_name, lineno) = entry
+                current = [DscComponent(inf, arch, file_name, lineno) for arch in archs]
+                for component in current:
+                    self.Components[(inf, component.Arch)] = component
+            elif entry[0] == MODEL_LIBRARY_CLASS:
+                (kind, scopes, name, inf) = entry
+                for scope in scopes:
+                    if name.upper() == "NULL":
+                        self.NullLibraries.setdefault(scope, []).append(inf)
+                    else:
+                        self.LibraryClasses.setdefault(scope, {})[name] = inf
+            else:
+                (kind, section, name, value) = entry
+                for component in current:
+                    if section == "libraryclasses":
+                        if name.upper() == "NULL":
+                            component.NullLibraries.append(value)
+                        else:
+                            component.LibraryClasses[name] = value
+                    elif section.startswith("pcds"):
+                        component.Pcds[name] = value
+                    elif section == "buildoptions":
+                        component.BuildOptions[name] = value
+                    elif section == "defines":
+                        component.Defines[name] = value
+
+    #
+    # Library class sections that apply to an arch and module type, most specific first
+    #
+    @staticmethod
+    def GetScopes(arch, module_type):
+        return ((arch, module_type), (COMMON, module_type), (arch, COMMON), (COMMON, COMMON))
+
+    def GetLibraryInstance(self, name, arch=COMMON, module_type=COMMON, component=None):
+        if component is not None and name in component.LibraryClasses:
+            return component.LibraryClasses[name]
+        for scope in self.GetScopes(arch.upper(), module_type.upper()):
+            instances = self.LibraryClasses.get(scope)
+            if instances is not None and name in instances:
+                return instances[name]
+        return None
+
+    def GetNullLibraries(self, arch=COMMON, module_type=COMMON, component=None):
+        libs = []
+        for scope in reversed(self.GetScopes(arch.upper(), module_type.upper())):
+            for inf in self.NullLibraries.get(scope, []):
+                if inf not in libs:
+                    libs.append(inf)
+        if component is not None:
+            libs.extend(inf for inf in component.NullLibraries if inf not in libs)
+        return libs
 
 
 class DscParser(HashFileParser):
 
+    ResultAttributes = ("SixMods", "ThreeMods", "OtherMods", "Libs", "LibraryClassToInstanceDict", "Pcds",
+                        "LocalVars", "Lines", "IncludeGraph", "SourceFiles", "Provenance", "_EnhancedLibs",
+                        "_ModelEntries")
+
+    # result lists that are only ever appended to while parsing
+    _AppendOnlyResults = ("SixMods", "ThreeMods", "OtherMods", "Libs", "Pcds", "Lines", "_EnhancedLibs",
+                          "_ModelEntries")
+
+    # result lists with a source location for every item (see BaseParser.AddProvenance)
+    _ProvenanceResults = ("SixMods", "ThreeMods", "OtherMods", "Libs", "Pcds")
+
     def __init__(self):
         super(DscParser, self).__init__('DscParser')
         self.SixMods = []
-        self.SixModsEnhanced = []
         self.ThreeMods = []
-        self.ThreeModsEnhanced = []
         self.OtherMods = []
         self.Libs = []
-        self.LibsEnhanced = []
+        # 1 for the Libs items listed by LibsEnhanced, 0 for the others
+        self._EnhancedLibs = array("B")
         self.ParsingInBuildOption = 0
         self.LibraryClassToInstanceDict = {}
         self.Pcds = []
-
-    def __ParseLine(self, Line, file_name=None, lineno=None):
-        line_stripped = self.StripComment(Line).strip()
-        if(len(line_stripped) < 1):
-            return ("", [], None)
-
-        line_resolved = self.ReplaceVariables(line_stripped)
-        if(self.ProcessConditional(line_resolved)):
+        self.IncludeGraph = {}
+        self.Incremental = False
+        self._IncrementalInputs = None
+        self._FileTokens = {}
+        self._IncludeMemo = {}
+        self._UsedMemo = {}
+        # files read and include edges added under the includes being processed, innermost last
+        self._FilesInProgress = [{}]
+        self._EdgesInProgress = [[]]
+        self._Streaming = False
+        self._ModelEntries = []
+        self._Model = (None, 0, None)
+        self._SectionScopes = ((COMMON, COMMON),)
+        self._ComponentSection = ""
+
+    def __ParseLine(self, Token, file_name=None):
+        self.CurrentLine = Token.LineNo
+        lineno = Token.LineNo
+        # in a disabled block only conditionals matter
+        if(not self.InActiveCode() and (Token.Kind != TOKEN_DIRECTIVE or self.SkipInactiveDirective(Token.Key))):
+            return ("", None)
+
+        # skip data in sections nobody asked for (see SetSectionsOfInterest)
+        if(Token.Kind == TOKEN_SECTION):
+            self._InSectionOfInterest = self.IsSectionOfInterest(Token.Text)
+        elif(Token.Kind == TOKEN_DATA and not self._InSectionOfInterest):
+            return ("", None)
+
+        line_resolved = self.ReplaceVariables(Token.Text)
+        if(Token.Kind == TOKEN_DIRECTIVE and self.ProcessConditional(line_resolved)):
             # was a conditional
             # Other parser returns line_resolved, [].  Need to figure out which is right
-            return ("", [], None)
+            return ("", None)
 
         # not conditional keep procesing
 
         # check if conditional is active
         if(not self.InActiveCode()):
-            return ("", [], None)
+            return ("", None)
 
         # check for include file and import lines from file
-        if(line_resolved.strip().lower().startswith("!include")):
-            # include line.
-            toks = line_resolved.split()
-            self.Logger.debug("Opening Include File %s" % os.path.join(self.RootPath, toks[1]))
-            sp = self.FindPath(toks[1])
-            lf = open(sp, "r")
-            loc = lf.readlines()
-            lf.close()
-            return ("", loc, sp)
+        if(Token.Key == "!include"):
+            return ("", self.__GetIncludePath(line_resolved))
 
         # check for new section
-        (IsNew, Section) = self.ParseNewSection(line_resolved)
+        (IsNew, Section) = self.ParseNewSection(line_resolved) if Token.Kind == TOKEN_SECTION else (False, "")
         if(IsNew):
             self.CurrentSection = Section.upper()
+            self._SectionScopes = self.__GetSectionScopes(line_resolved)
             self.Logger.debug("New Section: %s" % self.CurrentSection)
             self.Logger.debug("FullSection: %s" % self.CurrentFullSection)
-            return (line_resolved, [], None)
+            return (line_resolved, None)
+
+        # record what the indexed model needs (see GetModel)
+        if(self.CurrentSection == "COMPONENTS"):
+            self.__RecordComponentLine(line_resolved, file_name, lineno)
+        elif(self.CurrentSection == "LIBRARYCLASSES"):
+            self.__RecordLibraryClassLine(line_resolved)
 
         # process line in x64 components
         if(self.CurrentFullSection.upper() == "COMPONENTS.X64"):
             if(self.ParsingInBuildOption > 0):
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathLib(line_resolved)
-                    self.Libs.append(p)
+                    self.__AddResult("Libs", p, file_name, lineno)
                     self.Logger.debug("Found Library in a 64bit BuildOptions Section: %s" % p)
                 elif "tokenspaceguid" in line_resolved.lower() and \
                         line_resolved.count('|') > 0 and line_resolved.count('.') > 0:
                     # should be a pcd statement
                     p = line_resolved.partition('|')
-                    self.Pcds.append(p[0].strip())
+                    self.__AddResult("Pcds", p[0].strip(), file_name, lineno)
                     self.Logger.debug("Found a Pcd in a 64bit Module Override section: %s" % p[0].strip())
             else:
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathMod(line_resolved)
-                    self.SixMods.append(p)
-                    if file_name is not None and lineno is not None:
-                        self.SixModsEnhanced.append({'file': os.path.normpath(file_name), 'lineno': lineno, 'data': p})
+                    self.__AddResult("SixMods", p, file_name, lineno)
                     self.Logger.debug("Found 64bit Module: %s" % p)
 
             self.ParsingInBuildOption = self.ParsingInBuildOption + line_resolved.count("{")
             self.ParsingInBuildOption = self.ParsingInBuildOption - line_resolved.count("}")
-            return (line_resolved, [], None)
+            return (line_resolved, None)
 
         # process line in ia32 components
         elif(self.CurrentFullSection.upper() == "COMPONENTS.IA32"):
             if(self.ParsingInBuildOption > 0):
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathLib(line_resolved)
-                    self.Libs.append(p)
-                    if file_name is not None and lineno is not None:
-                        self.LibsEnhanced.append({'file': os.path.normpath(file_name), 'lineno': lineno, 'data': p})
+                    self.__AddResult("Libs", p, file_name, lineno, enhanced=True)
                     self.Logger.debug("Found Library in a 32bit BuildOptions Section: %s" % p)
                 elif "tokenspaceguid" in line_resolved.lower() and \
                         line_resolved.count('|') > 0 and line_resolved.count('.') > 0:
                     # should be a pcd statement
                     p = line_resolved.partition('|')
-                    self.Pcds.append(p[0].strip())
+                    self.__AddResult("Pcds", p[0].strip(), file_name, lineno)
                     self.Logger.debug("Found a Pcd in a 32bit Module Override section: %s" % p[0].strip())
 
             else:
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathMod(line_resolved)
-                    self.ThreeMods.append(p)
-                    if file_name is not None and lineno is not None:
-                        self.ThreeModsEnhanced.append({'file': os.path.normpath(file_name),
-                                                       'lineno': lineno, 'data': p})
+                    self.__AddResult("ThreeMods", p, file_name, lineno)
                     self.Logger.debug("Found 32bit Module: %s" % p)
 
             self.ParsingInBuildOption = self.ParsingInBuildOption + line_resolved.count("{")
             self.ParsingInBuildOption = self.ParsingInBuildOption - line_resolved.count("}")
-            return (line_resolved, [], None)
+            return (line_resolved, None)
 
         # process line in other components
         elif("COMPONENTS" in self.CurrentFullSection.upper()):
             if(self.ParsingInBuildOption > 0):
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathLib(line_resolved)
-                    self.Libs.append(p)
+                    self.__AddResult("Libs", p, file_name, lineno)
                     self.Logger.debug("Found Library in a BuildOptions Section: %s" % p)
                 elif "tokenspaceguid" in line_resolved.lower() and \
                         line_resolved.count('|') > 0 and line_resolved.count('.') > 0:
                     # should be a pcd statement
                     p = line_resolved.partition('|')
-                    self.Pcds.append(p[0].strip())
+                    self.__AddResult("Pcds", p[0].strip(), file_name, lineno)
                     self.Logger.debug("Found a Pcd in a Module Override section: %s" % p[0].strip())
 
             else:
                 if(".inf" in line_resolved.lower()):
                     p = self.ParseInfPathMod(line_resolved)
-                    self.OtherMods.append(p)
+                    self.__AddResult("OtherMods", p, file_name, lineno)
                     self.Logger.debug("Found Module: %s" % p)
 
             self.ParsingInBuildOption = self.ParsingInBuildOption + line_resolved.count("{")
             self.ParsingInBuildOption = self.ParsingInBuildOption - line_resolved.count("}")
-            return (line_resolved, [], None)
+            return (line_resolved, None)
 
         # process line in library class section (don't use full name)
         elif(self.CurrentSection.upper() == "LIBRARYCLASSES"):
             if(".inf" in line_resolved.lower()):
                 p = self.ParseInfPathLib(line_resolved)
-                self.Libs.append(p)
+                self.__AddResult("Libs", p, file_name, lineno)
                 self.Logger.debug("Found Library in Library Class Section: %s" % p)
-            return (line_resolved, [], None)
+            return (line_resolved, None)
         # process line in PCD section
         elif(self.CurrentSection.upper().startswith("PCDS")):
             if "tokenspaceguid" in line_resolved.lower() and \
                     line_resolved.count('|') > 0 and line_resolved.count('.') > 0:
                 # should be a pcd statement
                 p = line_resolved.partition('|')
-                self.Pcds.append(p[0].strip())
+                self.__AddResult("Pcds", p[0].strip(), file_name, lineno)
                 self.Logger.debug("Found a Pcd in a PCD section: %s" % p[0].strip())
-            return (line_resolved, [], None)
+            return (line_resolved, None)
+        # process line in defines (build options are handled as defines too)
+        elif(self.CurrentSection == "DEFINES") or (self.CurrentSection == "BUILDOPTIONS"):
+            self.__ParseDefine(line_resolved)
+            return (line_resolved, None)
         else:
-            return (line_resolved, [], None)
-
-    def __ParseDefineLine(self, Line):
-        line_stripped = self.StripComment(Line).strip()
-        if(len(line_stripped) < 1):
-            return ("", [])
-
-        # this line needs to be here to resolve any symbols inside the !include lines, if any
-        line_resolved = self.ReplaceVariables(line_stripped)
-        if(self.ProcessConditional(line_resolved)):
-            # was a conditional
-            # Other parser returns line_resolved, [].  Need to figure out which is right
-            return ("", [])
-
-        # not conditional keep procesing
-
-        # check if conditional is active
-        if(not self.InActiveCode()):
-            return ("", [])
-
-        # check for include file and import lines from file
-        if(line_resolved.strip().lower().startswith("!include")):
-            # include line.
-            toks = line_resolved.split()
-            self.Logger.debug("Opening Include File %s" % os.path.join(self.RootPath, toks[1]))
-            sp = self.FindPath(toks[1])
-            lf = open(sp, "r")
-            loc = lf.readlines()
-            lf.close()
-            return ("", loc)
-
-        # check for new section
-        (IsNew, Section) = self.ParseNewSection(line_resolved)
-        if(IsNew):
-            self.CurrentSection = Section.upper()
-            self.Logger.debug("New Section: %s" % self.CurrentSection)
-            self.Logger.debug("FullSection: %s" % self.CurrentFullSection)
-            return (line_resolved, [])
-
-        # process line based on section we are in
-        if(self.CurrentSection == "DEFINES") or (self.CurrentSection == "BUILDOPTIONS"):
-            if line_resolved.count("=") >= 1:
-                tokens = line_resolved.split("=", 1)
-                leftside = tokens[0].split()
-                if(len(leftside) == 2):
-                    left = leftside[1]
-                else:
-                    left = leftside[0]
-                right = tokens[1].strip()
-
-                self.LocalVars[left] = right
-                self.Logger.debug("Key,values found:  %s = %s" % (left, right))
-
-                # iterate through the existed LocalVars and try to resolve the symbols
-                for var in self.LocalVars:
-                    self.LocalVars[var] = self.ReplaceVariables(self.LocalVars[var])
-                return (line_resolved, [])
+            return (line_resolved, None)
+
+    #
+    # Append a value to a result list along with where it was read from
+    #
+    def __AddResult(self, name, value, file_name, lineno, enhanced=False):
+        getattr(self, name).append(value)
+        self.AddProvenance(name, file_name if file_name is not None else self.TargetFile, lineno)
+        if name == "Libs":
+            self._EnhancedLibs.append(1 if enhanced else 0)
+
+    #
+    # Record a define.  The value is stored as is and any variables in it that
+    # are not known yet are resolved when the define is used (see ReplaceVariables).
+    #
+    def __ParseDefine(self, line_resolved):
+        if line_resolved.count("=") < 1:
+            return
+        tokens = line_resolved.split("=", 1)
+        leftside = tokens[0].split()
+        if(len(leftside) == 2):
+            left = leftside[1]
         else:
-            return (line_resolved, [])
+            left = leftside[0]
+        right = tokens[1].strip()
+
+        self.SetLocalVar(left, right)
+        self.Logger.debug("Key,values found:  %s = %s" % (left, right))
+
+    #
+    # Get the (arch, module type) of every name in a section header
+    # ex: [LibraryClasses.X64, LibraryClasses.IA32.PEIM] -> (("X64", "COMMON"), ("IA32", "PEIM"))
+    #
+    def __GetSectionScopes(self, line_resolved):
+        scopes = []
+        for name in line_resolved.strip().lstrip("[").rstrip("]").split(","):
+            parts = [part.strip().upper() for part in name.split(".")]
+            scopes.append((parts[1] if len(parts) > 1 else COMMON, parts[2] if len(parts) > 2 else COMMON))
+        return tuple(scopes)
+
+    def __RecordComponentLine(self, line_resolved, file_name, lineno):
+        if(self.ParsingInBuildOption == 0):
+            if(".inf" in line_resolved.lower()):
+                archs = tuple(dict.fromkeys(arch for (arch, module_type) in self._SectionScopes))
+                if file_name is not None:
+                    file_name = os.path.normpath(file_name)
+                self._ModelEntries.append((MODEL_COMPONENT, archs, self.ParseInfPathMod(line_resolved), file_name,
+                                           lineno))
+                self._ComponentSection = ""
+            return
+
+        # in the { } block of a component
+        text = line_resolved.strip("{} ")
+        if(text.startswith("<")):
+            self._ComponentSection = text.partition(">")[0].lstrip("<").strip().lower()
+        elif(self._ComponentSection == "buildoptions" or self._ComponentSection == "defines"):
+            if(text.count("=") > 0):
+                (name, sep, value) = text.partition("=")
+                name = name.split()[-1] if len(name.split()) > 0 else ""
+                self._ModelEntries.append((MODEL_COMPONENT_OVERRIDE, self._ComponentSection, name, value.strip()))
+        elif(text.count("|") > 0):
+            (name, sep, value) = text.partition("|")
+            if(self._ComponentSection == "libraryclasses"):
+                value = value.strip().split()[0] if len(value.split()) > 0 else ""
+            self._ModelEntries.append((MODEL_COMPONENT_OVERRIDE, self._ComponentSection, name.strip(),
+                                       value.strip()))
+
+    def __RecordLibraryClassLine(self, line_resolved):
+        if(line_resolved.count("|") > 0):
+            (name, sep, inf) = line_resolved.partition("|")
+            inf = inf.strip().split()[0] if len(inf.split()) > 0 else ""
+            self._ModelEntries.append((MODEL_LIBRARY_CLASS, self._SectionScopes, name.strip(), inf))
+
+    #
+    # Resolve the path of the file named by an !include line
+    #
+    def __GetIncludePath(self, line_resolved):
+        toks = line_resolved.split()
+        self.Logger.debug("Opening Include File %s" % os.path.join(self.RootPath, toks[1]))
+        return self.FindPath(toks[1])
 
     def ParseInfPathLib(self, line):
         if(line.count("|") > 0):
@@ -251,43 +404,300 @@ class DscParser(HashFileParser):
     def ParseInfPathMod(self, line):
         return line.strip().split()[0].rstrip("{")
 
-    def __ProcessMore(self, lines, file_name=None):
-        if(len(lines) > 0):
-            for index in range(0, len(lines)):
-                (line, add, new_file) = self.__ParseLine(lines[index], file_name=file_name, lineno=index + 1)
-                if(len(line) > 0):
-                    self.Lines.append(line)
-                self.__ProcessMore(add, file_name=new_file)
-
-    def __ProcessDefines(self, lines):
-        if(len(lines) > 0):
-            for l in lines:
-                (line, add) = self.__ParseDefineLine(l)
-                self.__ProcessDefines(add)
+    #
+    # Process tokens one at a time, expanding include files as they are reached.
+    # Include files are read lazily so only the open files along the current
+    # include chain are held in memory.
+    #
+    # @ret generator of SourceLine for every processed line
+    #
+    def __ProcessMore(self, tokens, file_name=None):
+        for token in tokens:
+            (line, include) = self.__ParseLine(token, file_name=file_name)
+            if(len(line) > 0):
+                yield SourceLine(file_name, token.LineNo, line)
+            if include is not None:
+                yield from self.__ProcessInclude(file_name, include)
+
+    #
+    # Process the tokens of an included file.
+    #
+    # In incremental mode the effect of every include is recorded along with the
+    # state the parser was in when it was reached.  If the same file is reached in
+    # the same state on a later parse and nothing it includes has changed, the
+    # recorded effect is replayed instead of processing the file again.
+    #
+    def __ProcessInclude(self, parent, path):
+        self.__AddIncludeEdge(os.path.abspath(parent), os.path.abspath(path))
+
+        if not self.Incremental or self._Streaming:
+            yield from self.__ProcessMore(self.__GetFileTokens(path), file_name=path)
+            return
+
+        key = (path, self.__GetStateKey())
+        memo = self._IncludeMemo.get(key)
+        if memo is not None:
+            self._UsedMemo[key] = memo
+            (files, edges, appended, exit_state) = memo
+            self.__ApplyDelta(appended, exit_state)
+            # the files and includes under it are part of this parse too
+            for f in files:
+                self.__AddFileRead(f)
+            for (include_parent, include) in edges:
+                self.__AddIncludeEdge(include_parent, include)
+            return
+
+        before = self.__GetResultSizes()
+        self._FilesInProgress.append({})
+        self._EdgesInProgress.append([])
+        yield from self.__ProcessMore(self.__GetFileTokens(path), file_name=path)
+        files = self._FilesInProgress.pop()
+        edges = self._EdgesInProgress.pop()
+        self._FilesInProgress[-1].update(files)
+        self._EdgesInProgress[-1].extend(edges)
+        self._UsedMemo[key] = (files, edges, self.__GetDelta(before), self.__GetState())
+
+    def __AddIncludeEdge(self, parent, include):
+        includes = self.IncludeGraph.setdefault(parent, [])
+        if include not in includes:
+            includes.append(include)
+        if self.Incremental and not self._Streaming:
+            self._EdgesInProgress[-1].append((parent, include))
+
+    #
+    # Record a file as read by this parse and by the includes being recorded
+    #
+    def __AddFileRead(self, path):
+        self._FilesInProgress[-1][path] = None
+        self.AddFileRead(path)
+
+    #
+    # Get the tokens for a file, reusing the tokens from the last parse if it is unchanged
+    #
+    def __GetFileTokens(self, path):
+        if not self.Incremental or self._Streaming:
+            return self.StreamTokens(path)
+
+        self.__AddFileRead(path)
+        st = os.stat(path)
+        cached = self._FileTokens.get(path)
+        if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
+        tokens = self.TokenizeFile(path)[1]
+        self._FileTokens[path] = ((st.st_mtime_ns, st.st_size), tokens)
+        return tokens
+
+    #
+    # Find the files that changed since the last parse.  Forget the tokens and
+    # every recorded include effect that depends on them.
+    #
+    # @ret True if any file changed
+    #
+    def __InvalidateChangedFiles(self):
+        changed = set()
+        for (path, (signature, tokens)) in self._FileTokens.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                changed.add(path)
+                continue
+            if signature != (st.st_mtime_ns, st.st_size):
+                changed.add(path)
+
+        for path in changed:
+            del self._FileTokens[path]
+        if len(changed) > 0:
+            self.Logger.debug("Changed files: %s" % ", ".join(changed))
+            self._IncludeMemo = {k: v for (k, v) in self._IncludeMemo.items() if changed.isdisjoint(v[0])}
+        return len(changed) > 0
+
+    def __GetState(self):
+        return (dict(self.LocalVars), list(self.ConditionalStack), list(self._BranchTaken), self.CurrentSection,
+                self.CurrentFullSection, self.ParsingInBuildOption, self._InSectionOfInterest, self._SectionScopes,
+                self._ComponentSection)
+
+    def __GetStateKey(self):
+        return (frozenset(self.LocalVars.items()), tuple(self.ConditionalStack), tuple(self._BranchTaken),
+                self.CurrentSection, self.CurrentFullSection, self.ParsingInBuildOption, self._InSectionOfInterest,
+                self._SectionScopes, self._ComponentSection)
+
+    def __GetResultSizes(self):
+        lists = [len(getattr(self, name)) for name in self._AppendOnlyResults]
+        libs = {k: len(v) for (k, v) in self.LibraryClassToInstanceDict.items()}
+        locations = [len(self.Provenance.get(name, ())) for name in self._ProvenanceResults]
+        return (lists, libs, locations)
+
+    def __GetDelta(self, before):
+        (lists, libs, locations) = before
+        appended = [getattr(self, name)[size:] for (name, size) in zip(self._AppendOnlyResults, lists)]
+        new_libs = {k: v[libs.get(k, 0):] for (k, v) in self.LibraryClassToInstanceDict.items()
+                    if len(v) > libs.get(k, 0)}
+        # file ids stay valid since SourceFiles is never reset between incremental parses
+        new_locations = [self.Provenance.get(name, array("I"))[size:]
+                         for (name, size) in zip(self._ProvenanceResults, locations)]
+        return (appended, new_libs, new_locations)
+
+    def __ApplyDelta(self, delta, exit_state):
+        (appended, new_libs, new_locations) = delta
+        for (name, values) in zip(self._AppendOnlyResults, appended):
+            getattr(self, name).extend(values)
+        for (name, values) in zip(self._ProvenanceResults, new_locations):
+            if len(values) > 0:
+                self.Provenance.setdefault(name, array("I")).extend(values)
+        for (k, v) in new_libs.items():
+            self.LibraryClassToInstanceDict.setdefault(k, []).extend(v)
+        (local_vars, stack, taken, self.CurrentSection, self.CurrentFullSection, self.ParsingInBuildOption,
+         self._InSectionOfInterest, self._SectionScopes, self._ComponentSection) = exit_state
+        self.LocalVars = VariableDict(local_vars)
+        self.ConditionalStack = list(stack)
+        self._BranchTaken = list(taken)
+
+    def __ResetResults(self):
+        for name in self._AppendOnlyResults:
+            setattr(self, name, [])
+        self._EnhancedLibs = array("B")
+        self.Provenance = {}
+        self.LibraryClassToInstanceDict = {}
+        self.LocalVars = VariableDict()
+        self.ParsingInBuildOption = 0
+        self.IncludeGraph = {}
+        self.FilesRead = []
+        self.FileSignatures = {}
 
     def ResetParserState(self):
         #
         # add more DSC parser based state reset here, if necessary
         #
         super(DscParser, self).ResetParserState()
+        self._SectionScopes = ((COMMON, COMMON),)
+        self._ComponentSection = ""
+
+    #
+    # Turn incremental parsing on or off.  In incremental mode calling ParseFile
+    # again re-uses the work from the previous parse: nothing is done when no file
+    # in the include graph changed, and otherwise only changed files, the files
+    # that include them and files reached in a different define/conditional state
+    # are processed again.
+    #
+    def SetIncremental(self, enabled=True):
+        self.Incremental = enabled
+        if not enabled:
+            self._FileTokens = {}
+            self._IncludeMemo = {}
+        return self
 
     def ParseFile(self, filepath):
         self.Logger.debug("Parsing file: %s" % filepath)
         self.TargetFile = os.path.abspath(filepath)
         self.TargetFilePath = os.path.dirname(self.TargetFile)
-        f = open(os.path.join(filepath), "r")
-        # expand all the lines and include other files
-        file_lines = f.readlines()
-        self.__ProcessDefines(file_lines)
-        # reset the parser state before processing more
-        self.ResetParserState()
-        self.__ProcessMore(file_lines, file_name=os.path.join(filepath))
-        f.close()
+        self._Streaming = False
+        self.ClearVariableCache()
+        if self.LoadCachedResults(self.TargetFile):
+            # the cached results have their own SourceFiles so recorded include effects can't be replayed
+            self._IncrementalInputs = None
+            return
+
+        if self.Incremental:
+            inputs = (self.TargetFile, self.GetInputFingerprint())
+            if inputs != self._IncrementalInputs:
+                self._FileTokens = {}
+                self._IncludeMemo = {}
+            elif not self.__InvalidateChangedFiles() and self.Parsed:
+                self.Logger.debug("No changes since last parse of %s" % filepath)
+                return
+            self._IncrementalInputs = inputs
+            # includes may have been added since the last parse
+            self.FindPathCache.clear()
+            self._FilesInProgress = [{}]
+            self._EdgesInProgress = [[]]
+            self._UsedMemo = {}
+
+        if self.Incremental and self.Parsed:
+            # parsing again so start from a clean slate
+            self.__ResetResults()
+            self.ResetParserState()
+
+        # single pass over the file, expanding include files as they are reached
+        for line in self.__ProcessMore(self.__GetFileTokens(filepath), file_name=filepath):
+            self.Lines.append(line.Text)
+        self.__ResolveDefines()
+        if self.Incremental:
+            # only keep what was used so stale states don't pile up
+            self._IncludeMemo = self._UsedMemo
+        self.Parsed = True
+        self.StoreCachedResults(self.TargetFile)
+
+    #
+    # Parse a file one line at a time.  Results are collected just like ParseFile
+    # but every processed line is handed back as it is reached so callers can stop
+    # early, for example once the [Defines] section has been read.
+    # The parse cache and incremental mode are not used.
+    #
+    # @ret generator of SourceLine (file, line number, resolved text)
+    #
+    def StreamFile(self, filepath):
+        self.Logger.debug("Streaming file: %s" % filepath)
+        self.TargetFile = os.path.abspath(filepath)
+        self.TargetFilePath = os.path.dirname(self.TargetFile)
+        self._Streaming = True
+        self.ClearVariableCache()
+        for line in self.__ProcessMore(self.__GetFileTokens(filepath), file_name=filepath):
+            self.Lines.append(line.Text)
+            yield line
+        self.__ResolveDefines()
         self.Parsed = True
 
+    #
+    # now that every define is known resolve any that referenced later defines
+    #
+    def __ResolveDefines(self):
+        # assigned once so the resolved value cache stays valid while resolving
+        self.LocalVars = VariableDict((var, self.ReplaceVariables(value)) for (var, value) in self.LocalVars.items())
+
+    #
+    # Get the indexed model of the components and library classes.  It is built
+    # on first use after a parse and reused until the file is parsed again.
+    #
+    # @ret DscModel
+    #
+    def GetModel(self):
+        (entries, size, model) = self._Model
+        if entries is not self._ModelEntries or size != len(self._ModelEntries):
+            model = DscModel(self._ModelEntries)
+            self._Model = (self._ModelEntries, len(self._ModelEntries), model)
+        return model
+
+    def GetComponent(self, inf, arch):
+        return self.GetModel().Components.get((inf, arch.upper()))
+
+    def GetLibraryInstance(self, name, arch=COMMON, module_type=COMMON, component=None):
+        return self.GetModel().GetLibraryInstance(name, arch, module_type, component)
+
     def GetMods(self):
         return self.ThreeMods + self.SixMods
 
+    #
+    # Build the {'file', 'lineno', 'data'} form of a result list from its source locations
+    #
+    def __GetEnhanced(self, name, include=None):
+        values = getattr(self, name)
+        locations = self.Provenance.get(name, ())
+        return [{'file': self.SourceFiles[locations[2 * i]], 'lineno': locations[2 * i + 1], 'data': values[i]}
+                for i in range(len(locations) // 2) if include is None or include[i]]
+
+    @property
+    def SixModsEnhanced(self):
+        return self.__GetEnhanced("SixMods")
+
+    @property
+    def ThreeModsEnhanced(self):
+        return self.__GetEnhanced("ThreeMods")
+
+    # only the libraries of IA32 component overrides are listed
+    @property
+    def LibsEnhanced(self):
+        return self.__GetEnhanced("Libs", self._EnhancedLibs)
+
     def GetModsEnhanced(self):
         return self.ThreeModsEnhanced + self.SixModsEnhanced
 
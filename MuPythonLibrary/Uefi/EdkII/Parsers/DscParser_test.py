@@ -0,0 +1,299 @@
+## @file DscParser_test.py
+# Contains unit test routines for the DscParser class.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.ParseCache import ParseCache
+
+SAMPLE_DSC = """[Defines]
+  PLATFORM_NAME = Sample
+  DEFINE PKG    = SamplePkg
+!include Libs.dsc.inc
+
+[Components.X64]
+!include Components.dsc.inc
+"""
+
+SAMPLE_LIBS_INC = """[LibraryClasses]
+  BaseLib|$(PKG)/Library/BaseLib/BaseLib.inf
+"""
+
+SAMPLE_COMPONENTS_INC = """  $(PKG)/Drv1/Drv1.inf
+"""
+
+MODEL_DSC = """[LibraryClasses]
+  BaseLib|Lib/BaseLib.inf
+  DebugLib|Lib/NullDebugLib.inf
+  NULL|Lib/Common.inf
+
+[LibraryClasses.X64, LibraryClasses.IA32.PEIM]
+  DebugLib|Lib/SerialDebugLib.inf
+
+[LibraryClasses.common.DXE_DRIVER]
+  DebugLib|Lib/DxeDebugLib.inf
+  NULL|Lib/Dxe.inf
+
+[Components.IA32, Components.X64]
+  Drv/Shared.inf
+
+[Components.X64]
+  Drv/Drv.inf {
+    <LibraryClasses>
+      DebugLib|Lib/DrvDebugLib.inf
+      NULL|Lib/DrvNull.inf
+    <PcdsFixedAtBuild>
+      gTokenSpaceGuid.PcdMask|0x0
+    <BuildOptions>
+      MSFT:*_*_*_CC_FLAGS = /Od
+  }
+"""
+
+
+class CountingDscParser(DscParser):
+    def __init__(self):
+        super(CountingDscParser, self).__init__()
+        self.Tokenized = []
+
+    def TokenizeFile(self, filepath):
+        self.Tokenized.append(os.path.basename(filepath))
+        return super(CountingDscParser, self).TokenizeFile(filepath)
+
+
+class TestDscParser(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.dsc = self._write("Sample.dsc", SAMPLE_DSC)
+        self._write("Libs.dsc.inc", SAMPLE_LIBS_INC)
+        self._write("Components.dsc.inc", SAMPLE_COMPONENTS_INC)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.ws, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        # make sure a rewrite within the timestamp resolution is still seen as a change
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+        return path
+
+    def _new_parser(self):
+        return DscParser().SetBaseAbsPath(self.ws)
+
+    def test_parse_with_includes(self):
+        parser = self._new_parser()
+        parser.ParseFile(self.dsc)
+        self.assertEqual(parser.SixMods, ["SamplePkg/Drv1/Drv1.inf"])
+        self.assertEqual(parser.Libs, ["SamplePkg/Library/BaseLib/BaseLib.inf"])
+        self.assertEqual(parser.LocalVars["PLATFORM_NAME"], "Sample")
+        self.assertEqual(parser.IncludeGraph[self.dsc],
+                         [os.path.join(self.ws, "Libs.dsc.inc"), os.path.join(self.ws, "Components.dsc.inc")])
+
+    def test_defines_resolved_after_single_pass(self):
+        self._write("Defines.dsc", "[Defines]\n  DEFINE A = $(B)/A\n  DEFINE B = $(C)/B\n  DEFINE C = Root\n")
+        parser = self._new_parser()
+        parser.ParseFile(os.path.join(self.ws, "Defines.dsc"))
+        self.assertEqual(parser.LocalVars, {"A": "Root/B/A", "B": "Root/B", "C": "Root"})
+
+    def test_input_vars_changed_between_parses(self):
+        self._write("Target.dsc", "[Defines]\n  DEFINE OUT = Build/$(TARGET)\n")
+        env = {"TARGET": "DEBUG"}
+        parser = self._new_parser().SetInputVars(env)
+        parser.ParseFile(os.path.join(self.ws, "Target.dsc"))
+        self.assertEqual(parser.LocalVars["OUT"], "Build/DEBUG")
+        env["TARGET"] = "RELEASE"
+        parser.ParseFile(os.path.join(self.ws, "Target.dsc"))
+        self.assertEqual(parser.LocalVars["OUT"], "Build/RELEASE")
+
+    def test_long_chain_of_forward_referencing_defines(self):
+        depth = 500
+        lines = ["  DEFINE V%d = $(V%d)x\n" % (i, i + 1) for i in range(depth)]
+        self._write("Chain.dsc", "[Defines]\n" + "".join(lines) + "  DEFINE V%d = end\n" % depth)
+        parser = self._new_parser()
+        parser.ParseFile(os.path.join(self.ws, "Chain.dsc"))
+        self.assertEqual(parser.LocalVars["V0"], "end" + "x" * depth)
+        self.assertEqual(parser.LocalVars["V%d" % (depth - 1)], "endx")
+
+    def test_defines_referencing_each_other_are_left_unresolved(self):
+        self._write("Loop.dsc",
+                    "[Defines]\n  DEFINE A = $(B)a\n  DEFINE B = $(A)b\n  DEFINE C = $(D)c\n  DEFINE D = d\n")
+        parser = self._new_parser()
+        parser.ParseFile(os.path.join(self.ws, "Loop.dsc"))
+        self.assertEqual(parser.LocalVars["C"], "dc")
+        self.assertIn("$(", parser.LocalVars["A"])
+        self.assertIn("$(", parser.LocalVars["B"])
+
+    def test_incremental_no_changes(self):
+        parser = CountingDscParser().SetBaseAbsPath(self.ws).SetIncremental()
+        parser.ParseFile(self.dsc)
+        self.assertEqual(len(parser.Tokenized), 3)
+        parser.ParseFile(self.dsc)
+        self.assertEqual(len(parser.Tokenized), 3)
+        self.assertEqual(parser.SixMods, ["SamplePkg/Drv1/Drv1.inf"])
+
+    def test_incremental_only_changed_include_is_reprocessed(self):
+        parser = CountingDscParser().SetBaseAbsPath(self.ws).SetIncremental()
+        parser.ParseFile(self.dsc)
+        parser.Tokenized = []
+
+        self._write("Components.dsc.inc", SAMPLE_COMPONENTS_INC + "  $(PKG)/Drv2/Drv2.inf\n")
+        parser.ParseFile(self.dsc)
+        self.assertEqual(parser.Tokenized, ["Components.dsc.inc"])
+
+        fresh = self._new_parser()
+        fresh.ParseFile(self.dsc)
+        for name in DscParser.ResultAttributes:
+            self.assertEqual(getattr(parser, name), getattr(fresh, name), name)
+
+    def test_incremental_define_change_is_seen_by_includes(self):
+        parser = self._new_parser().SetIncremental()
+        parser.ParseFile(self.dsc)
+        self._write("Sample.dsc", SAMPLE_DSC.replace("SamplePkg", "OtherPkg"))
+        parser.ParseFile(self.dsc)
+        self.assertEqual(parser.SixMods, ["OtherPkg/Drv1/Drv1.inf"])
+        self.assertEqual(parser.Libs, ["OtherPkg/Library/BaseLib/BaseLib.inf"])
+
+    def test_incremental_include_added_in_earlier_search_location(self):
+        os.makedirs(os.path.join(self.ws, "Plat"))
+        os.makedirs(os.path.join(self.ws, "Pkgs"))
+        root = self._write("Plat/Root.dsc", "[Components.X64]\n!include Extra.dsc.inc\n")
+        self._write("Pkgs/Extra.dsc.inc", "  Pkg/Drv.inf\n")
+        parser = self._new_parser().SetPackagePaths(["Pkgs"]).SetIncremental()
+        parser.ParseFile(root)
+        self.assertEqual(parser.SixMods, ["Pkg/Drv.inf"])
+
+        # the include next to the dsc is searched before the package paths
+        self._write("Plat/Extra.dsc.inc", "  Plat/Drv.inf\n")
+        self._write("Plat/Root.dsc", "[Components.X64]\n!include Extra.dsc.inc\n\n")
+        parser.ParseFile(root)
+        self.assertEqual(parser.SixMods, ["Plat/Drv.inf"])
+
+    def test_incremental_replayed_include_keeps_files_and_graph(self):
+        root = self._write("Root.dsc", "[Components.X64]\n  Foo/Foo.inf\n!include A.dsc.inc\n")
+        a = self._write("A.dsc.inc", "  Bar/Bar.inf\n!include B.dsc.inc\n")
+        b = self._write("B.dsc.inc", "  Baz/Baz.inf\n")
+        cache = ParseCache(os.path.join(self.ws, "cache"))
+        parser = self._new_parser().SetIncremental().SetParseCache(cache)
+        parser.ParseFile(root)
+
+        # only the root changes so A.dsc.inc is replayed
+        self._write("Root.dsc", "[Components.X64]\n  Foo/Foo2.inf\n!include A.dsc.inc\n")
+        parser.ParseFile(root)
+        self.assertEqual(parser.SixMods, ["Foo/Foo2.inf", "Bar/Bar.inf", "Baz/Baz.inf"])
+        self.assertEqual(parser.FilesRead, [root, a, b])
+        self.assertEqual(parser.IncludeGraph, {root: [a], a: [b]})
+
+        # the cached results list the nested include so editing it is seen
+        fingerprint = parser.GetFingerprint()
+        self._write("B.dsc.inc", "  Baz/Baz.inf\n  Qux/Qux.inf\n")
+        self.assertNotEqual(parser.GetFingerprint(), fingerprint)
+        cached = self._new_parser().SetParseCache(cache)
+        cached.ParseFile(root)
+        self.assertEqual(cached.SixMods, ["Foo/Foo2.inf", "Bar/Bar.inf", "Baz/Baz.inf", "Qux/Qux.inf"])
+
+    def test_stream_file_provenance(self):
+        parser = self._new_parser()
+        lines = list(parser.StreamFile(self.dsc))
+        self.assertEqual(lines[0], (self.dsc, 1, "[Defines]"))
+        inc = os.path.join(self.ws, "Components.dsc.inc")
+        self.assertEqual(lines[-1], (inc, 1, "SamplePkg/Drv1/Drv1.inf"))
+        self.assertEqual(parser.Lines, [line.Text for line in lines])
+        self.assertEqual(parser.SixMods, ["SamplePkg/Drv1/Drv1.inf"])
+
+    def test_stream_file_stop_early(self):
+        parser = self._new_parser()
+        for line in parser.StreamFile(self.dsc):
+            if line.Text.startswith("[") and line.Text != "[Defines]":
+                break
+        self.assertEqual(parser.LocalVars["PLATFORM_NAME"], "Sample")
+        self.assertNotIn(os.path.join(self.ws, "Components.dsc.inc"), parser.FilesRead)
+        self.assertEqual(parser.SixMods, [])
+
+    def test_sections_of_interest(self):
+        parser = self._new_parser().SetSectionsOfInterest(["Components.X64"])
+        parser.ParseFile(self.dsc)
+        self.assertEqual(parser.SixMods, ["SamplePkg/Drv1/Drv1.inf"])
+        self.assertEqual(parser.Libs, [])
+        self.assertEqual(parser.LocalVars["PLATFORM_NAME"], "Sample")
+
+        parser = self._new_parser().SetSectionsOfInterest(["defines"])
+        parser.ParseFile(self.dsc)
+        self.assertEqual(parser.SixMods, [])
+        self.assertEqual(parser.Libs, [])
+        self.assertEqual(parser.LocalVars["PKG"], "SamplePkg")
+
+    def test_model_components(self):
+        parser = self._new_parser()
+        parser.ParseFile(self._write("Model.dsc", MODEL_DSC))
+        model = parser.GetModel()
+        self.assertEqual(sorted(model.Components), [("Drv/Drv.inf", "X64"), ("Drv/Shared.inf", "IA32"),
+                                                    ("Drv/Shared.inf", "X64")])
+        drv = parser.GetComponent("Drv/Drv.inf", "x64")
+        self.assertEqual(drv.LineNo, 17)
+        self.assertEqual(drv.LibraryClasses, {"DebugLib": "Lib/DrvDebugLib.inf"})
+        self.assertEqual(drv.NullLibraries, ["Lib/DrvNull.inf"])
+        self.assertEqual(drv.Pcds, {"gTokenSpaceGuid.PcdMask": "0x0"})
+        self.assertEqual(drv.BuildOptions, {"MSFT:*_*_*_CC_FLAGS": "/Od"})
+        self.assertIsNone(parser.GetComponent("Drv/Drv.inf", "IA32"))
+
+    def test_model_library_classes(self):
+        parser = self._new_parser()
+        parser.ParseFile(self._write("Model.dsc", MODEL_DSC))
+        self.assertEqual(parser.GetLibraryInstance("DebugLib"), "Lib/NullDebugLib.inf")
+        self.assertEqual(parser.GetLibraryInstance("DebugLib", "X64", "PEIM"), "Lib/SerialDebugLib.inf")
+        self.assertEqual(parser.GetLibraryInstance("DebugLib", "IA32", "PEIM"), "Lib/SerialDebugLib.inf")
+        self.assertEqual(parser.GetLibraryInstance("DebugLib", "IA32", "SEC"), "Lib/NullDebugLib.inf")
+        self.assertEqual(parser.GetLibraryInstance("DebugLib", "X64", "DXE_DRIVER"), "Lib/DxeDebugLib.inf")
+        self.assertEqual(parser.GetLibraryInstance("BaseLib", "X64", "DXE_DRIVER"), "Lib/BaseLib.inf")
+        self.assertIsNone(parser.GetLibraryInstance("PrintLib", "X64"))
+
+        drv = parser.GetComponent("Drv/Drv.inf", "X64")
+        self.assertEqual(parser.GetLibraryInstance("DebugLib", "X64", "DXE_DRIVER", drv), "Lib/DrvDebugLib.inf")
+        self.assertEqual(parser.GetModel().GetNullLibraries("X64", "DXE_DRIVER", drv),
+                         ["Lib/Common.inf", "Lib/Dxe.inf", "Lib/DrvNull.inf"])
+
+    def test_provenance(self):
+        parser = self._new_parser()
+        parser.ParseFile(self.dsc)
+        inc = os.path.join(self.ws, "Components.dsc.inc")
+        self.assertEqual(parser.GetProvenance("SixMods", 0), (inc, 1))
+        self.assertEqual(parser.GetSourceLocations("Libs"), [(os.path.join(self.ws, "Libs.dsc.inc"), 2)])
+        self.assertIsNone(parser.GetProvenance("SixMods", 1))
+        self.assertEqual(parser.SixModsEnhanced, [{"file": inc, "lineno": 1, "data": "SamplePkg/Drv1/Drv1.inf"}])
+        # only the libraries of IA32 component overrides are enhanced
+        self.assertEqual(parser.LibsEnhanced, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
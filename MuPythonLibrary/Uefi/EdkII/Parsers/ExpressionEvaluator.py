@@ -0,0 +1,235 @@
+# @file ExpressionEvaluator.py
+# Code to evaluate the expressions used by EDK2 !if and !elseif conditionals
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+#
+# Supported syntax, lowest to highest precedence:
+#   a || b, a OR b
+#   a XOR b
+#   a && b, a AND b
+#   !a, NOT a
+#   a == b, a != b, a < b, a <= b, a > b, a >= b (or EQ NE LT LE GT GE), a IN b
+#   ( expression ), values
+#
+# Values are hex (0x) or decimal integers, TRUE/FALSE, quoted strings or bare words.
+# Variables must already be replaced (see BaseParser.ReplaceVariables) so the
+# result of an expression only depends on its text and results are memoized by text.
+#
+import re
+from functools import lru_cache
+
+_TokenPattern = re.compile(r"""\s*(?:
+    (?P<string>L?"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>==|!=|<=|>=|&&|\|\||<|>|!|\(|\))
+  | (?P<word>(?:\$\([^()]*\)|[^\s()!=<>&|"'])+)
+)""", re.VERBOSE)
+
+_WordOperators = {"OR": "||", "AND": "&&", "NOT": "!", "XOR": "XOR", "IN": "IN",
+                  "EQ": "==", "NE": "!=", "LT": "<", "LE": "<=", "GT": ">", "GE": ">="}
+
+_ComparisonOperators = ("==", "!=", "<", "<=", ">", ">=", "IN")
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+#
+# Split an expression into (kind, value) tuples where kind is "op" or "value"
+#
+def _Tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TokenPattern.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ExpressionError("Unexpected character in expression '%s' at %d" % (text, pos))
+        pos = m.end()
+        if m.group("string") is not None:
+            s = m.group("string")
+            tokens.append(("value", s[2:-1] if s.startswith("L") else s[1:-1]))
+        elif m.group("op") is not None:
+            tokens.append(("op", m.group("op")))
+        elif m.group("word") is not None:
+            word = m.group("word")
+            if word.upper() in _WordOperators:
+                tokens.append(("op", _WordOperators[word.upper()]))
+            else:
+                tokens.append(("value", _ParseValue(word)))
+    return tokens
+
+
+def _ParseValue(word):
+    upper = word.upper()
+    if upper == "TRUE":
+        return True
+    if upper == "FALSE":
+        return False
+    try:
+        if upper.startswith("0X"):
+            return int(word, 16)
+        return int(word, 10)
+    except ValueError:
+        return word
+
+
+#
+# Recursive descent parser producing a tree of tuples:
+#   ("value", v), ("!", node), (op, left, right)
+#
+class _Parser(object):
+
+    def __init__(self, text):
+        self.Text = text
+        self.Tokens = _Tokenize(text)
+        self.Pos = 0
+
+    def _Peek(self):
+        return self.Tokens[self.Pos] if self.Pos < len(self.Tokens) else (None, None)
+
+    def _Next(self):
+        token = self._Peek()
+        self.Pos += 1
+        return token
+
+    def _Error(self, message):
+        return ExpressionError("%s in expression '%s'" % (message, self.Text))
+
+    def Parse(self):
+        if len(self.Tokens) == 0:
+            raise self._Error("Empty expression")
+        node = self._Binary(0)
+        if self.Pos != len(self.Tokens):
+            raise self._Error("Unexpected '%s'" % str(self._Peek()[1]))
+        return node
+
+    # binary operators by precedence level, lowest first
+    _Levels = (("||",), ("XOR",), ("&&",))
+
+    def _Binary(self, level):
+        if level == len(self._Levels):
+            return self._Unary()
+        node = self._Binary(level + 1)
+        while self._Peek()[0] == "op" and self._Peek()[1] in self._Levels[level]:
+            op = self._Next()[1]
+            node = (op, node, self._Binary(level + 1))
+        return node
+
+    def _Unary(self):
+        if self._Peek() == ("op", "!"):
+            self._Next()
+            return ("!", self._Unary())
+        return self._Comparison()
+
+    def _Comparison(self):
+        node = self._Primary()
+        if self._Peek()[0] == "op" and self._Peek()[1] in _ComparisonOperators:
+            op = self._Next()[1]
+            node = (op, node, self._Primary())
+        return node
+
+    def _Primary(self):
+        (kind, value) = self._Next()
+        if kind == "value":
+            return ("value", value)
+        if value == "(":
+            node = self._Binary(0)
+            if self._Next() != ("op", ")"):
+                raise self._Error("Missing ')'")
+            return node
+        raise self._Error("Expected a value but found '%s'" % str(value))
+
+
+def _ToBool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value != 0
+    raise ExpressionError("'%s' is not a boolean value" % value)
+
+
+def _ToInt(value):
+    if isinstance(value, int):
+        return int(value)
+    raise ExpressionError("'%s' is not a numeric value" % value)
+
+
+def _ToText(value):
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(value).upper()
+
+
+def _Evaluate(node):
+    op = node[0]
+    if op == "value":
+        return node[1]
+    if op == "!":
+        return not _ToBool(_Evaluate(node[1]))
+    if op == "||":
+        return _ToBool(_Evaluate(node[1])) or _ToBool(_Evaluate(node[2]))
+    if op == "&&":
+        return _ToBool(_Evaluate(node[1])) and _ToBool(_Evaluate(node[2]))
+    if op == "XOR":
+        return _ToBool(_Evaluate(node[1])) != _ToBool(_Evaluate(node[2]))
+
+    left = _Evaluate(node[1])
+    right = _Evaluate(node[2])
+    if op in ("==", "!="):
+        if isinstance(left, int) and isinstance(right, int):
+            equal = (left == right)
+        else:
+            equal = (_ToText(left) == _ToText(right))
+        return equal if op == "==" else not equal
+    if op == "IN":
+        return _ToText(left) in re.split(r"[\s|,]+", _ToText(right))
+    if op == "<":
+        return _ToInt(left) < _ToInt(right)
+    if op == "<=":
+        return _ToInt(left) <= _ToInt(right)
+    if op == ">":
+        return _ToInt(left) > _ToInt(right)
+    return _ToInt(left) >= _ToInt(right)
+
+
+#
+# Parse an expression into a tree that can be evaluated.  Each distinct
+# expression is only compiled once.
+#
+@lru_cache(maxsize=4096)
+def CompileExpression(text):
+    return _Parser(text).Parse()
+
+
+#
+# Evaluate a conditional expression
+#
+# @ret True or False
+# @raise ExpressionError if the expression is malformed or uses mismatched types
+#
+@lru_cache(maxsize=4096)
+def EvaluateExpression(text):
+    return _ToBool(_Evaluate(CompileExpression(text)))
@@ -0,0 +1,76 @@
+## @file ExpressionEvaluator_test.py
+# Contains unit test routines for the ExpressionEvaluator module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.ExpressionEvaluator import EvaluateExpression, ExpressionError
+
+
+class TestExpressionEvaluator(unittest.TestCase):
+
+    def test_comparisons(self):
+        self.assertTrue(EvaluateExpression("TRUE == TRUE"))
+        self.assertTrue(EvaluateExpression("DEBUG != RELEASE"))
+        self.assertTrue(EvaluateExpression("debug == DEBUG"))
+        self.assertTrue(EvaluateExpression("0x10 == 16"))
+        self.assertTrue(EvaluateExpression("0x10 >= 16"))
+        self.assertFalse(EvaluateExpression("5 > 0x10"))
+        self.assertTrue(EvaluateExpression("4 LT 5"))
+        self.assertTrue(EvaluateExpression('"VS2017" EQ VS2017'))
+
+    def test_operators_without_spaces(self):
+        self.assertTrue(EvaluateExpression("1<2&&2<3"))
+
+    def test_boolean_operators_and_precedence(self):
+        self.assertTrue(EvaluateExpression("TRUE || FALSE && FALSE"))
+        self.assertFalse(EvaluateExpression("(TRUE || FALSE) && FALSE"))
+        self.assertTrue(EvaluateExpression("NOT FALSE AND TRUE"))
+        self.assertTrue(EvaluateExpression("!(1 == 2)"))
+        self.assertTrue(EvaluateExpression("TRUE XOR FALSE"))
+        self.assertFalse(EvaluateExpression("TRUE xor TRUE"))
+        self.assertTrue(EvaluateExpression("A == B or C == C"))
+
+    def test_single_values(self):
+        self.assertTrue(EvaluateExpression("TRUE"))
+        self.assertFalse(EvaluateExpression("0"))
+
+    def test_in(self):
+        self.assertTrue(EvaluateExpression('X64 IN "IA32 X64"'))
+        self.assertFalse(EvaluateExpression('ARM in "IA32 X64"'))
+
+    def test_unresolved_variables_compare_as_text(self):
+        self.assertFalse(EvaluateExpression("$(UNDEFINED) == TRUE"))
+
+    def test_invalid_expressions(self):
+        for text in ["", "1 ==", "(1 == 1", "1 == 1)", "DEBUG", "DEBUG < 1", "1 == 1 2"]:
+            with self.assertRaises(ExpressionError, msg=text):
+                EvaluateExpression(text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,11 +25,61 @@
 ##
 ###
 from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import HashFileParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import GetSectionKey, TOKEN_DATA, TOKEN_DIRECTIVE, TOKEN_SECTION
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import TokenCursor, VariableDict
+from bisect import bisect_right
 import os
+import re
+
+# ex: 0x00040000|0x00100000
+RegionPattern = re.compile(r"^(0[xX][0-9a-fA-F]+|\d+)\s*\|\s*(0[xX][0-9a-fA-F]+|\d+)$")
+
+# region types of an FD layout, ex: FV = FVMAIN
+RegionTypes = ("FV", "FILE", "DATA", "CAPSULE", "INF")
+
+
+#
+# Index of the regions of one FD sorted by offset
+#
+# Finding the region that holds an offset is a binary search.  Regions that
+# overlap each other are reported by GetOverlaps, lookups assume there are none.
+#
+class RegionIndex(object):
+
+    def __init__(self, regions):
+        self.Regions = sorted(regions, key=lambda r: (r["Offset"], r["Size"]))
+        self._Starts = [r["Offset"] for r in self.Regions]
+
+    #
+    # @ret the region dict holding offset (relative to the FD base address) or None
+    #
+    def FindRegion(self, offset):
+        i = bisect_right(self._Starts, offset) - 1
+        if i >= 0 and offset < self.Regions[i]["Offset"] + self.Regions[i]["Size"]:
+            return self.Regions[i]
+        return None
+
+    #
+    # @ret list of (region, region) tuples for every pair of overlapping regions
+    #
+    def GetOverlaps(self):
+        overlaps = []
+        active = []
+        for region in self.Regions:
+            active = [r for r in active if r["Offset"] + r["Size"] > region["Offset"]]
+            overlaps.extend((r, region) for r in active)
+            active.append(region)
+        return overlaps
 
 
 class FdfParser(HashFileParser):
 
+    # Source locations of the lists in FVs, Capsules, FmpPayloads and Rules are recorded
+    # as "<result>.<section name>.<list>", ex: "FVs.FVMAIN.Infs", and of the defines as
+    # "Dict.<name>" (see BaseParser.AddProvenance).  FD regions hold their own File and LineNo.
+    ResultAttributes = ("Lines", "Dict", "FVs", "FDs", "Capsules", "FmpPayloads", "Rules", "LocalVars",
+                        "SourceFiles", "Provenance")
+
     def __init__(self):
         HashFileParser.__init__(self, 'ModuleFdfParser')
         self.Lines = []
@@ -37,31 +87,61 @@ class FdfParser(HashFileParser):
         self.Dict = {}  # defines dictionary
         self.FVs = {}
         self.FDs = {}
+        self.Capsules = {}
+        self.FmpPayloads = {}
+        self.Rules = {}
+        self._RegionIndexes = {}
         self.CurrentSection = []
         self.Path = ""
+        self.CurrentFile = None
+        self._Cursor = TokenCursor()
 
+    #
+    # Get the next active line with variables replaced.  Conditionals are
+    # evaluated and !include files are read in place.
+    #
+    # @ret line or None at the end of the file
+    #
     def GetNextLine(self):
-        if len(self.Lines) == 0:
-            return None
+        while True:
+            token = self._Cursor.Next()
+            if token is None:
+                return None
+            self.CurrentLine = token.LineNo
+            self.CurrentFile = self._Cursor.File
+            # in a disabled block only conditionals matter
+            if not self.InActiveCode() and (token.Kind != TOKEN_DIRECTIVE or self.SkipInactiveDirective(token.Key)):
+                continue
 
-        line = self.Lines.pop()
-        self.CurrentLine += 1
-        sline = self.StripComment(line)
+            # skip data in sections nobody asked for (see SetSectionsOfInterest)
+            if token.Kind == TOKEN_SECTION:
+                self._InSectionOfInterest = self.IsSectionOfInterest(token.Text)
+            elif token.Kind == TOKEN_DATA and not self._InSectionOfInterest:
+                continue
 
-        if(sline is None or len(sline) < 1):
-            return self.GetNextLine()
+            sline = self.ReplaceVariables(token.Text)
+            if token.Kind == TOKEN_DIRECTIVE and self.ProcessConditional(sline):
+                # was a conditional so skip
+                continue
+            if not self.InActiveCode():
+                continue
+            if token.Key == "!include":
+                self.__PushInclude(sline)
+                continue
 
-        sline = self.ReplaceVariables(sline)
-        if self.ProcessConditional(sline):
-            # was a conditional so skip
-            return self.GetNextLine()
-        if not self.InActiveCode():
-            return self.GetNextLine()
+            self._BracketCount += sline.count("{")
+            self._BracketCount -= sline.count("}")
 
-        self._BracketCount += sline.count("{")
-        self._BracketCount -= sline.count("}")
+            return sline
 
-        return sline
+    def __PushInclude(self, sline):
+        path = self.FindPath(sline.split(None, 1)[1].strip())
+        if self._Cursor.IsReading(path):
+            self.Logger.error("Skipping recursive include of %s at %s:%d" %
+                              (path, self.CurrentFile, self.CurrentLine))
+            return
+        self.Logger.debug("Opening Include File %s" % path)
+        self._Cursor.Push(path, self.StreamTokens(path))
 
     def ParseFile(self, filepath):
         self.Logger.debug("Parsing file: %s" % filepath)
@@ -70,11 +150,15 @@ class FdfParser(HashFileParser):
         else:
             fp = filepath
         self.Path = fp
+        self.TargetFilePath = os.path.dirname(os.path.abspath(fp))
+        if self.LoadCachedResults(fp):
+            return
+
+        self.ClearVariableCache()
         self.CurrentLine = 0
-        self._f = open(fp, "r")
-        self.Lines = self._f.readlines()
-        self.Lines.reverse()
-        self._f.close()
+        (self.Lines, tokens) = self.TokenizeFile(fp)
+        self._Cursor = TokenCursor()
+        self._Cursor.Push(fp, tokens)
         self._BracketCount = 0
         InDefinesSection = False
         InFdSection = False
@@ -90,7 +174,7 @@ class FdfParser(HashFileParser):
             if sline is None:
                 break
 
-            if sline.strip().startswith("[") and sline.strip().endswith("]"):  # if we're starting a new section
+            if sline.startswith("[") and sline.endswith("]"):  # if we're starting a new section
                 # this basically gets what's after the . or if it doesn't have a period
                 # the whole thing for every comma seperated item in sline
                 self.CurrentSection = [
@@ -101,21 +185,21 @@ class FdfParser(HashFileParser):
                 InCapsuleSection = False
                 InFmpPayloadSection = False
                 InRuleSection = False
-                self.LocalVars = {}
-                self.LocalVars.update(self.Dict)
+                self.LocalVars = VariableDict(self.Dict)
 
             if InDefinesSection:
                 if sline.count("=") == 1:
                     tokens = sline.replace("DEFINE", "").split('=', 1)
                     self.Dict[tokens[0].strip()] = tokens[1].strip()
+                    self.SetProvenance("Dict", tokens[0].strip(), self.CurrentFile, self.CurrentLine)
                     self.Logger.info("Key,values found:  %s = %s" % (tokens[0].strip(), tokens[1].strip()))
                     continue
 
             elif InFdSection:
                 for section in self.CurrentSection:
-                    if section not in self.FVs:
-                        self.FDs[section] = {"Dict": {}}
-                        # TODO finish the FD section
+                    if section not in self.FDs:
+                        self.FDs[section] = {"Dict": {}, "Set": {}, "Regions": []}
+                self.__ParseFdLine(sline)
                 continue
 
             elif InFvSection:
@@ -126,6 +210,7 @@ class FdfParser(HashFileParser):
                     if sline.upper().startswith("INF "):
                         InfValue = sline[3:].strip()
                         self.FVs[section]["Infs"].append(InfValue)
+                        self.AddProvenance("FVs.%s.Infs" % section, self.CurrentFile, self.CurrentLine)
                     # ex: FILE FREEFORM = 7E175642-F3AD-490A-9F8A-2E9FC6933DDD {
                     elif sline.upper().startswith("FILE"):
                         sline = sline.strip("}").strip("{").strip()  # make sure we take off the { and }
@@ -140,7 +225,10 @@ class FdfParser(HashFileParser):
                         self.FVs[section]["Files"][currentName]["type"] = currentType
 
                         while self._BracketCount > 0:  # go until we get our bracket back
-                            sline = self.GetNextLine().strip("}{ ")
+                            sline = self.GetNextLine()
+                            if sline is None:
+                                raise RuntimeError("Missing } for FILE " + currentName)
+                            sline = sline.strip("}{ ")
                             # SECTION GUIDED EE4E5898-3914-4259-9D6E-DC7BD79403CF PROCESSING_REQUIRED = TRUE
                             if sline.upper().startswith("SECTION GUIDED"):  # get the guided section
                                 section_def = sline[14:].strip().split("=", 1)
@@ -164,34 +252,181 @@ class FdfParser(HashFileParser):
                 continue
 
             elif InCapsuleSection:
-                # TODO: finish capsule section
+                self.__ParseContentsLine("Capsules", sline)
                 continue
 
             elif InFmpPayloadSection:
-                # TODO finish FMP payload section
+                self.__ParseContentsLine("FmpPayloads", sline)
                 continue
 
             elif InRuleSection:
-                # TODO finish rule section
+                self.__ParseRuleLine(sline)
                 continue
 
             # check for different sections
-            if sline.strip().lower().startswith('[defines'):
+            if not sline.startswith("["):
+                continue
+            key = GetSectionKey(sline)
+            if key.startswith('defines'):
                 InDefinesSection = True
 
-            elif sline.strip().lower().startswith('[fd.'):
+            elif key == 'fd':
                 InFdSection = True
 
-            elif sline.strip().lower().startswith('[fv.'):
+            elif key == 'fv':
                 InFvSection = True
 
-            elif sline.strip().lower().startswith('[capsule.'):
+            elif key == 'capsule':
                 InCapsuleSection = True
 
-            elif sline.strip().lower().startswith('[fmpPayload.'):
+            elif key == 'fmppayload':
                 InFmpPayloadSection = True
 
-            elif sline.strip().lower().startswith('[rule.'):
+            elif key == 'rule':
                 InRuleSection = True
 
         self.Parsed = True
+        self._RegionIndexes = {}
+        self.StoreCachedResults(fp)
+
+    #
+    # Split a "NAME = value" line
+    #
+    # @ret tuple of (name, value) or None if the line isn't an assignment
+    #
+    def __SplitAssignment(self, sline):
+        if sline.count("=") < 1:
+            return None
+        (name, sep, value) = sline.partition("=")
+        name = name.strip()
+        if name.upper().startswith(("DEFINE ", "SET ")):
+            name = name.split(None, 1)[1].strip()
+        return (name, value.strip())
+
+    #
+    # FD sections hold the FD tokens (BaseAddress, Size, ...) followed by the
+    # regions of the flash layout.  ex:
+    #   0x00040000|0x00100000
+    #   gTokenSpaceGuid.PcdFvBase|gTokenSpaceGuid.PcdFvSize
+    #   FV = FVMAIN
+    #
+    def __ParseFdLine(self, sline):
+        for section in self.CurrentSection:
+            fd = self.FDs[section]
+            regions = fd["Regions"]
+            m = RegionPattern.match(sline)
+            if m is not None:
+                regions.append({"Offset": int(m.group(1), 0), "Size": int(m.group(2), 0), "PcdOffset": None,
+                                "PcdSize": None, "Type": None, "Value": None, "LineNo": self.CurrentLine,
+                                "File": os.path.normpath(self.CurrentFile)})
+                continue
+
+            region = regions[-1] if len(regions) > 0 else None
+            if region is not None and region["Type"] == "DATA" and region["Value"].count("{") > \
+                    region["Value"].count("}"):
+                # multi line DATA = { ... }
+                region["Value"] += " " + sline
+                continue
+
+            assignment = self.__SplitAssignment(sline)
+            if region is None:
+                if assignment is None:
+                    continue
+                (name, value) = assignment
+                if sline.upper().startswith("SET "):
+                    fd["Set"][name] = value
+                elif sline.upper().startswith("DEFINE "):
+                    self.SetLocalVar(name, value)
+                else:
+                    fd["Dict"][name] = value
+            elif assignment is not None and assignment[0].upper() in RegionTypes:
+                region["Type"] = assignment[0].upper()
+                region["Value"] = assignment[1]
+            elif sline.upper().startswith("INF "):
+                region["Type"] = "INF"
+                region["Value"] = sline[3:].strip()
+            elif sline.count("|") == 1 and assignment is None:
+                (region["PcdOffset"], sep, region["PcdSize"]) = [x.strip() for x in sline.partition("|")]
+            elif sline.upper().startswith("SET ") and assignment is not None:
+                fd["Set"][assignment[0]] = assignment[1]
+
+    #
+    # Capsule and FmpPayload sections hold name = value tokens and the FDs, FVs
+    # and files that make up their contents
+    #
+    # @param target_name: "Capsules" or "FmpPayloads"
+    #
+    def __ParseContentsLine(self, target_name, sline):
+        target = getattr(self, target_name)
+        for section in self.CurrentSection:
+            contents = target.setdefault(section, {"Dict": {}, "FDs": [], "FVs": [], "Infs": [], "Files": []})
+            assignment = self.__SplitAssignment(sline)
+            if sline.upper().startswith("INF "):
+                (key, value) = ("Infs", sline[3:].strip())
+            elif sline.upper().startswith(("FILE ", "APPEND ")):
+                (key, value) = ("Files", sline)
+            elif assignment is None:
+                self.Logger.info("Unknown line: {}".format(sline))
+                continue
+            elif assignment[0].upper() in ("FD", "FV"):
+                (key, value) = (assignment[0].upper() + "s", assignment[1])
+            else:
+                contents["Dict"][assignment[0]] = assignment[1]
+                continue
+            contents[key].append(value)
+            self.AddProvenance("%s.%s.%s" % (target_name, section, key), self.CurrentFile, self.CurrentLine)
+
+    #
+    # Rule sections describe how to build the FFS file of a module type.  ex:
+    #   [Rule.Common.DXE_DRIVER]
+    #     FILE DRIVER = $(NAMED_GUID) {
+    #       PE32      PE32    $(INF_OUTPUT)/$(MODULE_NAME).efi
+    #     }
+    #
+    def __ParseRuleLine(self, sline):
+        for section in self.CurrentSection:
+            rule = self.Rules.setdefault(section, {"FileType": None, "NameGuid": None, "Options": [],
+                                                   "Sections": []})
+            text = sline.strip("{} ")
+            if len(text) == 0:
+                continue
+            if text.upper().startswith("FILE ") and rule["FileType"] is None:
+                (file_type, sep, rest) = text[4:].partition("=")
+                rule["FileType"] = file_type.strip()
+                rest = rest.split()
+                rule["NameGuid"] = rest[0] if len(rest) > 0 else None
+                rule["Options"] = rest[1:]
+            else:
+                rule["Sections"].append(text)
+                self.AddProvenance("Rules.%s.Sections" % section, self.CurrentFile, self.CurrentLine)
+
+    #
+    # Get the region index of an FD, built on first use
+    #
+    # @ret RegionIndex
+    #
+    def GetRegionIndex(self, fd_name):
+        index = self._RegionIndexes.get(fd_name)
+        if index is None:
+            index = RegionIndex(self.FDs[fd_name]["Regions"])
+            self._RegionIndexes[fd_name] = index
+        return index
+
+    #
+    # Find the region of an FD that holds an offset from the FD base address
+    #
+    # @ret region dict or None
+    #
+    def FindRegion(self, fd_name, offset):
+        return self.GetRegionIndex(fd_name).FindRegion(offset)
+
+    #
+    # Find the name of the FV placed at an offset of an FD
+    #
+    # @ret FV name or None
+    #
+    def FindFv(self, fd_name, offset):
+        region = self.FindRegion(fd_name, offset)
+        if region is not None and region["Type"] == "FV":
+            return region["Value"]
+        return None
@@ -0,0 +1,185 @@
+## @file FdfParser_test.py
+# Contains unit test routines for the FdfParser class.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.FdfParser import FdfParser
+
+SAMPLE_FDF = """[Defines]
+  DEFINE FV_NAME = FVMAIN
+
+[FV.FVMAIN]
+  INF Pkg/First.inf
+!include Pkg/Drivers.fdf.inc
+  INF Pkg/Last.inf
+"""
+
+SAMPLE_INC = """!if $(FV_NAME) == FVMAIN
+  INF Pkg/Included.inf
+!endif
+"""
+
+LAYOUT_FDF = """[FD.Flash]
+  BaseAddress = 0xFF000000
+  Size        = 0x00100000
+  SET gTokenSpaceGuid.PcdFlashBase = 0xFF000000
+
+  0x00000000|0x00010000
+  gTokenSpaceGuid.PcdVarBase|gTokenSpaceGuid.PcdVarSize
+  DATA = {
+    0x5A, 0xA5
+  }
+
+  0x00010000|0x00080000
+  FV = FVMAIN
+
+  0x00080000|0x00010000
+  FILE = Pkg/Microcode.bin
+
+[Capsule.Update]
+  CAPSULE_GUID = 6DCBD5ED-E82D-4C44-BDA1-7194199AD92A
+  FV = FVMAIN
+
+[FmpPayload.Payload]
+  IMAGE_INDEX = 0x1
+  FD = Flash
+
+[Rule.Common.PEIM]
+  FILE PEIM = $(NAMED_GUID) Checksum {
+    PE32 PE32 Align = Auto $(INF_OUTPUT)/$(MODULE_NAME).efi
+  }
+"""
+
+
+class TestFdfParser(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.ws, "Pkg"))
+        self.fdf = self._write("Pkg/Sample.fdf", SAMPLE_FDF)
+        self._write("Pkg/Drivers.fdf.inc", SAMPLE_INC)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.ws, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def test_include(self):
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self.fdf)
+        self.assertEqual(parser.FVs["FVMAIN"]["Infs"], ["Pkg/First.inf", "Pkg/Included.inf", "Pkg/Last.inf"])
+        self.assertIn(os.path.join(self.ws, "Pkg", "Drivers.fdf.inc"), parser.FilesRead)
+
+    def test_recursive_include_is_skipped(self):
+        self._write("Pkg/Drivers.fdf.inc", SAMPLE_INC + "!include Pkg/Drivers.fdf.inc\n")
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self.fdf)
+        self.assertEqual(parser.FVs["FVMAIN"]["Infs"], ["Pkg/First.inf", "Pkg/Included.inf", "Pkg/Last.inf"])
+
+    def test_long_inactive_block(self):
+        lines = ["[FV.FVMAIN]", "!if FALSE"] + ["  INF Pkg/Skipped%d.inf" % i for i in range(5000)]
+        lines += ["!endif", "  INF Pkg/Kept.inf"]
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self._write("Long.fdf", "\n".join(lines) + "\n"))
+        self.assertEqual(parser.FVs["FVMAIN"]["Infs"], ["Pkg/Kept.inf"])
+
+    def test_fd_layout(self):
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self._write("Layout.fdf", LAYOUT_FDF))
+        fd = parser.FDs["Flash"]
+        self.assertEqual(fd["Dict"], {"BaseAddress": "0xFF000000", "Size": "0x00100000"})
+        self.assertEqual(fd["Set"], {"gTokenSpaceGuid.PcdFlashBase": "0xFF000000"})
+        self.assertEqual([(r["Offset"], r["Size"], r["Type"]) for r in fd["Regions"]],
+                         [(0, 0x10000, "DATA"), (0x10000, 0x80000, "FV"), (0x80000, 0x10000, "FILE")])
+        self.assertEqual(fd["Regions"][0]["PcdOffset"], "gTokenSpaceGuid.PcdVarBase")
+        self.assertEqual(fd["Regions"][0]["Value"], "{ 0x5A, 0xA5 }")
+
+        self.assertEqual(parser.FindFv("Flash", 0x20000), "FVMAIN")
+        self.assertIsNone(parser.FindFv("Flash", 0x5))
+        self.assertEqual(parser.FindRegion("Flash", 0x80000)["Value"], "Pkg/Microcode.bin")
+        self.assertIsNone(parser.FindRegion("Flash", 0x90000))
+        self.assertEqual(parser.GetRegionIndex("Flash").GetOverlaps(), [(fd["Regions"][1], fd["Regions"][2])])
+
+    def test_capsule_payload_and_rule(self):
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self._write("Layout.fdf", LAYOUT_FDF))
+        self.assertEqual(parser.Capsules["Update"]["FVs"], ["FVMAIN"])
+        self.assertEqual(parser.Capsules["Update"]["Dict"], {"CAPSULE_GUID": "6DCBD5ED-E82D-4C44-BDA1-7194199AD92A"})
+        self.assertEqual(parser.FmpPayloads["Payload"]["FDs"], ["Flash"])
+        rule = parser.Rules["Common.PEIM"]
+        self.assertEqual((rule["FileType"], rule["NameGuid"], rule["Options"]), ("PEIM", "$(NAMED_GUID)", ["Checksum"]))
+        self.assertEqual(rule["Sections"], ["PE32 PE32 Align = Auto $(INF_OUTPUT)/$(MODULE_NAME).efi"])
+
+    def test_sections_of_interest(self):
+        contents = SAMPLE_FDF + "\n[FV.FVOTHER]\n  INF Pkg/Other.inf\n\n" + LAYOUT_FDF
+        parser = FdfParser().SetBaseAbsPath(self.ws).SetSectionsOfInterest(["FV.FVMAIN"])
+        parser.ParseFile(self._write("Pkg/All.fdf", contents))
+        self.assertEqual(parser.FVs["FVMAIN"]["Infs"], ["Pkg/First.inf", "Pkg/Included.inf", "Pkg/Last.inf"])
+        self.assertNotIn("FVOTHER", parser.FVs)
+        self.assertEqual((parser.FDs, parser.Capsules, parser.FmpPayloads, parser.Rules), ({}, {}, {}, {}))
+        self.assertEqual(parser.Dict, {"FV_NAME": "FVMAIN"})
+
+        parser = FdfParser().SetBaseAbsPath(self.ws).SetSectionsOfInterest(["fd", "rule"])
+        parser.ParseFile(os.path.join(self.ws, "Pkg", "All.fdf"))
+        self.assertEqual(parser.FVs, {})
+        self.assertEqual(list(parser.FDs), ["Flash"])
+        self.assertEqual(list(parser.Rules), ["Common.PEIM"])
+        self.assertEqual(parser.Capsules, {})
+
+    def test_provenance(self):
+        inc = os.path.normpath(os.path.join(self.ws, "Pkg", "Drivers.fdf.inc"))
+        fdf = os.path.normpath(self.fdf)
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(self.fdf)
+        self.assertEqual(parser.GetSourceLocations("FVs.FVMAIN.Infs"), [(fdf, 5), (inc, 2), (fdf, 7)])
+        self.assertEqual(parser.GetKeyProvenance("Dict", "FV_NAME"), (fdf, 2))
+
+        self._write("Pkg/Regions.fdf.inc", "  0x00000000|0x00010000\n  FV = FVMAIN\n")
+        layout = self._write("Layout.fdf", LAYOUT_FDF.replace("  0x00010000|0x00080000\n  FV = FVMAIN\n",
+                                                              "!include Pkg/Regions.fdf.inc\n"))
+        parser = FdfParser().SetBaseAbsPath(self.ws)
+        parser.ParseFile(layout)
+        layout = os.path.normpath(layout)
+        regions = parser.FDs["Flash"]["Regions"]
+        self.assertEqual([(r["File"], r["LineNo"]) for r in regions],
+                         [(layout, 6), (os.path.normpath(os.path.join(self.ws, "Pkg", "Regions.fdf.inc")), 1),
+                          (layout, 14)])
+        self.assertEqual(parser.GetProvenance("Capsules.Update.FVs", 0), (layout, 19))
+        self.assertEqual(parser.GetProvenance("FmpPayloads.Payload.FDs", 0), (layout, 23))
+        self.assertEqual(parser.GetSourceLocations("Rules.Common.PEIM.Sections"), [(layout, 27)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# @file FileReader.py
+# Code to read the files parsed by the EDK2 parsers, optionally ahead of time
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+#
+# Normalize a path so prefetched files are found however the path is written
+#
+def _GetKey(filepath):
+    return os.path.normcase(os.path.abspath(filepath))
+
+
+#
+# Reads the files of a parser.  This default reader reads each file when it is
+# asked for.  Set a reader on a parser with BaseParser.SetFileReader.
+#
+class FileReader(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    #
+    # @ret list of lines, like open(filepath, "r").readlines()
+    #
+    def ReadLines(self, filepath):
+        with open(filepath, "r") as f:
+            return f.readlines()
+
+    #
+    # Hint that files will be read soon.  Ignored by this reader.
+    #
+    def Prefetch(self, paths):
+        pass
+
+    def Close(self):
+        pass
+
+
+#
+# Reader that loads files on a thread pool ahead of time.  Prefetch queues
+# reads that run while the caller parses, so latency on network file systems
+# and cold caches overlaps with parsing.  The pool size limits how many reads
+# run at once.
+#
+# A prefetched file is handed out once and then dropped.  Files read without
+# being prefetched, or read again later, are read in the calling thread.
+#
+# Usage:
+#   with PrefetchFileReader(workers=16) as reader:
+#       reader.Prefetch(paths)
+#       for path in paths:
+#           inf = InfParser().SetFileReader(reader)
+#           inf.ParseFile(path)
+#
+class PrefetchFileReader(FileReader):
+
+    def __init__(self, workers=16):
+        self.Logger = logging.getLogger("PrefetchFileReader")
+        self._Pool = ThreadPoolExecutor(max_workers=workers)
+        self._Pending = {}
+        self._Lock = threading.Lock()
+        self.Hits = 0
+        self.Misses = 0
+
+    def Prefetch(self, paths):
+        with self._Lock:
+            if self._Pool is None:
+                raise RuntimeError("Reader is closed")
+            for path in paths:
+                key = _GetKey(path)
+                if key not in self._Pending:
+                    self._Pending[key] = self._Pool.submit(FileReader.ReadLines, self, path)
+
+    #
+    # @ret list of lines.  Errors reading a prefetched file are raised here.
+    #
+    def ReadLines(self, filepath):
+        with self._Lock:
+            future = self._Pending.pop(_GetKey(filepath), None)
+        if future is None:
+            self.Misses += 1
+            return FileReader.ReadLines(self, filepath)
+        self.Hits += 1
+        return future.result()
+
+    #
+    # Wait for the running reads and drop everything not handed out yet
+    #
+    def Close(self):
+        with self._Lock:
+            (pool, self._Pool) = (self._Pool, None)
+            pending = list(self._Pending.values())
+            self._Pending = {}
+        for future in pending:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,107 @@
+## @file FileReader_test.py
+# Contains unit test routines for the FileReader module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.FileReader import FileReader, PrefetchFileReader
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
+
+SAMPLE_INF = """[Defines]
+  BASE_NAME = Sample%d
+
+[Sources]
+  Sample.c
+"""
+
+
+class TestFileReader(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.infs = []
+        for i in range(4):
+            path = os.path.join(self.ws, "Sample%d.inf" % i)
+            with open(path, "w") as f:
+                f.write(SAMPLE_INF % i)
+            self.infs.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def test_read_lines(self):
+        with open(self.infs[0], "r") as f:
+            expected = f.readlines()
+        self.assertEqual(FileReader().ReadLines(self.infs[0]), expected)
+        with PrefetchFileReader(2) as reader:
+            reader.Prefetch(self.infs[0:1])
+            self.assertEqual(reader.ReadLines(self.infs[0]), expected)
+
+    def test_prefetch(self):
+        with PrefetchFileReader(2) as reader:
+            reader.Prefetch(self.infs)
+            # different spellings of the same path find the prefetched file
+            self.assertEqual(len(reader.ReadLines(os.path.join(self.ws, ".", "Sample0.inf"))), 5)
+            for path in self.infs[1:]:
+                reader.ReadLines(path)
+            # prefetched files are only handed out once
+            reader.ReadLines(self.infs[0])
+            self.assertEqual((reader.Hits, reader.Misses), (4, 1))
+
+    def test_prefetch_errors_are_raised_on_read(self):
+        missing = os.path.join(self.ws, "Missing.inf")
+        with PrefetchFileReader(2) as reader:
+            reader.Prefetch([missing])
+            with self.assertRaises(IOError):
+                reader.ReadLines(missing)
+
+    def test_closed_reader(self):
+        reader = PrefetchFileReader(2)
+        reader.Prefetch(self.infs)
+        reader.Close()
+        with self.assertRaises(RuntimeError):
+            reader.Prefetch(self.infs)
+        # reads still work, they just aren't prefetched
+        self.assertEqual(len(reader.ReadLines(self.infs[0])), 5)
+
+    def test_parsers_use_reader(self):
+        with PrefetchFileReader(2) as reader:
+            reader.Prefetch(self.infs)
+            for (i, path) in enumerate(self.infs):
+                inf = InfParser().SetFileReader(reader)
+                inf.ParseFile(path)
+                self.assertEqual(inf.Dict["BASE_NAME"], "Sample%d" % i)
+                self.assertEqual(inf.Sources, ["Sample.c"])
+                self.assertEqual(inf.FilesRead, [path])
+            self.assertEqual(reader.Hits, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,15 +25,41 @@
 ##
 ###
 from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import HashFileParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import GroupSections, InternStrings
+from collections import namedtuple
 import os
+import sys
 
 
+COMMON = "COMMON"
+
+#
+# One value of an INF section, for one (arch, module type) scope of the section
+#   Value       - the first field of the line (ex: a library class or source file)
+#   Extra       - tuple of the other | separated fields
+#   Arch        - arch of the scope, COMMON if the section has none
+#   ModuleType  - module type of the scope, COMMON if the section has none
+#   Usage       - usage from a ## comment (ex: CONSUMES) or None
+#
+InfEntry = namedtuple("InfEntry", ["Value", "Extra", "Arch", "ModuleType", "Usage"])
+
 AllPhases = ["SEC", "PEIM", "PEI_CORE", "DXE_DRIVER", "DXE_CORE", "DXE_RUNTIME_DRIVER", "UEFI_DRIVER",
              "SMM_CORE", "DXE_SMM_DRIVER", "UEFI_APPLICATION"]
 
 
 class InfParser(HashFileParser):
 
+    ResultAttributes = ("Lines", "Dict", "LibraryClass", "SupportedPhases", "PackagesUsed", "LibrariesUsed",
+                        "ProtocolsUsed", "GuidsUsed", "PpisUsed", "PcdsUsed", "Sources", "Binaries", "Entries",
+                        "SourceFiles", "Provenance")
+
+    # result list filled by each section type, other section types starting with
+    # "pcd" (ex: [PcdsFixedAtBuild]) also fill PcdsUsed (see GetSectionTarget)
+    SectionTargets = {"packages": "PackagesUsed", "libraryclasses": "LibrariesUsed", "protocols": "ProtocolsUsed",
+                      "ppis": "PpisUsed", "guids": "GuidsUsed", "pcd": "PcdsUsed", "pcdex": "PcdsUsed",
+                      "patchpcd": "PcdsUsed", "fixedpcd": "PcdsUsed", "featurepcd": "PcdsUsed",
+                      "sources": "Sources", "binaries": "Binaries"}
+
     def __init__(self):
         HashFileParser.__init__(self, 'ModuleInfParser')
         self.Lines = []
@@ -49,6 +75,8 @@ class InfParser(HashFileParser):
         self.PcdsUsed = []
         self.Sources = []
         self.Binaries = []
+        # section type -> list of InfEntry (value, extra fields, arch, module type, usage)
+        self.Entries = {}
         self.Path = ""
 
     def ParseFile(self, filepath):
@@ -58,134 +86,113 @@ class InfParser(HashFileParser):
         else:
             fp = filepath
         self.Path = fp
-        f = open(fp, "r")
-        self.Lines = f.readlines()
-        f.close()
-        InDefinesSection = False
-        InPackagesSection = False
-        InLibraryClassSection = False
-        InProtocolsSection = False
-        InGuidsSection = False
-        InPpiSection = False
-        InPcdSection = False
-        InSourcesSection = False
-        InBinariesSection = False
-
-        for line in self.Lines:
-            sline = self.StripComment(line)
-
-            if(sline is None or len(sline) < 1):
-                continue
-
-            if InDefinesSection:
-                if sline.strip()[0] == '[':
-                    InDefinesSection = False
-                else:
-                    if sline.count("=") == 1:
-                        tokens = sline.split('=', 1)
-                        self.Dict[tokens[0].strip()] = tokens[1].strip()
-                        #
-                        # Parse Library class and phases in special manor
-                        #
-                        if(tokens[0].strip().lower() == "library_class"):
-                            self.LibraryClass = tokens[1].partition("|")[0].strip()
-                            self.Logger.debug("Library class found")
-                            if(len(tokens[1].partition("|")[2].strip()) < 1):
-                                self.SupportedPhases = AllPhases
-                            elif(tokens[1].partition("|")[2].strip().lower() == "base"):
-                                self.SupportedPhases = AllPhases
-                            else:
-                                self.SupportedPhases = tokens[1].partition("|")[2].strip().split()
-
-                        self.Logger.debug("Key,values found:  %s = %s" % (tokens[0].strip(), tokens[1].strip()))
-
-                        continue
-
-            elif InPackagesSection:
-                if sline.strip()[0] == '[':
-                    InPackagesSection = False
-                else:
-                    self.PackagesUsed.append(sline.partition("|")[0].strip())
-                    continue
+        if self.LoadCachedResults(fp):
+            return
 
-            elif InLibraryClassSection:
-                if sline.strip()[0] == '[':
-                    InLibraryClassSection = False
-                else:
-                    self.LibrariesUsed.append(sline.partition("|")[0].strip())
-                    continue
-
-            elif InProtocolsSection:
-                if sline.strip()[0] == '[':
-                    InProtocolsSection = False
-                else:
-                    self.ProtocolsUsed.append(sline.partition("|")[0].strip())
-                    continue
+        (self.Lines, tokens) = self.TokenizeFile(fp)
+        # parsed values repeat across thousands of infs so they are interned (see InternStrings)
+        InternStrings(self.Lines)
 
-            elif InGuidsSection:
-                if sline.strip()[0] == '[':
-                    InGuidsSection = False
-                else:
-                    self.GuidsUsed.append(sline.partition("|")[0].strip())
-                    continue
+        for section in GroupSections(tokens):
+            key = section.Key
+            if key == "defines":
+                self._ParseDefines(section.Entries, fp)
+                continue
 
-            elif InPcdSection:
-                if sline.strip()[0] == '[':
-                    InPcdSection = False
-                else:
-                    self.PcdsUsed.append(sline.partition("|")[0].strip())
-                    continue
+            target_name = self.GetSectionTarget(key)
+            if target_name is None:
+                continue
+            target = getattr(self, target_name)
+            entries = self.Entries.setdefault(key, [])
+            scopes = [self._GetScope(name) for name in section.Names]
+
+            for token in section.Entries:
+                fields = token.Text.split("|")
+                value = sys.intern(fields[0].strip())
+                target.append(value)
+                self.AddProvenance(target_name, fp, token.LineNo)
+                extra = tuple(sys.intern(f.strip()) for f in fields[1:])
+                usage = self._GetUsage(token.LineNo)
+                for (arch, module_type) in scopes:
+                    entries.append(InfEntry(value, extra, arch, module_type, usage))
+                    self.AddProvenance("Entries.%s" % key, fp, token.LineNo)
 
-            elif InPpiSection:
-                if sline.strip()[0] == '[':
-                    InPpiSection = False
-                else:
-                    self.PpisUsed.append(sline.partition("|")[0].strip())
+        self.Parsed = True
+        self.StoreCachedResults(fp)
+
+    #
+    # Get the name of the result list filled by a section type
+    #
+    # @param key: lower case section type (ex: "pcdsfixedatbuild")
+    #
+    # @ret result list name or None if the section type isn't kept
+    #
+    @classmethod
+    def GetSectionTarget(cls, key):
+        target_name = cls.SectionTargets.get(key)
+        if target_name is None and key.startswith("pcd"):
+            # legacy [PcdsFixedAtBuild], [PcdsFeatureFlag], [PcdsDynamic], ...
+            target_name = "PcdsUsed"
+        return target_name
+
+    #
+    # Get the (arch, module type) of a section name. ex: LibraryClasses.X64 -> ("X64", "COMMON")
+    #
+    def _GetScope(self, name):
+        parts = [sys.intern(part.strip().upper()) for part in name.split(".")]
+        return (parts[1] if len(parts) > 1 else COMMON, parts[2] if len(parts) > 2 else COMMON)
+
+    #
+    # Get the usage comment of a line.  ex: gEfiFooProtocolGuid  ## CONSUMES -> "CONSUMES"
+    #
+    def _GetUsage(self, lineno):
+        comment = self.Lines[lineno - 1].partition("#")[2]
+        if not comment.startswith("#"):
+            return None
+        return sys.intern(comment.strip("# \t\r\n"))
+
+    #
+    # Get the values of a section type that apply to an arch and module type
+    #
+    # @param section: lower case section type (ex: "libraryclasses") or a tuple of them
+    # @param arch: arch to filter on.  Entries for common always apply.  None returns every arch.
+    # @param module_type: module type to filter on, like arch
+    #
+    # @ret list of values without duplicates, in file order
+    #
+    def GetValues(self, section, arch=None, module_type=None):
+        sections = section if isinstance(section, tuple) else (section,)
+        values = []
+        seen = set()
+        for key in sections:
+            for (value, extra, entry_arch, entry_type, usage) in self.Entries.get(key, []):
+                if arch is not None and entry_arch != COMMON and entry_arch != arch.upper():
                     continue
-
-            elif InSourcesSection:
-                if sline.strip()[0] == '[':
-                    InSourcesSection = False
-                else:
-                    self.Sources.append(sline.partition("|")[0].strip())
+                if module_type is not None and entry_type != COMMON and entry_type != module_type.upper():
                     continue
-
-            elif InBinariesSection:
-                if sline.strip()[0] == '[':
-                    InBinariesSection = False
+                if value not in seen:
+                    seen.add(value)
+                    values.append(value)
+        return values
+
+    def _ParseDefines(self, entries, fp):
+        for token in entries:
+            if token.Text.count("=") != 1:
+                continue
+            tokens = token.Text.split('=', 1)
+            self.Dict[sys.intern(tokens[0].strip())] = sys.intern(tokens[1].strip())
+            self.SetProvenance("Dict", tokens[0].strip(), fp, token.LineNo)
+            #
+            # Parse Library class and phases in special manor
+            #
+            if(tokens[0].strip().lower() == "library_class"):
+                self.LibraryClass = sys.intern(tokens[1].partition("|")[0].strip())
+                self.Logger.debug("Library class found")
+                if(len(tokens[1].partition("|")[2].strip()) < 1):
+                    self.SupportedPhases = AllPhases
+                elif(tokens[1].partition("|")[2].strip().lower() == "base"):
+                    self.SupportedPhases = AllPhases
                 else:
-                    self.Binaries.append(sline.partition("|")[0].strip())
-                    continue
-
-            # check for different sections
-            if sline.strip().lower().startswith('[defines'):
-                InDefinesSection = True
+                    self.SupportedPhases = [sys.intern(p) for p in tokens[1].partition("|")[2].strip().split()]
 
-            elif sline.strip().lower().startswith('[packages'):
-                InPackagesSection = True
-
-            elif sline.strip().lower().startswith('[libraryclasses'):
-                InLibraryClassSection = True
-
-            elif sline.strip().lower().startswith('[protocols'):
-                InProtocolsSection = True
-
-            elif sline.strip().lower().startswith('[ppis'):
-                InPpiSection = True
-
-            elif sline.strip().lower().startswith('[guids'):
-                InGuidsSection = True
-
-            elif sline.strip().lower().startswith('[pcd') or \
-                    sline.strip().lower().startswith('[patchpcd') or \
-                    sline.strip().lower().startswith('[fixedpcd') or \
-                    sline.strip().lower().startswith('[featurepcd'):
-                InPcdSection = True
-
-            elif sline.strip().lower().startswith('[sources'):
-                InSourcesSection = True
-
-            elif sline.strip().lower().startswith('[binaries'):
-                InBinariesSection = True
-
-        self.Parsed = True
+            self.Logger.debug("Key,values found:  %s = %s" % (tokens[0].strip(), tokens[1].strip()))
@@ -0,0 +1,133 @@
+## @file InfParser_test.py
+# Contains unit test routines for the InfParser class.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser, InfEntry
+
+SAMPLE_INF = """[Defines]
+  BASE_NAME   = Sample
+  MODULE_TYPE = DXE_DRIVER
+
+[Sources]
+  Sample.c
+
+[Sources.X64]
+  X64/Helper.c | MSFT
+
+[LibraryClasses]
+  BaseLib
+
+[LibraryClasses.X64, LibraryClasses.IA32.PEIM]
+  PrintLib          # not a usage comment
+
+[Protocols]
+  gEfiFooProtocolGuid   ## CONSUMES
+
+[FixedPcd.X64]
+  gTokenSpaceGuid.PcdMask   ## SOMETIMES_CONSUMES
+
+[UserExtensions.Ignored]
+  Ignored
+"""
+
+
+class TestInfParser(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        path = os.path.join(self.ws, "Sample.inf")
+        with open(path, "w") as f:
+            f.write(SAMPLE_INF)
+        self.inf = InfParser().SetBaseAbsPath(self.ws)
+        self.inf.ParseFile(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def test_flat_lists(self):
+        self.assertEqual(self.inf.Sources, ["Sample.c", "X64/Helper.c"])
+        self.assertEqual(self.inf.LibrariesUsed, ["BaseLib", "PrintLib"])
+        self.assertEqual(self.inf.PcdsUsed, ["gTokenSpaceGuid.PcdMask"])
+
+    def test_entries(self):
+        self.assertEqual(self.inf.Entries["sources"][1], ("X64/Helper.c", ("MSFT",), "X64", "COMMON", None))
+        self.assertEqual(self.inf.Entries["protocols"], [("gEfiFooProtocolGuid", (), "COMMON", "COMMON", "CONSUMES")])
+        self.assertEqual(self.inf.Entries["fixedpcd"][0][4], "SOMETIMES_CONSUMES")
+        self.assertEqual([e[2:4] for e in self.inf.Entries["libraryclasses"]],
+                         [("COMMON", "COMMON"), ("X64", "COMMON"), ("IA32", "PEIM")])
+        self.assertIsNone(self.inf.Entries["libraryclasses"][1][4])
+
+    def test_get_values(self):
+        self.assertEqual(self.inf.GetValues("sources"), ["Sample.c", "X64/Helper.c"])
+        self.assertEqual(self.inf.GetValues("sources", "IA32"), ["Sample.c"])
+        self.assertEqual(self.inf.GetValues("libraryclasses", "X64", "DXE_DRIVER"), ["BaseLib", "PrintLib"])
+        self.assertEqual(self.inf.GetValues("libraryclasses", "IA32", "DXE_DRIVER"), ["BaseLib"])
+        self.assertEqual(self.inf.GetValues("libraryclasses", "ia32", "peim"), ["BaseLib", "PrintLib"])
+        self.assertEqual(self.inf.GetValues(("pcd", "fixedpcd"), "X64"), ["gTokenSpaceGuid.PcdMask"])
+
+    def test_provenance(self):
+        path = os.path.join(self.ws, "Sample.inf")
+        self.assertEqual(self.inf.GetSourceLocations("Sources"), [(path, 6), (path, 9)])
+        self.assertEqual(self.inf.GetProvenance("PcdsUsed", 0), (path, 21))
+        self.assertEqual(self.inf.GetKeyProvenance("Dict", "MODULE_TYPE"), (path, 3))
+        self.assertEqual(self.inf.GetSourceLocations("Entries.libraryclasses"), [(path, 12), (path, 15), (path, 15)])
+        self.assertEqual(self.inf.SourceFiles, [path])
+
+    def test_entry_fields(self):
+        entry = self.inf.Entries["protocols"][0]
+        self.assertIsInstance(entry, InfEntry)
+        self.assertEqual((entry.Value, entry.Arch, entry.Usage), ("gEfiFooProtocolGuid", "COMMON", "CONSUMES"))
+
+    def test_legacy_pcd_sections(self):
+        path = os.path.join(self.ws, "Legacy.inf")
+        with open(path, "w") as f:
+            f.write("[Defines]\n  BASE_NAME = Legacy\n\n[PcdsFixedAtBuild]\n  gTokenSpaceGuid.PcdFixed\n\n"
+                    "[PcdsFeatureFlag.X64]\n  gTokenSpaceGuid.PcdFlag\n\n[PcdsDynamic]\n  gTokenSpaceGuid.PcdDyn\n\n"
+                    "[PcdsPatchableInModule]\n  gTokenSpaceGuid.PcdPatch\n")
+        inf = InfParser().SetBaseAbsPath(self.ws)
+        inf.ParseFile(path)
+        self.assertEqual(inf.PcdsUsed, ["gTokenSpaceGuid.PcdFixed", "gTokenSpaceGuid.PcdFlag",
+                                        "gTokenSpaceGuid.PcdDyn", "gTokenSpaceGuid.PcdPatch"])
+        self.assertEqual(inf.Entries["pcdsfeatureflag"], [("gTokenSpaceGuid.PcdFlag", (), "X64", "COMMON", None)])
+        self.assertEqual(inf.GetValues("pcdsdynamic"), ["gTokenSpaceGuid.PcdDyn"])
+        self.assertEqual(inf.GetProvenance("PcdsUsed", 3), (path, 14))
+
+    def test_strings_are_shared(self):
+        other = InfParser().SetBaseAbsPath(self.ws)
+        other.ParseFile(os.path.join(self.ws, "Sample.inf"))
+        self.assertIs(other.LibrariesUsed[0], self.inf.LibrariesUsed[0])
+        self.assertIs(other.Entries["sources"][1].Extra[0], self.inf.Entries["sources"][1].Extra[0])
+        self.assertIs(other.Dict["MODULE_TYPE"], self.inf.Dict["MODULE_TYPE"])
+
+
+if __name__ == '__main__':
+    unittest.main()
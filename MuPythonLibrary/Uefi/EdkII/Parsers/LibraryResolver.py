@@ -0,0 +1,208 @@
+# @file LibraryResolver.py
+# Code to work out which library instances each module in a DSC links
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+import logging
+from collections import namedtuple
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser, AllPhases
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import COMMON
+
+#
+# The libraries linked by one module for one arch
+#   Inf            - module inf path as written in the DSC
+#   Arch           - arch the module was resolved for
+#   ModuleType     - MODULE_TYPE of the module
+#   Libraries      - dict of library class name to instance inf
+#   NullLibraries  - list of NULL library instance infs
+#   Missing        - sorted list of library classes no instance was found for
+#   Unsupported    - sorted list of (class, instance inf) where the instance doesn't support ModuleType
+#
+ModuleLibraries = namedtuple("ModuleLibraries", ["Inf", "Arch", "ModuleType", "Libraries", "NullLibraries",
+                                                 "Missing", "Unsupported"])
+
+_EmptyClosure = (frozenset(), frozenset())
+
+
+#
+# Resolve the full, transitive set of library instances linked by the modules
+# of a parsed DSC.
+#
+# Library instances are picked the way the EDK2 build does: the <LibraryClasses>
+# overrides of the component first, then [LibraryClasses.arch.module_type],
+# [LibraryClasses.common.module_type], [LibraryClasses.arch] and [LibraryClasses].
+# The overrides and module type of the module apply to its whole library tree.
+#
+# The closure of each library instance is memoized per (arch, module type,
+# component overrides) so the many modules sharing a library tree only pay for
+# it once.  INF files are parsed once per resolver.
+#
+# Usage:
+#   dsc = DscParser().SetBaseAbsPath(ws).SetPackagePaths(pps)
+#   dsc.ParseFile(path)
+#   libs = LibraryResolver(dsc).ResolveModule("MdeModulePkg/Core/Dxe/DxeMain.inf", "X64")
+#
+class LibraryResolver(object):
+
+    #
+    # @param dsc: parsed DscParser
+    # @param infs: optional dict of inf path (as written in the DSC) to parsed InfParser,
+    #              ex: the result of BulkParser.ParseMany.  Other infs are parsed when needed.
+    #
+    def __init__(self, dsc, infs=None):
+        self.Logger = logging.getLogger("LibraryResolver")
+        self.Dsc = dsc
+        self.Model = dsc.GetModel()
+        self.Infs = dict(infs) if infs is not None else {}
+        self._Closures = {}
+
+    #
+    # Get the parsed inf for a path, parsing it if needed
+    #
+    # @ret InfParser or None if the file can't be read
+    #
+    def GetInf(self, path):
+        if path in self.Infs:
+            return self.Infs[path]
+        inf = InfParser().SetBaseAbsPath(self.Dsc.RootPath).SetPackagePaths(self.Dsc.PPs)
+        try:
+            inf.ParseFile(path)
+        except (IOError, OSError):
+            self.Logger.error("Unable to parse %s" % path)
+            inf = None
+        self.Infs[path] = inf
+        return inf
+
+    #
+    # Resolve the libraries of a component listed in the DSC
+    #
+    # @ret ModuleLibraries
+    #
+    def ResolveModule(self, inf_path, arch):
+        arch = arch.upper()
+        component = self.Model.Components.get((inf_path, arch))
+        inf = self.GetInf(inf_path)
+        module_type = inf.Dict.get("MODULE_TYPE", COMMON).upper() if inf is not None else COMMON
+        overrides = frozenset(component.LibraryClasses.items()) if component is not None else frozenset()
+        context = (arch, module_type, overrides)
+
+        pairs = set()
+        missing = set()
+        roots = [(name, self._Lookup(name, context)) for name in self._GetLibrariesUsed(inf, context)]
+        nulls = self.Model.GetNullLibraries(arch, module_type, component)
+        roots.extend(("NULL", instance) for instance in nulls)
+        for (name, instance) in roots:
+            if instance is None:
+                missing.add(name)
+                continue
+            (sub_pairs, sub_missing) = self._Closure(name, instance, context, set())[0:2]
+            pairs.update(sub_pairs)
+            missing.update(sub_missing)
+
+        libraries = {}
+        unsupported = []
+        for (name, instance) in sorted(pairs):
+            if name != "NULL":
+                libraries[name] = instance
+            if not self._Supports(instance, module_type):
+                unsupported.append((name, instance))
+        null_libraries = [instance for instance in nulls if ("NULL", instance) in pairs]
+        null_libraries.extend(sorted(instance for (name, instance) in pairs
+                                     if name == "NULL" and instance not in null_libraries))
+        return ModuleLibraries(inf_path, arch, module_type, libraries, null_libraries, sorted(missing),
+                               unsupported)
+
+    #
+    # Resolve every component in the DSC
+    #
+    # @param arch: only resolve components for this arch.  None resolves every arch.
+    #
+    # @ret dict of (inf, arch) to ModuleLibraries
+    #
+    def ResolveAll(self, arch=None):
+        results = {}
+        for (inf_path, component_arch) in self.Model.Components:
+            if arch is None or component_arch == arch.upper():
+                results[(inf_path, component_arch)] = self.ResolveModule(inf_path, component_arch)
+        return results
+
+    def _Lookup(self, name, context):
+        (arch, module_type, overrides) = context
+        for (override_name, instance) in overrides:
+            if override_name == name:
+                return instance
+        return self.Model.GetLibraryInstance(name, arch, module_type)
+
+    #
+    # Get the library classes an inf uses for the arch and module type being resolved
+    #
+    def _GetLibrariesUsed(self, inf, context):
+        if inf is None:
+            return []
+        (arch, module_type, overrides) = context
+        return [name for name in inf.GetValues("libraryclasses", arch, module_type) if name]
+
+    def _Supports(self, instance, module_type):
+        inf = self.GetInf(instance)
+        if inf is None or module_type == COMMON:
+            return True
+        phases = [phase.upper() for phase in inf.SupportedPhases]
+        # BASE libraries (no phase list) support every module type, even ones missing from AllPhases
+        return module_type in phases or len(phases) == 0 or set(phases) == set(AllPhases)
+
+    #
+    # Get the closure of one library instance: itself and everything it links
+    #
+    # @ret tuple of (frozenset of (class, instance), frozenset of missing classes, open)
+    #      open is the set of unfinished instances a dependency cycle reached.  Results are only
+    #      memoized once no cycle is open so they are complete.
+    #
+    def _Closure(self, name, instance, context, in_progress):
+        key = (name, instance, context)
+        memo = self._Closures.get(key)
+        if memo is not None:
+            return memo + (frozenset(),)
+        if key in in_progress:
+            return _EmptyClosure + (frozenset([key]),)
+
+        in_progress.add(key)
+        pairs = {(name, instance)}
+        missing = set()
+        cycles = set()
+        for dep_name in self._GetLibrariesUsed(self.GetInf(instance), context):
+            dep = self._Lookup(dep_name, context)
+            if dep is None:
+                missing.add(dep_name)
+                continue
+            (sub_pairs, sub_missing, sub_cycles) = self._Closure(dep_name, dep, context, in_progress)
+            pairs.update(sub_pairs)
+            missing.update(sub_missing)
+            cycles.update(sub_cycles)
+        in_progress.discard(key)
+        cycles.discard(key)
+
+        closure = (frozenset(pairs), frozenset(missing))
+        if len(cycles) == 0:
+            self._Closures[key] = closure
+        return closure + (frozenset(cycles),)
@@ -0,0 +1,139 @@
+## @file LibraryResolver_test.py
+# Contains unit test routines for the LibraryResolver module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.LibraryResolver import LibraryResolver
+
+SAMPLE_DSC = """[LibraryClasses]
+  ALib|Lib/A.inf
+  BLib|Lib/B.inf
+  PeiOnlyLib|Lib/PeiOnly.inf
+  NULL|Lib/Null.inf
+
+[LibraryClasses.X64.DXE_DRIVER]
+  BLib|Lib/DxeB.inf
+
+[Components.X64]
+  Drv/Drv.inf
+  Drv/Override.inf {
+    <LibraryClasses>
+      ALib|Lib/OtherA.inf
+  }
+  Drv/Pei.inf
+  Drv/Bad.inf
+"""
+
+# name: (library class and phases or None for modules, module type, libraries used)
+SAMPLE_INFS = {
+    "Lib/A.inf": ("ALib", "BASE", ["BLib"]),
+    "Lib/OtherA.inf": ("ALib", "BASE", []),
+    "Lib/B.inf": ("BLib", "BASE", ["ALib"]),
+    "Lib/DxeB.inf": ("BLib|DXE_DRIVER", "DXE_DRIVER", ["ALib"]),
+    "Lib/PeiOnly.inf": ("PeiOnlyLib|PEIM", "PEIM", []),
+    "Lib/Null.inf": ("NULL", "BASE", []),
+    "Drv/Drv.inf": (None, "DXE_DRIVER", ["ALib"]),
+    "Drv/Override.inf": (None, "DXE_DRIVER", ["ALib", "BLib"]),
+    "Drv/Pei.inf": (None, "PEIM", ["ALib", "PeiOnlyLib", "MissingLib"]),
+    "Drv/Bad.inf": (None, "DXE_DRIVER", ["PeiOnlyLib"]),
+}
+
+
+class TestLibraryResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        for (name, (library_class, module_type, libs)) in SAMPLE_INFS.items():
+            lines = ["[Defines]", "  MODULE_TYPE = %s" % module_type]
+            if library_class is not None:
+                lines.append("  LIBRARY_CLASS = %s" % library_class)
+            lines.append("[LibraryClasses]")
+            lines.extend("  " + lib for lib in libs)
+            self._write(name, "\n".join(lines) + "\n")
+        self.dsc = DscParser().SetBaseAbsPath(self.ws)
+        self.dsc.ParseFile(self._write("Sample.dsc", SAMPLE_DSC))
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.ws, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+    def test_transitive_closure_with_cycle(self):
+        result = LibraryResolver(self.dsc).ResolveModule("Drv/Drv.inf", "X64")
+        self.assertEqual(result.ModuleType, "DXE_DRIVER")
+        self.assertEqual(result.Libraries, {"ALib": "Lib/A.inf", "BLib": "Lib/DxeB.inf"})
+        self.assertEqual(result.NullLibraries, ["Lib/Null.inf"])
+        self.assertEqual(result.Missing, [])
+        self.assertEqual(result.Unsupported, [])
+
+    def test_component_overrides_apply_to_the_whole_tree(self):
+        result = LibraryResolver(self.dsc).ResolveModule("Drv/Override.inf", "X64")
+        self.assertEqual(result.Libraries, {"ALib": "Lib/OtherA.inf", "BLib": "Lib/DxeB.inf"})
+
+    def test_missing_and_unsupported(self):
+        result = LibraryResolver(self.dsc).ResolveModule("Drv/Pei.inf", "X64")
+        self.assertEqual(result.Libraries, {"ALib": "Lib/A.inf", "BLib": "Lib/B.inf",
+                                            "PeiOnlyLib": "Lib/PeiOnly.inf"})
+        self.assertEqual(result.Missing, ["MissingLib"])
+        self.assertEqual(result.Unsupported, [])
+
+        result = LibraryResolver(self.dsc).ResolveModule("Drv/Bad.inf", "X64")
+        self.assertEqual(result.Unsupported, [("PeiOnlyLib", "Lib/PeiOnly.inf")])
+
+    def test_resolve_all_shares_closures(self):
+        resolver = LibraryResolver(self.dsc)
+        results = resolver.ResolveAll("X64")
+        self.assertEqual(sorted(results), [("Drv/Bad.inf", "X64"), ("Drv/Drv.inf", "X64"),
+                                           ("Drv/Override.inf", "X64"), ("Drv/Pei.inf", "X64")])
+        # every inf is parsed once
+        self.assertEqual(len(resolver.Infs), len(SAMPLE_INFS))
+        self.assertEqual(results, LibraryResolver(self.dsc).ResolveAll())
+
+    def test_arch_specific_library_classes(self):
+        self._write("Drv/Drv.inf", "[Defines]\n  MODULE_TYPE = DXE_DRIVER\n[LibraryClasses.IA32]\n  ALib\n")
+        self._write("Sample.dsc", SAMPLE_DSC.replace("[Components.X64]", "[Components.X64, Components.IA32]"))
+        self.dsc = DscParser().SetBaseAbsPath(self.ws)
+        self.dsc.ParseFile(os.path.join(self.ws, "Sample.dsc"))
+        resolver = LibraryResolver(self.dsc)
+        self.assertEqual(resolver.ResolveModule("Drv/Drv.inf", "X64").Libraries, {})
+        self.assertEqual(resolver.ResolveModule("Drv/Drv.inf", "IA32").Libraries,
+                         {"ALib": "Lib/A.inf", "BLib": "Lib/B.inf"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,10 +27,35 @@
 ##
 
 import os
+import re
+import json
+import hashlib
+import logging
 import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
 
 FORMAT_VERSION_1 = (1, 4)   # Version 1: #OVERRIDE : VERSION | PATH_TO_MODULE | HASH | YYYY-MM-DDThh-mm-ss
 
+# Matched against the raw bytes of a file so files without overrides are never decoded.
+OVERRIDE_PREFILTER = re.compile(rb"^\s*#override", re.IGNORECASE | re.MULTILINE)
+
+# Status of an override after checking it against the overridden module.
+OVERRIDE_OK = 'OK'
+OVERRIDE_STALE = 'STALE'
+OVERRIDE_MISSING = 'MISSING'
+
+# One override found by OverrideScanner.
+#   file_path   - absolute path of the file containing the override
+#   lineno      - line of the #OVERRIDE entry
+#   override    - the dict returned by OverrideParser.parse_override_line
+#   module_path - absolute path of the overridden module, or None if it wasn't found
+#   module_hash - current hash of the overridden module, or None if it wasn't found
+#   status      - OVERRIDE_OK, OVERRIDE_STALE or OVERRIDE_MISSING
+OverrideResult = namedtuple('OverrideResult', ['file_path', 'lineno', 'override', 'module_path', 'module_hash',
+                                               'status'])
+
 
 class OpParseError(Exception):
     PE_VER = 'VERSION'
@@ -151,3 +176,192 @@ class OverrideParser(object):
             raise OpParseError(OpParseError.PE_DATE)
 
         return result
+
+
+class ModuleHashCache(object):
+    """
+    Computes and caches the hash of a module: the md5 of the module .inf followed
+    by its source and binary files, with line endings normalized to LF.
+
+    A cached hash is reused as long as the size and modification time of every file
+    it was computed from are unchanged. When cache_path is given, the cache is loaded
+    from and saved to that json file so it survives between runs.
+    """
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.entries = {}
+        if cache_path is not None and os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'r') as cache_file:
+                    self.entries = json.load(cache_file)
+            except ValueError:
+                logging.getLogger("ModuleHashCache").warning("Ignoring corrupt hash cache '%s'." % cache_path)
+
+    @staticmethod
+    def _stat(file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def get_module_files(inf_path):
+        """Returns the absolute paths of the files making up a module, starting with the .inf itself."""
+        inf = InfParser()
+        inf.ParseFile(inf_path)
+        module_dir = os.path.dirname(inf_path)
+        files = [inf_path]
+        names = list(inf.Sources)
+        names.extend(extra[0] for (value, extra, arch, module_type, usage) in inf.Entries.get('binaries', [])
+                     if len(extra) > 0)
+        for name in names:
+            file_path = os.path.normpath(os.path.join(module_dir, name))
+            if len(name) > 0 and file_path not in files:
+                files.append(file_path)
+        return files
+
+    @staticmethod
+    def compute_hash(files):
+        hash_obj = hashlib.md5()
+        for file_path in files:
+            with open(file_path, 'rb') as module_file:
+                hash_obj.update(module_file.read().replace(b'\r\n', b'\n'))
+        return hash_obj.hexdigest()
+
+    def get_hash(self, inf_path):
+        """
+        Returns the hash of the module at inf_path (which must exist).
+
+        Raises FileNotFoundError when a file listed by the module doesn't exist, a hash of
+        the remaining files could match an override even though a source file is gone.
+        """
+        inf_path = os.path.abspath(inf_path)
+        entry = self.entries.get(inf_path)
+        if entry is not None and all(self._stat(f) == stamp for (f, stamp) in entry['files']):
+            return entry['hash']
+
+        files = self.get_module_files(inf_path)
+        stamps = [self._stat(f) for f in files]
+        missing = [f for (f, stamp) in zip(files, stamps) if stamp is None]
+        if len(missing) > 0:
+            raise FileNotFoundError("Module '%s' lists missing files: %s" % (inf_path, ", ".join(missing)))
+        module_hash = self.compute_hash(files)
+        self.entries[inf_path] = {'hash': module_hash, 'files': [list(pair) for pair in zip(files, stamps)]}
+        return module_hash
+
+    def save(self):
+        if self.cache_path is None:
+            return
+        with open(self.cache_path, 'w') as cache_file:
+            json.dump(self.entries, cache_file)
+
+
+class OverrideScanner(object):
+    """
+    OverrideScanner finds every #OVERRIDE entry under a workspace and checks each
+    one against the current hash of the module it overrides.
+
+    Unlike OverrideParser, files without overrides are not an error, and parse errors
+    are collected in self.errors rather than raised so one bad file doesn't stop the scan.
+    Files are read on a thread pool and only files containing '#OVERRIDE' are decoded
+    and parsed.
+
+    Usage:
+        scanner = OverrideScanner(workspace, package_paths, hash_cache_path=cache)
+        for result in scanner.get_stale_overrides():
+            print(result.file_path, result.lineno, result.status)
+    """
+    def __init__(self, workspace_path, package_paths=[], hash_cache_path=None, workers=None,
+                 extensions=('.inf',), ignore_dirs=('.git',)):
+        self.logger = logging.getLogger("OverrideScanner")
+        self.workspace_path = os.path.abspath(workspace_path)
+        self.package_paths = [os.path.join(self.workspace_path, p) for p in package_paths]
+        self.hash_cache = ModuleHashCache(hash_cache_path)
+        self.workers = workers
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.ignore_dirs = set(ignore_dirs)
+        self.overrides = None
+        self.errors = []
+
+    def find_files(self):
+        result = []
+        for (root, dirs, files) in os.walk(self.workspace_path):
+            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
+            result.extend(os.path.join(root, f) for f in files if os.path.splitext(f)[1].lower() in self.extensions)
+        return result
+
+    @staticmethod
+    def read_override_lines(file_path):
+        with open(file_path, 'rb') as file:
+            contents = file.read()
+        if OVERRIDE_PREFILTER.search(contents) is None:
+            return []
+        return OverrideParser.get_override_lines(contents.decode('utf-8', errors='replace'))
+
+    def scan(self):
+        """Finds and parses every override in the workspace. Returns a list of (file_path, lineno, override)."""
+        files = self.find_files()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            all_lines = list(pool.map(self.read_override_lines, files))
+
+        self.overrides = []
+        self.errors = []
+        for (file_path, override_lines) in zip(files, all_lines):
+            for override_line in override_lines:
+                try:
+                    override = OverrideParser.parse_override_line(override_line['line'])
+                except (OpParseError, IndexError) as pe:
+                    self.errors.append("Parse error '%s' occurred while processing line %d of '%s'." %
+                                       (pe, override_line['lineno'], file_path))
+                    continue
+                self.overrides.append((file_path, override_line['lineno'], override))
+        self.logger.debug("Found %d overrides in %d files" % (len(self.overrides), len(files)))
+        return self.overrides
+
+    def find_module(self, original_path):
+        """Returns the absolute path of an overridden module, or None if it can't be found."""
+        for root in [self.workspace_path] + self.package_paths:
+            module_path = os.path.join(root, original_path)
+            if os.path.isfile(module_path):
+                return module_path
+        return None
+
+    def get_module_hash(self, module_path):
+        try:
+            return self.hash_cache.get_hash(module_path)
+        except Exception as e:
+            self.logger.warning("Unable to hash module '%s': %s" % (module_path, e))
+            return None
+
+    def verify(self):
+        """Checks every override against its module. Returns a list of OverrideResult."""
+        if self.overrides is None:
+            self.scan()
+
+        module_paths = {}
+        for (file_path, lineno, override) in self.overrides:
+            original_path = override['original_path']
+            if original_path not in module_paths:
+                module_paths[original_path] = self.find_module(original_path)
+        modules = sorted(set(p for p in module_paths.values() if p is not None))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            hashes = dict(zip(modules, pool.map(self.get_module_hash, modules)))
+        self.hash_cache.save()
+
+        results = []
+        for (file_path, lineno, override) in self.overrides:
+            module_path = module_paths[override['original_path']]
+            module_hash = hashes.get(module_path)
+            if module_hash is None:
+                status = OVERRIDE_MISSING
+            elif module_hash.lower() == override['current_hash'].lower():
+                status = OVERRIDE_OK
+            else:
+                status = OVERRIDE_STALE
+            results.append(OverrideResult(file_path, lineno, override, module_path, module_hash, status))
+        return results
+
+    def get_stale_overrides(self):
+        """Returns the OverrideResults of overrides that are stale or whose module can't be found."""
+        return [r for r in self.verify() if r.status != OVERRIDE_OK]
@@ -27,6 +27,9 @@
 
 import unittest
 import os
+import shutil
+import hashlib
+import tempfile
 
 from MuPythonLibrary.Uefi.EdkII.Parsers import OverrideParser as op
 
@@ -158,5 +161,81 @@ class TestOverrideParser(unittest.TestCase):
         pass
 
 
+class TestOverrideScanner(unittest.TestCase):
+
+    MODULE_INF = "[Defines]\n  BASE_NAME = Module\n\n[Sources]\n  Module.c\n"
+    MODULE_C = "int a;\r\n"
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self._write("Pkg/Module/Module.inf", self.MODULE_INF)
+        self._write("Pkg/Module/Module.c", self.MODULE_C)
+        self._write("Pkg/Other/Other.inf", "[Defines]\n  BASE_NAME = Other\n")
+        self._write(".git/Ignored.inf", "#Override : 00000001 | Pkg/Module/Module.inf | 0 | 2018-11-27T22-36-30\n")
+        self.module_hash = hashlib.md5((self.MODULE_INF + self.MODULE_C).replace("\r\n", "\n").encode()).hexdigest()
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, path, contents):
+        path = os.path.join(self.ws, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline="") as f:
+            f.write(contents)
+
+    def _write_override(self, module_hash):
+        self._write("Platform/Module/Module.inf",
+                    "#Override : 00000001 | Pkg/Module/Module.inf | %s | 2018-11-27T22-36-30\n"
+                    "#Override : 00000001 | Pkg/Missing/Missing.inf | %s | 2018-11-27T22-36-30\n"
+                    "#Override : 0000000X | Pkg/Module/Module.inf | %s | 2018-11-27T22-36-30\n"
+                    "[Defines]\n" % (module_hash, module_hash, module_hash))
+
+    def test_scan(self):
+        self._write_override(self.module_hash)
+        scanner = op.OverrideScanner(self.ws)
+        overrides = scanner.scan()
+        self.assertEqual([(os.path.relpath(f, self.ws), lineno) for (f, lineno, o) in overrides],
+                         [(os.path.join("Platform", "Module", "Module.inf"), 1),
+                          (os.path.join("Platform", "Module", "Module.inf"), 2)])
+        self.assertEqual(len(scanner.errors), 1)
+
+    def test_verify(self):
+        self._write_override(self.module_hash)
+        results = op.OverrideScanner(self.ws).verify()
+        self.assertEqual([r.status for r in results], [op.OVERRIDE_OK, op.OVERRIDE_MISSING])
+        self.assertEqual(results[0].module_path, os.path.join(self.ws, "Pkg", "Module", "Module.inf"))
+        self.assertEqual(results[0].module_hash, self.module_hash)
+
+    def test_stale_override(self):
+        self._write_override(self.module_hash)
+        self._write("Pkg/Module/Module.c", "int b;\n")
+        stale = op.OverrideScanner(self.ws).get_stale_overrides()
+        self.assertEqual([r.status for r in stale], [op.OVERRIDE_STALE, op.OVERRIDE_MISSING])
+
+    def test_module_with_missing_file(self):
+        self._write_override(self.module_hash)
+        cache = op.ModuleHashCache()
+        module_path = os.path.join(self.ws, "Pkg", "Module", "Module.inf")
+        self.assertEqual(cache.get_hash(module_path), self.module_hash)
+        os.remove(os.path.join(self.ws, "Pkg", "Module", "Module.c"))
+        with self.assertRaises(FileNotFoundError):
+            cache.get_hash(module_path)
+        results = op.OverrideScanner(self.ws).verify()
+        self.assertEqual([r.status for r in results], [op.OVERRIDE_MISSING, op.OVERRIDE_MISSING])
+        self.assertIsNone(results[0].module_hash)
+
+    def test_hash_cache(self):
+        self._write_override(self.module_hash)
+        cache_path = os.path.join(self.ws, "hashes.json")
+        op.OverrideScanner(self.ws, hash_cache_path=cache_path).verify()
+        self.assertTrue(os.path.isfile(cache_path))
+        cache = op.ModuleHashCache(cache_path)
+        module_path = os.path.join(self.ws, "Pkg", "Module", "Module.inf")
+        self.assertEqual(cache.entries[module_path]["hash"], self.module_hash)
+        # a cached hash is only reused while the files are unchanged
+        self._write("Pkg/Module/Module.c", "int bbbb;\n")
+        self.assertNotEqual(cache.get_hash(module_path), self.module_hash)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,165 @@
+# @file ParseCache.py
+# Persistent on-disk cache of EDK2 parser results
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+
+# Bump whenever the layout of the stored results changes
+CACHE_VERSION = 9
+
+
+#
+# Compute the content hash of a file
+#
+def GetFileHash(filepath):
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+#
+# Build a stat + content signature for a file
+#
+# @ret tuple of (path, mtime_ns, size, sha256 hex digest)
+#
+def GetFileSignature(filepath):
+    st = os.stat(filepath)
+    return (filepath, st.st_mtime_ns, st.st_size, GetFileHash(filepath))
+
+
+#
+# Opt-in cache of parser results stored in a directory on disk.
+#
+# Entries are keyed by the parser type, the absolute path of the parsed file and
+# a fingerprint of the parser inputs (input vars, root path and package paths).
+# Every file read during the parse is recorded with its mtime, size and content
+# hash.  An entry is served when every recorded file still has the same mtime
+# and size, or failing that, the same content hash.
+#
+# Usage:
+#   cache = ParseCache("Build/ParseCache")
+#   inf = InfParser().SetBaseAbsPath(ws).SetParseCache(cache)
+#   inf.ParseFile(path)
+#
+class ParseCache(object):
+
+    def __init__(self, cache_dir):
+        self.Logger = logging.getLogger("ParseCache")
+        self.CacheDir = os.path.abspath(cache_dir)
+        self.Hits = 0
+        self.Misses = 0
+        # several processes can open the same cache at once (see BulkParser)
+        os.makedirs(self.CacheDir, exist_ok=True)
+
+    def _GetEntryPath(self, parser, filepath):
+        h = hashlib.sha256()
+        h.update(type(parser).__name__.encode("utf-8"))
+        h.update(os.path.abspath(filepath).encode("utf-8"))
+        h.update(parser.GetInputFingerprint().encode("utf-8"))
+        return os.path.join(self.CacheDir, h.hexdigest() + ".pickle")
+
+    #
+    # Check that every file the cached results were built from is unchanged
+    #
+    def _IsCurrent(self, files):
+        for (path, mtime, size, digest) in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
+            if st.st_mtime_ns == mtime and st.st_size == size:
+                continue
+            # stat data changed (ex: fresh checkout) so fall back to the content
+            if GetFileHash(path) != digest:
+                return False
+        return True
+
+    #
+    # Restore the results of a previous parse of filepath into parser.
+    #
+    # @ret True if the parser was populated from the cache
+    #
+    def Load(self, parser, filepath):
+        entry_path = self._GetEntryPath(parser, filepath)
+        try:
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+            current = entry["version"] == CACHE_VERSION and self._IsCurrent(entry["files"])
+        except FileNotFoundError:
+            self.Misses += 1
+            return False
+        except Exception as e:
+            # unreadable or corrupt entries are just a miss, the entry is replaced by the next Store
+            self.Logger.debug("Unusable cache entry for %s: %s" % (filepath, e))
+            self.Misses += 1
+            return False
+
+        if not current:
+            self.Logger.debug("Stale cache entry for %s" % filepath)
+            self.Misses += 1
+            return False
+
+        for (name, value) in entry["results"].items():
+            setattr(parser, name, value)
+        parser.FilesRead = [f[0] for f in entry["files"]]
+        parser.FileSignatures = {f[0]: tuple(f) for f in entry["files"]}
+        self.Hits += 1
+        return True
+
+    #
+    # Save the results of parsing filepath.  Files are stored with the signature taken
+    # before they were read (see BaseParser.AddFileRead) so a file edited during the
+    # parse doesn't match the stored entry.
+    #
+    def Store(self, parser, filepath):
+        signatures = parser.FileSignatures
+        entry = {
+            "version": CACHE_VERSION,
+            "files": [signatures[p] if p in signatures else GetFileSignature(p) for p in parser.FilesRead],
+            "results": {name: getattr(parser, name) for name in parser.ResultAttributes}
+        }
+        entry_path = self._GetEntryPath(parser, filepath)
+        # write to a temp file and rename so concurrent readers never see a partial entry
+        (fd, temp_path) = tempfile.mkstemp(dir=self.CacheDir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, entry_path)
+        except:
+            os.remove(temp_path)
+            raise
+
+    #
+    # Remove every entry from the cache directory
+    #
+    def Clear(self):
+        for name in os.listdir(self.CacheDir):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.CacheDir, name))
@@ -0,0 +1,160 @@
+## @file ParseCache_test.py
+# Contains unit test routines for the ParseCache class.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.ParseCache import ParseCache, CACHE_VERSION
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+
+SAMPLE_INF = """[Defines]
+  BASE_NAME   = Sample
+  MODULE_TYPE = DXE_DRIVER
+
+[Sources]
+  Sample.c
+
+[LibraryClasses]
+  BaseLib
+"""
+
+SAMPLE_DSC = """[Defines]
+  DEFINE PKG = SamplePkg
+!include Sample.dsc.inc
+"""
+
+SAMPLE_DSC_INC = """[Components.X64]
+  $(PKG)/Sample.inf
+"""
+
+
+class EditedWhileParsing(InfParser):
+    NewContents = None
+
+    def TokenizeFile(self, filepath):
+        result = super().TokenizeFile(filepath)
+        if self.NewContents is not None:
+            with open(filepath, "w") as f:
+                f.write(self.NewContents)
+        return result
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.cache = ParseCache(os.path.join(self.ws, "cache"))
+        self.inf = os.path.join(self.ws, "Sample.inf")
+        self._write(self.inf, SAMPLE_INF)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def _write(self, path, contents):
+        with open(path, "w") as f:
+            f.write(contents)
+
+    def _parse_inf(self):
+        inf = InfParser().SetBaseAbsPath(self.ws).SetParseCache(self.cache)
+        inf.ParseFile(self.inf)
+        return inf
+
+    def test_unchanged_file_is_served_from_cache(self):
+        first = self._parse_inf()
+        self.assertEqual(self.cache.Hits, 0)
+        second = self._parse_inf()
+        self.assertEqual(self.cache.Hits, 1)
+        self.assertTrue(second.Parsed)
+        self.assertEqual(second.Sources, first.Sources)
+        self.assertEqual(second.LibrariesUsed, ["BaseLib"])
+        self.assertEqual(second.Dict["MODULE_TYPE"], "DXE_DRIVER")
+
+    def test_changed_file_is_reparsed(self):
+        self._parse_inf()
+        self._write(self.inf, SAMPLE_INF + "  PrintLib\n")
+        inf = self._parse_inf()
+        self.assertEqual(self.cache.Hits, 0)
+        self.assertEqual(inf.LibrariesUsed, ["BaseLib", "PrintLib"])
+
+    def test_input_vars_are_part_of_the_key(self):
+        self._parse_inf()
+        inf = InfParser().SetBaseAbsPath(self.ws).SetInputVars({"TARGET": "DEBUG"}).SetParseCache(self.cache)
+        inf.ParseFile(self.inf)
+        self.assertEqual(self.cache.Hits, 0)
+
+    def test_dsc_include_change_invalidates_entry(self):
+        dsc = os.path.join(self.ws, "Sample.dsc")
+        inc = os.path.join(self.ws, "Sample.dsc.inc")
+        self._write(dsc, SAMPLE_DSC)
+        self._write(inc, SAMPLE_DSC_INC)
+        for _ in range(2):
+            parser = DscParser().SetBaseAbsPath(self.ws).SetParseCache(self.cache)
+            parser.ParseFile(dsc)
+            self.assertEqual(parser.SixMods, ["SamplePkg/Sample.inf"])
+        self.assertEqual(self.cache.Hits, 1)
+
+        self._write(inc, SAMPLE_DSC_INC + "  $(PKG)/Other.inf\n")
+        parser = DscParser().SetBaseAbsPath(self.ws).SetParseCache(self.cache)
+        parser.ParseFile(dsc)
+        self.assertEqual(self.cache.Hits, 1)
+        self.assertEqual(parser.SixMods, ["SamplePkg/Sample.inf", "SamplePkg/Other.inf"])
+
+    def test_file_edited_while_parsing_is_reparsed(self):
+        inf = EditedWhileParsing().SetBaseAbsPath(self.ws).SetParseCache(self.cache)
+        inf.NewContents = SAMPLE_INF + "  PrintLib\n"
+        inf.ParseFile(self.inf)
+        self.assertEqual(inf.LibrariesUsed, ["BaseLib"])
+
+        inf = EditedWhileParsing().SetBaseAbsPath(self.ws).SetParseCache(self.cache)
+        inf.ParseFile(self.inf)
+        self.assertEqual(self.cache.Hits, 0)
+        self.assertEqual(inf.LibrariesUsed, ["BaseLib", "PrintLib"])
+
+    def test_corrupt_entry_is_a_miss(self):
+        good = pickle.dumps({"version": CACHE_VERSION, "files": [], "results": {}})
+        entries = [b"not a pickle", good[:len(good) // 2], pickle.dumps(["not", "a", "dict"]),
+                   pickle.dumps({"version": CACHE_VERSION}), pickle.dumps({"version": CACHE_VERSION, "files": [1]})]
+        entry_path = self.cache._GetEntryPath(InfParser().SetBaseAbsPath(self.ws), self.inf)
+        for contents in entries:
+            with self.subTest(contents=contents):
+                with open(entry_path, "wb") as f:
+                    f.write(contents)
+                misses = self.cache.Misses
+                inf = self._parse_inf()
+                self.assertEqual(self.cache.Misses, misses + 1)
+                self.assertEqual(inf.LibrariesUsed, ["BaseLib"])
+        self._parse_inf()
+        self.assertEqual(self.cache.Hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,309 @@
+# @file Snapshot.py
+# Code to save parsed EDK2 files to a binary snapshot and load them back
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+###
+#
+# File layout (all integers little endian):
+#   header   - magic, version, entry count, index offset, string count, string table offset
+#   index    - per entry: name string id, parser type string id, payload offset, payload size
+#   payloads - the ResultAttributes of each parser, encoded as tagged values.  Arrays
+#              (ex: BaseParser.Provenance) are stored as their raw little endian items.
+#   strings  - (string count + 1) offsets into the blob that follows, then the utf-8 blob
+#
+# Every string is stored once and referenced by id, and entries are only decoded
+# when asked for, so loading one parser from a large snapshot is cheap.
+#
+import os
+import sys
+import mmap
+import struct
+import tempfile
+from array import array
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.FdfParser import FdfParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser, InfEntry
+from MuPythonLibrary.Uefi.EdkII.Parsers.DecParser import DecParser, GuidValue, PcdDeclaration
+from MuPythonLibrary.Uefi.EdkII.Parsers.TargetTxtParser import TargetTxtParser
+
+SNAPSHOT_MAGIC = b"EDK2SNAP"
+# Bump whenever the layout of the file or of the stored results changes
+SNAPSHOT_VERSION = 3
+
+# parser types that can be stored, by name
+ParserTypes = {t.__name__: t for t in (DscParser, FdfParser, InfParser, DecParser, TargetTxtParser)}
+
+# named tuple types found in results, stored by name so they are restored with their type
+RecordTypes = {t.__name__: t for t in (InfEntry, GuidValue, PcdDeclaration)}
+
+# attributes stored on top of the ResultAttributes, when the parser has them
+_ExtraAttributes = ("FilesRead", "Path", "TargetFile", "TargetFilePath")
+
+_Header = struct.Struct("<8sIIIII")
+_IndexEntry = struct.Struct("<IIII")
+_UInt = struct.Struct("<I")
+_Int = struct.Struct("<q")
+
+_TAG_NONE = 0
+_TAG_FALSE = 1
+_TAG_TRUE = 2
+_TAG_INT = 3
+_TAG_STR = 4
+_TAG_LIST = 5
+_TAG_TUPLE = 6
+_TAG_DICT = 7
+_TAG_ARRAY = 8
+_TAG_RECORD = 9
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.Strings = {}
+        self.Payloads = bytearray()
+
+    def GetStringId(self, value):
+        string_id = self.Strings.get(value)
+        if string_id is None:
+            string_id = len(self.Strings)
+            self.Strings[value] = string_id
+        return string_id
+
+    def Encode(self, value):
+        out = self.Payloads
+        if value is None:
+            out.append(_TAG_NONE)
+        elif value is True:
+            out.append(_TAG_TRUE)
+        elif value is False:
+            out.append(_TAG_FALSE)
+        elif isinstance(value, int):
+            out.append(_TAG_INT)
+            out += _Int.pack(value)
+        elif isinstance(value, str):
+            out.append(_TAG_STR)
+            out += _UInt.pack(self.GetStringId(value))
+        elif type(value).__name__ in RecordTypes and isinstance(value, tuple):
+            out.append(_TAG_RECORD)
+            out += _UInt.pack(self.GetStringId(type(value).__name__))
+            out += _UInt.pack(len(value))
+            for item in value:
+                self.Encode(item)
+        elif isinstance(value, (list, tuple)):
+            out.append(_TAG_LIST if isinstance(value, list) else _TAG_TUPLE)
+            out += _UInt.pack(len(value))
+            for item in value:
+                self.Encode(item)
+        elif isinstance(value, array):
+            out.append(_TAG_ARRAY)
+            out += value.typecode.encode("ascii")
+            out += _UInt.pack(len(value))
+            if sys.byteorder != "little":
+                value = array(value.typecode, value)
+                value.byteswap()
+            out += value.tobytes()
+        elif isinstance(value, dict):
+            out.append(_TAG_DICT)
+            out += _UInt.pack(len(value))
+            for (key, item) in value.items():
+                self.Encode(key)
+                self.Encode(item)
+        else:
+            raise TypeError("Can't store a %s in a snapshot" % type(value).__name__)
+
+    def GetStringTable(self):
+        blobs = [s.encode("utf-8") for s in self.Strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack("<%dI" % len(offsets), *offsets) + b"".join(blobs)
+
+
+#
+# Write parsed files to a snapshot
+#
+# @param filepath: snapshot file to create (replaced if it exists)
+# @param parsers: dict of name (usually the parsed path) to a parsed DscParser, FdfParser,
+#                 InfParser, DecParser or TargetTxtParser
+#
+def WriteSnapshot(filepath, parsers):
+    writer = _Writer()
+    index = []
+    for (name, parser) in parsers.items():
+        type_name = type(parser).__name__
+        if type_name not in ParserTypes:
+            raise TypeError("Can't store a %s in a snapshot" % type_name)
+        start = len(writer.Payloads)
+        attributes = tuple(parser.ResultAttributes) + tuple(a for a in _ExtraAttributes if hasattr(parser, a))
+        writer.Encode({attr: getattr(parser, attr) for attr in attributes})
+        index.append((writer.GetStringId(name), writer.GetStringId(type_name), start,
+                      len(writer.Payloads) - start))
+
+    index_offset = _Header.size
+    payload_offset = index_offset + _IndexEntry.size * len(index)
+    strings_offset = payload_offset + len(writer.Payloads)
+    header = _Header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index), index_offset, len(writer.Strings),
+                          strings_offset)
+
+    directory = os.path.dirname(os.path.abspath(filepath))
+    (fd, temp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for (name_id, type_id, start, size) in index:
+                f.write(_IndexEntry.pack(name_id, type_id, payload_offset + start, size))
+            f.write(writer.Payloads)
+            f.write(writer.GetStringTable())
+        os.replace(temp_path, filepath)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+#
+# Read only view of a snapshot written by WriteSnapshot.  The file is memory
+# mapped and entries are decoded when they are asked for.
+#
+# Usage:
+#   with Snapshot(path) as snap:
+#       dsc = snap.Get("Platform.dsc")
+#
+class Snapshot(object):
+
+    def __init__(self, filepath):
+        self.Path = filepath
+        with open(filepath, "rb") as f:
+            self._Map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._Map) < _Header.size:
+            self.Close()
+            raise ValueError("%s is not a snapshot" % filepath)
+        (magic, version, count, index_offset, string_count, strings_offset) = _Header.unpack_from(self._Map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.Close()
+            raise ValueError("%s is not a snapshot" % filepath)
+        if version != SNAPSHOT_VERSION:
+            self.Close()
+            raise ValueError("Unsupported snapshot version %d in %s" % (version, filepath))
+
+        self._StringOffsets = strings_offset
+        self._StringBlob = strings_offset + _UInt.size * (string_count + 1)
+        self._Strings = {}
+        self.Entries = {}
+        for i in range(count):
+            (name_id, type_id, start, size) = _IndexEntry.unpack_from(self._Map, index_offset + i * _IndexEntry.size)
+            self.Entries[self._GetString(name_id)] = (self._GetString(type_id), start)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Close(self):
+        if self._Map is not None:
+            self._Map.close()
+            self._Map = None
+
+    def __contains__(self, name):
+        return name in self.Entries
+
+    def GetNames(self):
+        return list(self.Entries.keys())
+
+    #
+    # Create a parser populated with the stored results for name
+    #
+    # @ret DscParser, FdfParser, InfParser, DecParser or TargetTxtParser
+    # @raise KeyError if name isn't in the snapshot
+    #
+    def Get(self, name):
+        (type_name, start) = self.Entries[name]
+        values = self._Decode(start)[0]
+        parser = ParserTypes[type_name]()
+        for (attr, value) in values.items():
+            setattr(parser, attr, value)
+        parser.Parsed = True
+        return parser
+
+    def _GetString(self, string_id):
+        value = self._Strings.get(string_id)
+        if value is None:
+            (start, end) = struct.unpack_from("<II", self._Map, self._StringOffsets + string_id * _UInt.size)
+            # interned so strings are shared with other parsers and snapshots
+            value = sys.intern(self._Map[self._StringBlob + start:self._StringBlob + end].decode("utf-8"))
+            self._Strings[string_id] = value
+        return value
+
+    #
+    # Decode the value at pos
+    #
+    # @ret tuple of (value, position after the value)
+    #
+    def _Decode(self, pos):
+        tag = self._Map[pos]
+        pos += 1
+        if tag == _TAG_STR:
+            return (self._GetString(_UInt.unpack_from(self._Map, pos)[0]), pos + _UInt.size)
+        if tag == _TAG_NONE:
+            return (None, pos)
+        if tag == _TAG_TRUE:
+            return (True, pos)
+        if tag == _TAG_FALSE:
+            return (False, pos)
+        if tag == _TAG_INT:
+            return (_Int.unpack_from(self._Map, pos)[0], pos + _Int.size)
+
+        if tag == _TAG_ARRAY:
+            value = array(chr(self._Map[pos]))
+            count = _UInt.unpack_from(self._Map, pos + 1)[0]
+            pos += 1 + _UInt.size
+            end = pos + count * value.itemsize
+            value.frombytes(self._Map[pos:end])
+            if sys.byteorder != "little":
+                value.byteswap()
+            return (value, end)
+
+        if tag == _TAG_RECORD:
+            record_type = RecordTypes[self._GetString(_UInt.unpack_from(self._Map, pos)[0])]
+            pos += _UInt.size
+
+        count = _UInt.unpack_from(self._Map, pos)[0]
+        pos += _UInt.size
+        if tag == _TAG_DICT:
+            value = {}
+            for i in range(count):
+                (key, pos) = self._Decode(pos)
+                (value[key], pos) = self._Decode(pos)
+            return (value, pos)
+        items = []
+        for i in range(count):
+            (item, pos) = self._Decode(pos)
+            items.append(item)
+        if tag == _TAG_TUPLE:
+            return (tuple(items), pos)
+        if tag == _TAG_RECORD:
+            return (record_type(*items), pos)
+        if tag == _TAG_LIST:
+            return (items, pos)
+        raise ValueError("Corrupt snapshot %s at offset %d" % (self.Path, pos))
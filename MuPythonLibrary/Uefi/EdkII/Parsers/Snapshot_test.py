@@ -0,0 +1,123 @@
+## @file Snapshot_test.py
+# Contains unit test routines for the Snapshot module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.DscParser import DscParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.InfParser import InfParser
+from MuPythonLibrary.Uefi.EdkII.Parsers.DecParser import DecParser
+from MuPythonLibrary.Uefi.EdkII.Parsers import Snapshot
+
+SAMPLE_DSC = """[Defines]
+  PLATFORM_NAME = Sample
+
+[LibraryClasses]
+  BaseLib|Lib/BaseLib.inf
+
+[Components.X64]
+  Drv/Drv.inf {
+    <PcdsFixedAtBuild>
+      gTokenSpaceGuid.PcdMask|0x0
+  }
+"""
+
+SAMPLE_INF = """[Defines]
+  BASE_NAME     = BaseLib
+  LIBRARY_CLASS = BaseLib|DXE_DRIVER PEIM
+
+[Sources]
+  BaseLib.c
+"""
+
+SAMPLE_DEC = """[Defines]
+  PACKAGE_NAME = SamplePkg
+
+[Includes]
+  Include
+"""
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.parsers = {}
+        for (name, contents, parser_type) in (("Sample.dsc", SAMPLE_DSC, DscParser),
+                                              ("BaseLib.inf", SAMPLE_INF, InfParser),
+                                              ("SamplePkg.dec", SAMPLE_DEC, DecParser)):
+            path = os.path.join(self.ws, name)
+            with open(path, "w") as f:
+                f.write(contents)
+            parser = parser_type().SetBaseAbsPath(self.ws)
+            parser.ParseFile(path)
+            self.parsers[name] = parser
+        self.snapshot = os.path.join(self.ws, "platform.snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def test_round_trip(self):
+        Snapshot.WriteSnapshot(self.snapshot, self.parsers)
+        with Snapshot.Snapshot(self.snapshot) as snap:
+            self.assertEqual(sorted(snap.GetNames()), sorted(self.parsers))
+            self.assertNotIn("Other.inf", snap)
+            for (name, parser) in self.parsers.items():
+                loaded = snap.Get(name)
+                self.assertIs(type(loaded), type(parser))
+                self.assertTrue(loaded.Parsed)
+                self.assertEqual(loaded.FilesRead, parser.FilesRead)
+                for attr in parser.ResultAttributes:
+                    self.assertEqual(getattr(loaded, attr), getattr(parser, attr), attr)
+
+            dsc = snap.Get("Sample.dsc")
+            component = dsc.GetComponent("Drv/Drv.inf", "X64")
+            self.assertEqual(component.Pcds, {"gTokenSpaceGuid.PcdMask": "0x0"})
+            self.assertEqual(snap.Get("BaseLib.inf").Path, self.parsers["BaseLib.inf"].Path)
+            entries = snap.Get("BaseLib.inf").Entries
+            self.assertTrue(all(type(e).__name__ == "InfEntry" for v in entries.values() for e in v))
+
+    def test_rejects_other_files(self):
+        with open(self.snapshot, "wb") as f:
+            f.write(b"not a snapshot at all, just some bytes")
+        with self.assertRaises(ValueError):
+            Snapshot.Snapshot(self.snapshot)
+
+    def test_rejects_other_versions(self):
+        Snapshot.WriteSnapshot(self.snapshot, self.parsers)
+        with open(self.snapshot, "r+b") as f:
+            f.seek(len(Snapshot.SNAPSHOT_MAGIC))
+            f.write(b"\xff")
+        with self.assertRaises(ValueError):
+            Snapshot.Snapshot(self.snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
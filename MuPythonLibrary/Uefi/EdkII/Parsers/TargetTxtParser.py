@@ -26,10 +26,13 @@
 ###
 from MuPythonLibrary.Uefi.EdkII.Parsers.BaseParser import HashFileParser
 import os
+import hashlib
 
 
 class TargetTxtParser(HashFileParser):
 
+    ResultAttributes = ("Lines", "Dict", "SourceFiles", "Provenance")
+
     def __init__(self):
         HashFileParser.__init__(self, 'TargetTxtParser')
         self.Lines = []
@@ -44,20 +47,27 @@ class TargetTxtParser(HashFileParser):
         else:
             fp = filepath
         self.Path = fp
-        f = open(fp, "r")
-        self.Lines = f.readlines()
-        f.close()
-
-        for line in self.Lines:
-            sline = self.StripComment(line)
+        if self.LoadCachedResults(fp):
+            return
 
-            if(sline is None or len(sline) < 1):
-                continue
+        (self.Lines, tokens) = self.TokenizeFile(fp)
 
-            if sline.count("=") == 1:
-                tokens = sline.split('=', 1)
-                self.Dict[tokens[0].strip()] = tokens[1].strip()
-                self.Logger.debug("Key,values found:  %s = %s" % (tokens[0].strip(), tokens[1].strip()))
-                continue
+        for token in tokens:
+            if token.Text.count("=") == 1:
+                parts = token.Text.split('=', 1)
+                self.Dict[parts[0].strip()] = parts[1].strip()
+                self.SetProvenance("Dict", parts[0].strip(), fp, token.LineNo)
+                self.Logger.debug("Key,values found:  %s = %s" % (parts[0].strip(), parts[1].strip()))
 
         self.Parsed = True
+        self.StoreCachedResults(fp)
+
+    #
+    # Fingerprint of the build settings.  Only the values matter so editing
+    # comments or spacing in target.txt doesn't change it.
+    #
+    def GetFingerprint(self):
+        h = hashlib.sha256()
+        h.update(type(self).__name__.encode("utf-8"))
+        h.update(repr(sorted(self.Dict.items())).encode("utf-8"))
+        return h.hexdigest()
@@ -0,0 +1,77 @@
+## @file TargetTxtParser_test.py
+# Contains unit test routines for the TargetTxtParser module.
+#
+##
+# Copyright (c) 2019, Microsoft Corporation
+#
+# All rights reserved.
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+##
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from MuPythonLibrary.Uefi.EdkII.Parsers.TargetTxtParser import TargetTxtParser
+
+SAMPLE_TARGET_TXT = """# build settings
+ACTIVE_PLATFORM = PlatPkg/Plat.dsc
+
+TARGET          = DEBUG
+TARGET_ARCH     = X64
+"""
+
+
+class TestTargetTxtParser(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.path = os.path.join(self.ws, "target.txt")
+        with open(self.path, "w") as f:
+            f.write(SAMPLE_TARGET_TXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def test_values(self):
+        target = TargetTxtParser()
+        target.ParseFile(self.path)
+        self.assertEqual(target.Dict, {"ACTIVE_PLATFORM": "PlatPkg/Plat.dsc", "TARGET": "DEBUG", "TARGET_ARCH": "X64"})
+
+    def test_provenance(self):
+        target = TargetTxtParser()
+        target.ParseFile(self.path)
+        self.assertEqual(target.GetKeyProvenance("Dict", "ACTIVE_PLATFORM"), (self.path, 2))
+        self.assertEqual(target.GetKeyProvenance("Dict", "TARGET_ARCH"), (self.path, 5))
+        self.assertEqual(target.SourceFiles, [self.path])
+
+    def test_later_value_replaces_location(self):
+        with open(self.path, "a") as f:
+            f.write("TARGET          = RELEASE\n")
+        target = TargetTxtParser()
+        target.ParseFile(self.path)
+        self.assertEqual(target.Dict["TARGET"], "RELEASE")
+        self.assertEqual(target.GetSourceLocations("Dict.TARGET"), [(self.path, 6)])
+
+
+if __name__ == '__main__':
+    unittest.main()